@@ -0,0 +1,38 @@
+# isort: skip_file
+# Needs to be first to set up django environment
+from .helpers import *
+from django.conf import settings
+from django.utils import timezone
+from posthog.api.capture import capture_batch_internal, capture_internal
+from posthog.models.utils import UUIDT
+
+
+class CaptureSuite:
+    """Compares producing a /batch payload event-by-event against producing it as a single batch."""
+
+    version = "v001"
+    params = [1, 50, 1000]
+    param_names = ["batch_size"]
+
+    def setup(self, batch_size):
+        self.events = [
+            (
+                {"event": "$pageview", "properties": {"$current_url": f"https://posthog.com/{i}", "$lib": "web"}},
+                UUIDT(),
+                f"user-{i % 20}",
+            )
+            for i in range(batch_size)
+        ]
+
+    def time_capture_serial(self, batch_size):
+        now = timezone.now()
+        futures = [
+            capture_internal(event, distinct_id, None, "https://app.posthog.com", now, now, 2, event_uuid, "token")
+            for event, event_uuid, distinct_id in self.events
+        ]
+        for future in futures:
+            future.get(timeout=settings.KAFKA_PRODUCE_ACK_TIMEOUT_SECONDS)  # type: ignore
+
+    def time_capture_batch(self, batch_size):
+        now = timezone.now()
+        capture_batch_internal(self.events, None, "https://app.posthog.com", now, now, 2, "token")
@@ -0,0 +1,132 @@
+# isort: skip_file
+# Needs to be first to set up django environment
+from .helpers import *
+import sys
+from posthog.models.filters import Filter, PathFilter, RetentionFilter
+from posthog.models.filters.stickiness_filter import StickinessFilter
+from posthog.models.team import Team
+
+TRENDS_DATA = {
+    "insight": "TRENDS",
+    "events": [
+        {"id": "$pageview", "math": "dau", "properties": [{"key": "$browser", "value": "Chrome"}]},
+        {"id": "$autocapture", "math": "total"},
+    ],
+    "properties": {"type": "AND", "values": [{"key": "$current_url", "value": "/pricing", "operator": "icontains"}]},
+    "breakdown": "$os",
+    "breakdown_type": "event",
+    "date_from": "-30d",
+    "interval": "day",
+}
+PATHS_DATA = {"insight": "PATHS", "start_point": "/", "include_event_types": ["$pageview"], "date_from": "-7d"}
+RETENTION_DATA = {
+    "insight": "RETENTION",
+    "target_entity": {"id": "$pageview", "type": "events"},
+    "returning_entity": {"id": "$pageview", "type": "events"},
+    "period": "Week",
+    "total_intervals": 11,
+}
+STICKINESS_DATA = {
+    "insight": "STICKINESS",
+    "events": [{"id": "$pageview"}],
+    "date_from": "-7d",
+    "shown_as": "Stickiness",
+}
+
+FILTERS = {
+    "filter": (Filter, TRENDS_DATA),
+    "path_filter": (PathFilter, PATHS_DATA),
+    "retention_filter": (RetentionFilter, RETENTION_DATA),
+    "stickiness_filter": (StickinessFilter, STICKINESS_DATA),
+}
+
+
+class FilterSuite:
+    """Cost of building and serializing filters, which happens several times in every insight request"""
+
+    version = "v001"
+    params = list(FILTERS.keys())
+    param_names = ["filter_class"]
+
+    def setup(self, filter_class):
+        self.team = Team(pk=2, test_account_filters=[])
+        self.filter_class, self.data = FILTERS[filter_class]
+        self.filter = self.build_filter()
+
+    def build_filter(self):
+        if self.filter_class is StickinessFilter:
+            return StickinessFilter(data=self.data, team=self.team, get_earliest_timestamp=lambda team_id: now())
+        return self.filter_class(data=self.data, team=self.team)
+
+    def time_build(self, filter_class):
+        for _ in range(100):
+            self.build_filter()
+
+    def time_to_dict(self, filter_class):
+        for _ in range(100):
+            self.filter.to_dict()
+
+    def time_to_json(self, filter_class):
+        for _ in range(100):
+            self.filter.toJSON()
+
+    def time_query_tags(self, filter_class):
+        for _ in range(100):
+            self.filter.query_tags()
+
+    def time_with_data(self, filter_class):
+        for _ in range(100):
+            self.filter.with_data({"offset": 100})
+
+
+FUNNEL_DATA = {
+    "insight": "FUNNELS",
+    "events": [
+        {"id": f"step_{index}", "order": index, "properties": [{"key": "$browser", "value": "Chrome"}]}
+        for index in range(5)
+    ],
+    "funnel_window_interval": 14,
+    "funnel_window_interval_unit": "day",
+    "date_from": "-30d",
+}
+
+
+def _cached_property_functions(cls):
+    "Code of every cached property of the class, whether it's cached per instance or through lru_cache"
+    codes = set()
+    for klass in cls.__mro__:
+        for attr in vars(klass).values():
+            func = getattr(attr, "func", None) or getattr(getattr(attr, "fget", None), "__wrapped__", None)
+            if func is not None and hasattr(func, "__code__"):
+                codes.add(func.__code__)
+    return codes
+
+
+class FilterCachedPropertySuite:
+    """How often cached properties of a multi-entity funnel filter get computed when two filters are used in turn"""
+
+    version = "v001"
+
+    def track_funnel_cached_property_computations(self):
+        team = Team(pk=2, test_account_filters=[])
+        filters = [Filter(data=FUNNEL_DATA, team=team), Filter(data={**FUNNEL_DATA, "date_from": "-60d"}, team=team)]
+        codes = _cached_property_functions(Filter)
+        computations = 0
+
+        def profile(frame, event, arg):
+            nonlocal computations
+            if event == "call" and frame.f_code in codes:
+                computations += 1
+
+        sys.setprofile(profile)
+        try:
+            # As in compare queries, or funnels building a query per entity from the same filter
+            for _ in range(len(FUNNEL_DATA["events"])):
+                for filter in filters:
+                    filter.to_dict()
+                    filter.query_tags()
+        finally:
+            sys.setprofile(None)
+        return computations
+
+    track_funnel_cached_property_computations.unit = "computations"  # type: ignore
@@ -0,0 +1,62 @@
+# isort: skip_file
+# Needs to be first to set up django environment
+from .helpers import *
+import json
+from django.test import override_settings
+from posthog import json_codec
+from posthog.models.utils import UUIDT
+
+KAFKA_EVENT = {
+    "uuid": str(UUIDT()),
+    "distinct_id": "user-1",
+    "ip": "127.0.0.1",
+    "site_url": "https://app.posthog.com",
+    "data": json.dumps(
+        {
+            "event": "$autocapture",
+            "properties": {
+                "$current_url": "https://posthog.com/pricing",
+                "$elements": [{"tag_name": "a", "attr__class": "btn", "$el_text": "Get started 🚀"}] * 10,
+                "$screen_width": 1920,
+                "$active_feature_flags": [f"flag-{i}" for i in range(20)],
+            },
+        }
+    ),
+    "team_id": 2,
+    "now": "2022-10-01T00:00:00+00:00",
+    "sent_at": "2022-10-01T00:00:00+00:00",
+    "token": "phc_token",
+}
+QUERY_RESULT = [[f"2022-01-{day:02d}", day * 1000, day / 7] for day in range(1, 32)] * 30
+
+
+class JSONCodecSuite:
+    version = "v001"
+    params = ["stdlib", "auto"]
+    param_names = ["backend"]
+
+    def setup(self, backend):
+        self.settings = override_settings(JSON_CODEC_BACKEND=backend)
+        self.settings.enable()
+
+        # The plugin server must read exactly what it read before, whichever backend produced it
+        for payload in [KAFKA_EVENT, QUERY_RESULT]:
+            if json.loads(json_codec.dumps_bytes(payload)) != json.loads(json.dumps(payload)):
+                raise AssertionError(f"{backend} output does not decode to the same values as json.dumps")
+        if backend == "stdlib" and json_codec.dumps_bytes(KAFKA_EVENT) != json.dumps(KAFKA_EVENT).encode("utf-8"):
+            raise AssertionError("stdlib output is not byte-for-byte identical to json.dumps")
+
+        self.serialized_result = json_codec.dumps_bytes(QUERY_RESULT)
+
+    def teardown(self, backend):
+        self.settings.disable()
+
+    def time_dumps_kafka_event(self, backend):
+        for _ in range(1000):
+            json_codec.dumps_bytes(KAFKA_EVENT)
+
+    def time_dumps_query_result(self, backend):
+        json_codec.dumps_bytes(QUERY_RESULT)
+
+    def time_loads_query_result(self, backend):
+        json_codec.loads(self.serialized_result)
@@ -16,6 +16,7 @@ from posthog.models.person import Person
 from posthog.models.property.util import parse_prop_grouped_clauses
 from posthog.models.team import Team
 from posthog.models.utils import PersonPropertiesMode
+from posthog.tasks.calculate_cohort import calculate_cohorts_in_order
 from posthog.test.base import (
     BaseTest,
     ClickhouseTestMixin,
@@ -887,3 +888,117 @@ class TestCohort(ClickhouseTestMixin, BaseTest):
         # Should have p1 in this cohort even if version is different
         results = self._get_cohortpeople(cohort1)
         self.assertEqual(len(results), 1)
+
+    def _get_cohortpeople_versions(self, cohort: Cohort):
+        return sync_execute(
+            """
+            SELECT person_id, version FROM cohortpeople
+            WHERE team_id = %(team_id)s AND cohort_id = %(cohort_id)s
+            GROUP BY person_id, cohort_id, team_id, version
+            HAVING sum(sign) > 0
+            """,
+            {"team_id": self.team.pk, "cohort_id": cohort.pk},
+        )
+
+    def test_cohortpeople_incremental_recalculation(self):
+        with freeze_time("2020-01-01"):
+            p1 = _create_person(team_id=self.team.pk, properties={"$some_prop": "something"})
+            p2 = _create_person(team_id=self.team.pk, properties={"$some_prop": "something"})
+            p3 = _create_person(team_id=self.team.pk, properties={"$some_prop": "another"})
+
+        with freeze_time("2020-01-10"):
+            cohort1 = Cohort.objects.create(
+                team=self.team,
+                groups=[{"properties": [{"key": "$some_prop", "value": "something", "type": "person"}]}],
+                name="cohort1",
+            )
+
+            with self.settings(COHORT_INCREMENTAL_RECALCULATION_ENABLED=True):
+                # Never calculated before, so calculated from scratch
+                cohort1.calculate_people_ch(pending_version=0, incremental=True)
+
+        with freeze_time("2020-01-12"):
+            _create_person(uuid=p2.uuid, team_id=self.team.pk, version=1, properties={"$some_prop": "another"})
+            _create_person(uuid=p3.uuid, team_id=self.team.pk, version=1, properties={"$some_prop": "something"})
+
+            with self.settings(COHORT_INCREMENTAL_RECALCULATION_ENABLED=True):
+                cohort1.calculate_people_ch(pending_version=1, incremental=True)
+
+        # p1 didn't change, so it's still in the cohort as of the version before
+        self.assertCountEqual(self._get_cohortpeople_versions(cohort1), [(p1.uuid, 0), (p3.uuid, 1)])
+        self.assertEqual(cohort1.count, 2)
+
+    def test_cohortpeople_incremental_recalculation_falls_back_to_full(self):
+        with freeze_time("2020-01-10"):
+            p1 = _create_person(team_id=self.team.pk, properties={"$some_prop": "something"})
+            cohort1 = Cohort.objects.create(
+                team=self.team,
+                groups=[{"properties": [{"key": "$some_prop", "value": "something", "type": "person"}]}],
+                name="cohort1",
+            )
+            cohort1.calculate_people_ch(pending_version=0)
+
+        with freeze_time("2020-01-12"), self.settings(COHORT_INCREMENTAL_RECALCULATION_ENABLED=True):
+            # The calculation of version 1 never finished
+            cohort1.calculate_people_ch(pending_version=2, incremental=True)
+
+        self.assertEqual(self._get_cohortpeople_versions(cohort1), [(p1.uuid, 2)])
+
+    def test_cohortpeople_incremental_recalculation_with_behavioral_filter(self):
+        with freeze_time("2020-01-01"):
+            p1 = _create_person(team_id=self.team.pk, distinct_ids=["1"])
+            p2 = _create_person(team_id=self.team.pk, distinct_ids=["2"])
+            p3 = _create_person(team_id=self.team.pk, distinct_ids=["3"])
+        _create_event(team=self.team, event="$pageview", distinct_id="1", timestamp="2020-01-05T12:00:00Z")
+        _create_event(team=self.team, event="$pageview", distinct_id="2", timestamp="2020-01-09T12:00:00Z")
+        # Already outside of the window at the first calculation
+        _create_event(team=self.team, event="$pageview", distinct_id="3", timestamp="2019-12-01T12:00:00Z")
+
+        with freeze_time("2020-01-10"):
+            cohort1 = Cohort.objects.create(
+                team=self.team,
+                filters={
+                    "properties": {
+                        "type": "AND",
+                        "values": [
+                            {
+                                "key": "$pageview",
+                                "event_type": "events",
+                                "time_value": 7,
+                                "time_interval": "day",
+                                "value": "performed_event",
+                                "type": "behavioral",
+                            }
+                        ],
+                    }
+                },
+                name="cohort1",
+            )
+
+            with self.settings(COHORT_INCREMENTAL_RECALCULATION_ENABLED=True):
+                cohort1.calculate_people_ch(pending_version=0, incremental=True)
+
+        self.assertCountEqual([row[0] for row in self._get_cohortpeople(cohort1)], [p1.uuid, p2.uuid])
+
+        _create_event(team=self.team, event="$pageview", distinct_id="3", timestamp="2020-01-13T00:00:00Z")
+
+        with freeze_time("2020-01-13T12:00:00Z"), self.settings(COHORT_INCREMENTAL_RECALCULATION_ENABLED=True):
+            # p1's event dropped out of the window, p3 performed the event again
+            cohort1.calculate_people_ch(pending_version=1, incremental=True)
+
+        self.assertCountEqual([row[0] for row in self._get_cohortpeople(cohort1)], [p2.uuid, p3.uuid])
+        self.assertEqual(cohort1.count, 2)
+
+    def test_calculate_cohorts_in_order_copies_duplicate_cohort(self):
+        p1 = Person.objects.create(team_id=self.team.pk, distinct_ids=["1"], properties={"$some_prop": "something"})
+        Person.objects.create(team_id=self.team.pk, distinct_ids=["2"], properties={"$some_prop": "another"})
+        groups = [{"properties": [{"key": "$some_prop", "value": "something", "type": "person"}]}]
+        source = Cohort.objects.create(team=self.team, groups=groups, name="source")
+        duplicate = Cohort.objects.create(team=self.team, groups=groups, name="duplicate")
+
+        calculate_cohorts_in_order([(source.pk, 0, None), (duplicate.pk, 0, source.pk)])
+
+        duplicate.refresh_from_db()
+        self.assertEqual(duplicate.errors_calculating, 0)
+        self.assertEqual(duplicate.count, 1)
+        self.assertEqual(self._get_cohortpeople_versions(duplicate), [(p1.uuid, 0)])
@@ -1,12 +1,15 @@
 import datetime
 from unittest.mock import patch
+from uuid import UUID
 
 import fakeredis
 from clickhouse_driver.errors import ServerException
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from freezegun import freeze_time
 
 from posthog import client
+from posthog.clickhouse.query_tagging import reset_query_tags, tag_queries
+from posthog.clickhouse.result_cache import QueryResultCacheClass
 from posthog.client import CACHE_TTL, _deserialize, _key_hash, cache_sync_execute, sync_execute
 from posthog.test.base import ClickhouseTestMixin
 
@@ -162,3 +165,50 @@ class ClickhouseClientTestCase(TestCase, ClickhouseTestMixin):
             # Make sure it still includes the "annotation" comment that includes
             # request routing information for debugging purposes
             self.assertIn("/* request:1 */", first_query)
+
+
+@override_settings(CLICKHOUSE_RESULT_CACHE_ENABLED=True)
+class ClickhouseResultCacheTestCase(TestCase, ClickhouseTestMixin):
+    def setUp(self):
+        redis_client = fakeredis.FakeStrictRedis()
+        patcher = patch("posthog.clickhouse.result_cache.get_client", return_value=redis_client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(reset_query_tags)
+
+    def test_result_cache(self):
+        query = "SELECT now(), generateUUIDv4(), %(value)s"
+
+        with self.capture_select_queries() as sqls:
+            result = sync_execute(query, {"value": 1}, result_cache=QueryResultCacheClass.INSIGHT_LOOKUP)
+            # Other requests running the same query share the result
+            tag_queries(kind="request", id="2")
+            cached_result = sync_execute(query, {"value": 1}, result_cache=QueryResultCacheClass.INSIGHT_LOOKUP)
+            sync_execute(query, {"value": 2}, result_cache=QueryResultCacheClass.INSIGHT_LOOKUP)
+            sync_execute(query, {"value": 1})
+
+        self.assertEqual(len(sqls), 3)
+        self.assertEqual(cached_result, result)
+        self.assertIsInstance(cached_result[0][0], datetime.datetime)
+        self.assertIsInstance(cached_result[0][1], UUID)
+
+    def test_result_cache_expires_by_query_class(self):
+        with freeze_time("2020-01-01 12:00:00") as frozen_time:
+            sync_execute("SELECT 1", result_cache=QueryResultCacheClass.INSIGHT_LOOKUP)
+            with self.capture_select_queries() as sqls:
+                frozen_time.tick(datetime.timedelta(seconds=30))
+                sync_execute("SELECT 1", result_cache=QueryResultCacheClass.INSIGHT_LOOKUP)
+                frozen_time.tick(datetime.timedelta(seconds=60))
+                sync_execute("SELECT 1", result_cache=QueryResultCacheClass.INSIGHT_LOOKUP)
+
+        self.assertEqual(len(sqls), 1)
+
+    @override_settings(CLICKHOUSE_RESULT_CACHE_MAX_BYTES=100)
+    def test_result_cache_skips_large_results(self):
+        query = "SELECT number, toString(generateUUIDv4()) FROM numbers(100)"
+
+        with self.capture_select_queries() as sqls:
+            sync_execute(query, result_cache=QueryResultCacheClass.INSIGHT_LOOKUP)
+            sync_execute(query, result_cache=QueryResultCacheClass.INSIGHT_LOOKUP)
+
+        self.assertEqual(len(sqls), 2)
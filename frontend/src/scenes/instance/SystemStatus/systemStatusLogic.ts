@@ -47,6 +47,7 @@ const EDITABLE_INSTANCE_SETTINGS = [
     'PERSON_ON_EVENTS_ENABLED',
     'GROUPS_ON_EVENTS_ENABLED',
     'STRICT_CACHING_TEAMS',
+    'INCREMENTAL_TRENDS_TEAMS',
     'SLACK_APP_CLIENT_ID',
     'SLACK_APP_CLIENT_SECRET',
     'SLACK_APP_SIGNING_SECRET',
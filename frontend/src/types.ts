@@ -985,6 +985,8 @@ export interface Cacheable {
     last_refresh: string | null
     filters_hash: string
     refreshing: boolean
+    /** Set when a cached result older than the stale threshold is served while it's recalculated in the background */
+    is_stale?: boolean
 }
 
 export interface TileLayout extends Omit<Layout, 'i'> {
@@ -1540,6 +1542,7 @@ export interface FunnelStepWithNestedBreakdown extends FunnelStep {
 
 export interface FunnelResult<ResultType = FunnelStep[] | FunnelsTimeConversionBins> {
     is_cached: boolean
+    is_stale?: boolean
     last_refresh: string | null
     result: ResultType
     type: 'Funnel'
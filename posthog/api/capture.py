@@ -1,9 +1,9 @@
 import hashlib
 import json
 import re
-import time
 from datetime import datetime
-from typing import Any, Dict, Iterator, List, Optional, Tuple
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import structlog
 from dateutil import parser
@@ -18,6 +18,7 @@ from sentry_sdk import configure_scope
 from sentry_sdk.api import capture_exception
 from statshog.defaults.django import statsd
 
+from posthog import json_codec
 from posthog.api.utils import (
     EventIngestionContext,
     get_data,
@@ -27,7 +28,8 @@ from posthog.api.utils import (
 )
 from posthog.exceptions import generate_exception_response
 from posthog.helpers.session_recording import preprocess_session_recording_events_for_clickhouse
-from posthog.kafka_client.client import KafkaProducer
+from posthog.kafka_client.client import KafkaProducer, wait_for_futures
+from posthog.kafka_client.spill_buffer import drain_leftover_segments, get_spill_buffer
 from posthog.kafka_client.topics import KAFKA_DEAD_LETTER_QUEUE
 from posthog.logging.timing import timed
 from posthog.models.feature_flag import get_active_feature_flags
@@ -55,7 +57,7 @@ def parse_kafka_event_data(
         "distinct_id": safe_clickhouse_string(distinct_id),
         "ip": safe_clickhouse_string(ip) if ip else ip,
         "site_url": safe_clickhouse_string(site_url),
-        "data": json.dumps(data),
+        "data": json_codec.dumps(data),
         "team_id": team_id,
         "now": now.isoformat(),
         "sent_at": sent_at.isoformat() if sent_at else "",
@@ -66,7 +68,7 @@ def parse_kafka_event_data(
 def log_event(data: Dict, event_name: str, partition_key: Optional[str]):
     logger.debug("logging_event", event_name=event_name, kafka_topic=KAFKA_EVENTS_PLUGIN_INGESTION_TOPIC)
 
-    # TODO: Handle Kafka being unavailable with exponential backoff retries
+    # Callers that can't afford to lose events when Kafka is unavailable use `spill_events`
     try:
         future = KafkaProducer().produce(topic=KAFKA_EVENTS_PLUGIN_INGESTION_TOPIC, data=data, key=partition_key)
         statsd.incr("posthog_cloud_plugin_server_ingestion")
@@ -193,6 +195,8 @@ def get_event(request):
     if request.method == "OPTIONS":
         return cors_response(request, JsonResponse({"status": 1}))
 
+    drain_leftover_segments()
+
     now = timezone.now()
 
     data, error_response = get_data(request)
@@ -264,10 +268,8 @@ def get_event(request):
             request, generate_exception_response("capture", f"Invalid payload: {e}", code="invalid_payload")
         )
 
-    futures: List[FutureRecordMetadata] = []
-
-    for event, event_uuid, distinct_id in processed_events:
-        if send_events_to_dead_letter_queue:
+    if send_events_to_dead_letter_queue:
+        for event, event_uuid, distinct_id in processed_events:
             kafka_event = parse_kafka_event_data(
                 distinct_id=distinct_id,
                 ip=None,
@@ -287,47 +289,41 @@ def get_event(request):
                 f"Unable to fetch team from Postgres. Error: {db_error}",
                 "django_server_capture_endpoint",
             )
-            continue
-
-        team_id = ingestion_context.team_id if ingestion_context else None
-        try:
-            futures.append(
-                capture_internal(event, distinct_id, ip, site_url, now, sent_at, team_id, event_uuid, token)  # type: ignore
-            )
-        except Exception as e:
-            capture_exception(e, {"data": data})
-            statsd.incr("posthog_cloud_raw_endpoint_failure", tags={"endpoint": "capture"})
-            return cors_response(
-                request,
-                generate_exception_response(
-                    "capture",
-                    "Unable to store event. Please try again. If you are the owner of this app you can check the logs for further details.",
-                    code="server_error",
-                    type="server_error",
-                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                ),
-            )
+        statsd.incr("posthog_cloud_raw_endpoint_success", tags={"endpoint": "capture"})
+        return cors_response(request, JsonResponse({"status": 1}))
 
-    start_time = time.monotonic()
-    for future in futures:
-        try:
-            future.get(timeout=settings.KAFKA_PRODUCE_ACK_TIMEOUT_SECONDS - (time.monotonic() - start_time))
-        except KafkaError as exc:
-            # TODO: distinguish between retriable errors and non-retriable
-            # errors, and set Retry-After header accordingly.
-            # TODO: return 400 error for non-retriable errors that require the
-            # client to change their request.
-            logger.error("kafka_produce_failure", exc_info=exc)
-            return cors_response(
-                request,
-                generate_exception_response(
-                    "capture",
-                    "Unable to store some events. Please try again. If you are the owner of this app you can check the logs for further details.",
-                    code="server_error",
-                    type="server_error",
-                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                ),
-            )
+    team_id = ingestion_context.team_id if ingestion_context else None
+    try:
+        capture_batch_internal(processed_events, ip, site_url, now, sent_at, team_id, token)  # type: ignore
+    except KafkaError as exc:
+        # TODO: distinguish between retriable errors and non-retriable
+        # errors, and set Retry-After header accordingly.
+        # TODO: return 400 error for non-retriable errors that require the
+        # client to change their request.
+        logger.error("kafka_produce_failure", exc_info=exc)
+        return cors_response(
+            request,
+            generate_exception_response(
+                "capture",
+                "Unable to store some events. Please try again. If you are the owner of this app you can check the logs for further details.",
+                code="server_error",
+                type="server_error",
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            ),
+        )
+    except Exception as e:
+        capture_exception(e, {"data": data})
+        statsd.incr("posthog_cloud_raw_endpoint_failure", tags={"endpoint": "capture"})
+        return cors_response(
+            request,
+            generate_exception_response(
+                "capture",
+                "Unable to store event. Please try again. If you are the owner of this app you can check the logs for further details.",
+                code="server_error",
+                type="server_error",
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            ),
+        )
 
     statsd.incr("posthog_cloud_raw_endpoint_success", tags={"endpoint": "capture"})
     return cors_response(request, JsonResponse({"status": 1}))
@@ -390,13 +386,91 @@ def capture_internal(event, distinct_id, ip, site_url, now, sent_at, team_id, ev
         token=token,
     )
 
+    return log_event(parsed_event, event["event"], partition_key=get_partition_key(team_id, distinct_id))
+
+
+def capture_batch_internal(
+    events: Iterable[Tuple[Dict[str, Any], UUIDT, str]],
+    ip: Optional[str],
+    site_url: str,
+    now: datetime,
+    sent_at: Optional[datetime],
+    team_id: int,
+    token: Optional[str] = None,
+) -> None:
+    """
+    Batch counterpart of `capture_internal`: every event is serialized up front, before anything is produced,
+    so that the producer can accumulate the whole batch, and acks are awaited once for the whole batch.
+
+    Events that fail to produce or aren't acked in time go to the spill buffer, if it's enabled. Errors are only
+    raised if they can't be spilled.
+    """
+    parsed_events = [
+        (
+            parse_kafka_event_data(
+                distinct_id=distinct_id,
+                ip=ip,
+                site_url=site_url,
+                data=event,
+                team_id=team_id,
+                now=now,
+                sent_at=sent_at,
+                event_uuid=event_uuid,
+                token=token,  # type: ignore
+            ),
+            event["event"],
+            get_partition_key(team_id, distinct_id),
+        )
+        for event, event_uuid, distinct_id in events
+    ]
+
+    produced: List[Tuple[Dict, Optional[str], FutureRecordMetadata]] = []
+    for parsed_event, event_name, partition_key in parsed_events:
+        try:
+            produced.append((parsed_event, partition_key, log_event(parsed_event, event_name, partition_key)))
+        except Exception:
+            if not spill_events([(parsed_event, partition_key)]):
+                raise
+
+    try:
+        wait_for_futures(
+            [future for _, _, future in produced], timeout_seconds=settings.KAFKA_PRODUCE_ACK_TIMEOUT_SECONDS
+        )
+    except KafkaError:
+        unacked_events = [
+            (parsed_event, partition_key)
+            for parsed_event, partition_key, future in produced
+            if not (future.is_done and future.succeeded())
+        ]
+        if not spill_events(unacked_events):
+            raise
+
+
+def spill_events(events: List[Tuple[Dict, Optional[str]]]) -> bool:
+    "Returns whether every event made it to the spill buffer, from which they will be produced again later."
+    spill_buffer = get_spill_buffer()
+    if spill_buffer is None:
+        return False
+
+    statsd.incr("capture_events_spilled", len(events))
+    return all(
+        spill_buffer.append(KAFKA_EVENTS_PLUGIN_INGESTION_TOPIC, partition_key, parsed_event)
+        for parsed_event, partition_key in events
+    )
+
+
+def get_partition_key(team_id: Optional[int], distinct_id: str) -> Optional[str]:
     # We aim to always partition by {team_id}:{distinct_id} but allow
     # overriding this to deal with hot partitions in specific cases.
     # Setting the partition key to None means using random partitioning.
-    kafka_partition_key = None
     candidate_partition_key = f"{team_id}:{distinct_id}"
 
-    if candidate_partition_key not in settings.EVENT_PARTITION_KEYS_TO_OVERRIDE:
-        kafka_partition_key = hashlib.sha256(candidate_partition_key.encode()).hexdigest()
+    if candidate_partition_key in settings.EVENT_PARTITION_KEYS_TO_OVERRIDE:
+        return None
+    return _hash_partition_key(candidate_partition_key)
+
 
-    return log_event(parsed_event, event["event"], partition_key=kafka_partition_key)
+@lru_cache(maxsize=100_000)
+def _hash_partition_key(candidate_partition_key: str) -> str:
+    # Batches tend to repeat the same few distinct_ids, so there's no need to hash them over and over
+    return hashlib.sha256(candidate_partition_key.encode()).hexdigest()
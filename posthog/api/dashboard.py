@@ -20,6 +20,7 @@ from posthog.api.insight import InsightSerializer, InsightViewSet
 from posthog.api.routing import StructuredViewSetMixin
 from posthog.api.shared import UserBasicSerializer
 from posthog.api.tagged_item import TaggedItemSerializerMixin, TaggedItemViewSetMixin
+from posthog.caching.update_cache import synchronously_update_dashboard_cache
 from posthog.constants import INSIGHT_TRENDS, AvailableFeature
 from posthog.event_usage import report_user_action
 from posthog.helpers import create_dashboard_from_template
@@ -315,7 +316,12 @@ class DashboardSerializer(TaggedItemSerializerMixin, serializers.ModelSerializer
 
         serialized_tiles = []
 
-        for tile in DashboardTile.dashboard_queryset(dashboard.tiles):
+        tiles = list(DashboardTile.dashboard_queryset(dashboard.tiles))
+        if should_refresh(self.context["request"]):
+            # refresh all insights together rather than one by one as each tile is serialized
+            self.context.update({"refreshed_results": synchronously_update_dashboard_cache(dashboard, tiles)})
+
+        for tile in tiles:
             self.context.update({"dashboard_tile": tile})
 
             if isinstance(tile.layouts, str):
@@ -1,6 +1,4 @@
-import re
-from typing import Any, List, Optional
-from urllib.parse import urlparse
+from typing import Optional, Sequence
 
 import structlog
 from django.http import HttpRequest, JsonResponse
@@ -13,44 +11,15 @@ from posthog.api.geoip import get_geoip_properties
 from posthog.api.utils import get_project_id, get_token
 from posthog.exceptions import RequestParsingError, generate_exception_response
 from posthog.logging.timing import timed
-from posthog.models import Team, User
+from posthog.models import User
 from posthog.models.feature_flag import get_active_feature_flags
-from posthog.plugins.site import get_decide_site_apps
+from posthog.models.team import CachedTeam, get_cached_team_for_token, get_decide_static_config
+from posthog.models.team.decide_config import HostnameMatcher
 from posthog.utils import cors_response, get_ip_address, load_data_from_request
 
 
-def on_permitted_recording_domain(team: Team, request: HttpRequest) -> bool:
-    origin = parse_domain(request.headers.get("Origin"))
-    referer = parse_domain(request.headers.get("Referer"))
-    return hostname_in_allowed_url_list(team.recording_domains, origin) or hostname_in_allowed_url_list(
-        team.recording_domains, referer
-    )
-
-
-def hostname_in_allowed_url_list(allowed_url_list: Optional[List[str]], hostname: Optional[str]) -> bool:
-    if not hostname:
-        return False
-
-    permitted_domains = ["127.0.0.1", "localhost"]
-    if allowed_url_list:
-        for url in allowed_url_list:
-            host = parse_domain(url)
-            if host:
-                permitted_domains.append(host)
-
-    for permitted_domain in permitted_domains:
-        if "*" in permitted_domain:
-            pattern = "^{}$".format(re.escape(permitted_domain).replace("\\*", "(.*)"))
-            if re.search(pattern, hostname):
-                return True
-        elif permitted_domain == hostname:
-            return True
-
-    return False
-
-
-def parse_domain(url: Any) -> Optional[str]:
-    return urlparse(url).hostname
+def hostname_in_allowed_url_list(allowed_url_list: Optional[Sequence[str]], hostname: Optional[str]) -> bool:
+    return HostnameMatcher(allowed_url_list).matches(hostname)
 
 
 @csrf_exempt
@@ -95,7 +64,7 @@ def get_decide(request: HttpRequest):
             )
 
         token = get_token(data, request)
-        team = Team.objects.get_team_from_token(token)
+        team = get_cached_team_for_token(token)
         if team is None and token:
             project_id = get_project_id(data, request)
 
@@ -123,7 +92,7 @@ def get_decide(request: HttpRequest):
                         status_code=status.HTTP_401_UNAUTHORIZED,
                     ),
                 )
-            team = user.teams.get(id=project_id)
+            team = CachedTeam.from_team(user.teams.get(id=project_id))
 
         if team:
             structlog.contextvars.bind_contextvars(team_id=team.id)
@@ -154,13 +123,9 @@ def get_decide(request: HttpRequest):
             )
             response["featureFlags"] = feature_flags if api_version >= 2 else list(feature_flags.keys())
 
-            if team.session_recording_opt_in and (
-                on_permitted_recording_domain(team, request) or not team.recording_domains
-            ):
-                capture_console_logs = True if team.capture_console_log_opt_in else False
-                response["sessionRecording"] = {"endpoint": "/s/", "consoleLogRecordingEnabled": capture_console_logs}
-
-            response["siteApps"] = get_decide_site_apps(team) if team.inject_web_apps else []
+            static_config = get_decide_static_config(team)
+            response["sessionRecording"] = static_config.session_recording_for(request)
+            response["siteApps"] = list(static_config.site_apps)
 
     statsd.incr(f"posthog_cloud_raw_endpoint_success", tags={"endpoint": "decide"})
     return cors_response(request, JsonResponse(response))
@@ -21,12 +21,15 @@ from posthog.models.feature_flag import (
     FeatureFlagMatcher,
     can_user_edit_feature_flag,
     get_active_feature_flags,
+    get_feature_flags_for_distinct_ids,
     get_user_blast_radius,
 )
 from posthog.models.group_type_mapping import GroupTypeMapping
 from posthog.models.property import Property
 from posthog.permissions import ProjectMembershipNecessaryPermissions, TeamMemberAccessPermission
 
+MAX_BATCH_EVALUATION_DISTINCT_IDS = 10_000
+
 
 class CanEditFeatureFlag(BasePermission):
     message = "You don't have edit permissions for this feature flag."
@@ -310,6 +313,24 @@ class FeatureFlagViewSet(StructuredViewSetMixin, ForbidDestroyModel, viewsets.Mo
             }
         )
 
+    @action(methods=["POST"], detail=False)
+    def evaluate_batch(self, request: request.Request, **kwargs):
+        distinct_ids = request.data.get("distinct_ids")
+        groups = request.data.get("groups") or {}
+
+        if not isinstance(distinct_ids, list) or not distinct_ids:
+            raise exceptions.ValidationError(detail="distinct_ids must be a non-empty list")
+        if len(distinct_ids) > MAX_BATCH_EVALUATION_DISTINCT_IDS:
+            raise exceptions.ValidationError(
+                detail=f"At most {MAX_BATCH_EVALUATION_DISTINCT_IDS} distinct_ids can be evaluated at once"
+            )
+        if not isinstance(groups, dict):
+            raise exceptions.ValidationError(detail="groups must be an object")
+
+        unique_distinct_ids = list(dict.fromkeys(str(distinct_id) for distinct_id in distinct_ids))
+
+        return Response({"flags": get_feature_flags_for_distinct_ids(self.team_id, unique_distinct_ids, groups)})
+
     @action(methods=["GET"], detail=False)
     def evaluation_reasons(self, request: request.Request, **kwargs):
 
@@ -33,6 +33,7 @@ from posthog.api.routing import StructuredViewSetMixin
 from posthog.api.shared import UserBasicSerializer
 from posthog.api.tagged_item import TaggedItemSerializerMixin, TaggedItemViewSetMixin
 from posthog.api.utils import format_paginated_url
+from posthog.caching.stale_while_revalidate import CacheFreshness, get_cache_freshness, revalidate_in_background
 from posthog.caching.update_cache import synchronously_update_insight_cache
 from posthog.client import sync_execute
 from posthog.constants import (
@@ -326,35 +327,51 @@ class InsightSerializer(InsightBasicSerializer):
         instance.dashboards.set(changes_to_apply, clear=True)
 
     def get_result(self, insight: Insight):
+        self.context.update({"is_stale": False})
         if not insight.filters:
             return None
 
         dashboard = self.context.get("dashboard", None)
 
         if should_refresh(self.context["request"]):
+            refreshed_results = self.context.get("refreshed_results", {})
+            if insight.pk in refreshed_results:
+                return refreshed_results[insight.pk]
             return synchronously_update_insight_cache(insight, dashboard)
 
         cache_key = insight.filters_hash
-        if dashboard is not None:
-            dashboard_tile = self.dashboard_tile_from_context(insight, dashboard)
-            if dashboard_tile is not None:
-                cache_key = dashboard_tile.filters_hash
-                if cache_key is None:
-                    # the DashboardTile hasn't had a filters_hash added yet
-                    # TODO need to run a migration after 0229 to ensure all tiles have a filters hash
-                    generated_filters_hash = generate_insight_cache_key(insight, dashboard)
-                    dashboard_tile.filters_hash = generated_filters_hash
-                    dashboard_tile.save(update_fields=["filters_hash"])
-                    cache_key = generated_filters_hash
+        dashboard_tile = self.dashboard_tile_from_context(insight, dashboard) if dashboard is not None else None
+        if dashboard_tile is not None:
+            cache_key = dashboard_tile.filters_hash
+            if cache_key is None:
+                # the DashboardTile hasn't had a filters_hash added yet
+                # TODO need to run a migration after 0229 to ensure all tiles have a filters hash
+                generated_filters_hash = generate_insight_cache_key(insight, dashboard)
+                dashboard_tile.filters_hash = generated_filters_hash
+                dashboard_tile.save(update_fields=["filters_hash"])
+                cache_key = generated_filters_hash
 
-        self.context.update({"filters_hash": cache_key})
         result = get_safe_cache(cache_key)
+        if not result:
+            # Stored hashes go stale when the way filters are serialized changes, while results keep being cached
+            # under the current hash, e.g. by background refreshes. Look there until the stored hashes are recomputed
+            # with the `recompute_insight_filters_hashes` command.
+            current_cache_key = generate_insight_cache_key(insight, dashboard if dashboard_tile is not None else None)
+            if current_cache_key != cache_key:
+                cache_key = current_cache_key
+                result = get_safe_cache(cache_key)
+
+        self.context.update({"filters_hash": cache_key})
         cache_context = {"type": insight.type, "from_dashboard": "true" if dashboard else "false"}
-        if not result or result.get("task_id", None):
+        freshness = get_cache_freshness(insight.team, result) if result else None
+        if not result or result.get("task_id", None) or freshness == CacheFreshness.EXPIRED:
             statsd.incr("posthog_cloud_insight_cache_miss", tags=cache_context)
             return None
         else:
             statsd.incr("posthog_cloud_insight_cache_hit", tags=cache_context)
+        if freshness == CacheFreshness.STALE:
+            self.context.update({"is_stale": True})
+            revalidate_in_background(insight.team_id, cache_key)
         # Data might not be defined if there is still cached results from before moving from 'results' to 'data'
         return result.get("result")
 
@@ -404,6 +421,8 @@ class InsightSerializer(InsightBasicSerializer):
 
         context_cache_key = self.context.get("filters_hash")
         representation["filters_hash"] = context_cache_key if context_cache_key is not None else instance.filters_hash
+        if self.context.get("is_stale"):
+            representation["is_stale"] = True
 
         return representation
 
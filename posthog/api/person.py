@@ -1,4 +1,5 @@
 import json
+import re
 from datetime import datetime
 from typing import (
     Any,
@@ -62,6 +63,7 @@ from posthog.tasks.split_person import split_person
 from posthog.utils import convert_property_value, format_query_params_absolute_url, is_anonymous_id, relative_date_parse
 
 DEFAULT_PAGE_LIMIT = 100
+CURSOR_REGEX = re.compile(r"([?&])cursor=[^&]*&?")
 
 
 class PersonLimitOffsetPagination(LimitOffsetPagination):
@@ -459,9 +461,10 @@ class PersonViewSet(PKorUUIDViewSet, StructuredViewSetMixin, viewsets.ModelViewS
         filter = prepare_actor_query_filter(filter)
         funnel_actor_class = get_funnel_actor_class(filter)
 
-        actors, serialized_actors, raw_count = funnel_actor_class(filter, self.team).get_actors()
+        actors_query = funnel_actor_class(filter, self.team)
+        actors, serialized_actors, raw_count = actors_query.get_actors(cursor=request.GET.get("cursor"))
         initial_url = format_query_params_absolute_url(request, 0)
-        next_url = paginated_result(request, raw_count, filter.offset, filter.limit)
+        next_url = paginated_result(request, raw_count, filter.offset, filter.limit, cursor=actors_query.next_cursor)
 
         # cached_function expects a dict with the key result
         return {"result": (serialized_actors, next_url, initial_url, raw_count - len(serialized_actors))}
@@ -487,8 +490,9 @@ class PersonViewSet(PKorUUIDViewSet, StructuredViewSetMixin, viewsets.ModelViewS
                 funnel_filter_data = json.loads(funnel_filter_data)
             funnel_filter = Filter(data={"insight": INSIGHT_FUNNELS, **funnel_filter_data}, team=self.team)
 
-        actors, serialized_actors, raw_count = PathsActors(filter, self.team, funnel_filter=funnel_filter).get_actors()
-        next_url = paginated_result(request, raw_count, filter.offset, filter.limit)
+        actors_query = PathsActors(filter, self.team, funnel_filter=funnel_filter)
+        actors, serialized_actors, raw_count = actors_query.get_actors(cursor=request.GET.get("cursor"))
+        next_url = paginated_result(request, raw_count, filter.offset, filter.limit, cursor=actors_query.next_cursor)
         initial_url = format_query_params_absolute_url(request, 0)
 
         # cached_function expects a dict with the key result
@@ -509,8 +513,9 @@ class PersonViewSet(PKorUUIDViewSet, StructuredViewSetMixin, viewsets.ModelViewS
         filter = prepare_actor_query_filter(filter)
         entity = get_target_entity(filter)
 
-        actors, serialized_actors, raw_count = TrendsActors(self.team, entity, filter).get_actors()
-        next_url = paginated_result(request, raw_count, filter.offset, filter.limit)
+        actors_query = TrendsActors(self.team, entity, filter)
+        actors, serialized_actors, raw_count = actors_query.get_actors(cursor=request.GET.get("cursor"))
+        next_url = paginated_result(request, raw_count, filter.offset, filter.limit, cursor=actors_query.next_cursor)
         initial_url = format_query_params_absolute_url(request, 0)
 
         # cached_function expects a dict with the key result
@@ -590,8 +595,18 @@ def paginated_result(
     count: int,
     offset: int = 0,
     limit: int = DEFAULT_PAGE_LIMIT,
+    cursor: Optional[str] = None,
 ) -> Optional[str]:
-    return format_paginated_url(request, offset, limit) if count >= limit else None
+    if count < limit:
+        return None
+    next_url = format_paginated_url(request, offset, limit)
+    if next_url is None:
+        return None
+    # The offset is kept next to the cursor, for when the cursor's actors have expired
+    next_url = CURSOR_REGEX.sub(r"\1", next_url).rstrip("?&")
+    if cursor is not None:
+        next_url = f"{next_url}{'&' if '?' in next_url else '?'}cursor={cursor}"
+    return next_url
 
 
 T = TypeVar("T", Filter, PathFilter, RetentionFilter, StickinessFilter)
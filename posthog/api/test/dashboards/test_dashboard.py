@@ -1,6 +1,6 @@
 import json
 from typing import Any, Dict, Literal, Optional, Tuple
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 from dateutil import parser
 from django.utils import timezone
@@ -10,6 +10,7 @@ from rest_framework import status
 
 from posthog.api.dashboard import DashboardSerializer
 from posthog.api.test.dashboards import DashboardAPI
+from posthog.caching.update_cache import update_cache_item
 from posthog.constants import AvailableFeature
 from posthog.models import Dashboard, DashboardTile, Filter, Insight, Team, User
 from posthog.models.organization import Organization
@@ -318,6 +319,28 @@ class TestDashboard(APIBaseTest, QueryMatchingTest):
             self.assertAlmostEqual(item_default.last_refresh, now(), delta=timezone.timedelta(seconds=5))
             self.assertAlmostEqual(item_trends.last_refresh, now(), delta=timezone.timedelta(seconds=5))
 
+    @patch("posthog.caching.update_cache.update_cache_item", wraps=update_cache_item)
+    def test_refresh_cache_calculates_identical_tiles_once(self, patched_update_cache_item):
+        dashboard = Dashboard.objects.create(team=self.team, name="dashboard", filters={"date_from": "-14d"})
+        for order, date_from in enumerate(["-7d", "-30d"]):
+            # the dashboard's date range applies to both, so they end up the same
+            insight = Insight.objects.create(
+                filters=Filter(data={"events": [{"id": "$pageview"}], "date_from": date_from}).to_dict(),
+                team=self.team,
+                order=order,
+            )
+            DashboardTile.objects.create(dashboard=dashboard, insight=insight)
+
+        with freeze_time("2020-01-15T13:00:01Z"):
+            response = self.client.get(f"/api/projects/{self.team.id}/dashboards/{dashboard.pk}?refresh=true")
+
+        self.assertEqual(response.status_code, 200)
+        tiles = response.json()["tiles"]
+        self.assertEqual(len(tiles), 2)
+        self.assertEqual(tiles[0]["insight"]["result"], tiles[1]["insight"]["result"])
+        self.assertEqual(tiles[0]["insight"]["result"][0]["days"][0], "2020-01-01")
+        patched_update_cache_item.assert_called_once()
+
     def test_dashboard_endpoints(self):
         # create
         response = self.client.post(f"/api/projects/{self.team.id}/dashboards/", {"name": "Default", "pinned": "true"})
@@ -3,6 +3,7 @@ import gzip
 import json
 import random
 import string
+import tempfile
 import zlib
 from contextlib import contextmanager
 from datetime import datetime, timedelta
@@ -26,6 +27,7 @@ from rest_framework import status
 
 from posthog.api.capture import get_distinct_id
 from posthog.api.test.mock_sentry import mock_sentry_context_for_tagging
+from posthog.kafka_client.spill_buffer import SpillBuffer
 from posthog.models.feature_flag import FeatureFlag
 from posthog.models.personal_api_key import PersonalAPIKey, hash_key_value
 from posthog.models.utils import generate_random_token_personal
@@ -170,6 +172,33 @@ class TestCapture(BaseTest):
         response = self.client.get("/e/?data=%s" % quote(self._to_json(data)), HTTP_ORIGIN="https://localhost")
         self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
 
+    @patch("posthog.kafka_client.client._KafkaProducer.produce")
+    def test_capture_events_spilled_on_kafka_produce_errors(self, kafka_produce):
+        produce_future = FutureProduceResult(topic_partition=TopicPartition(KAFKA_EVENTS_PLUGIN_INGESTION_TOPIC, 1))
+        future = FutureRecordMetadata(
+            produce_future=produce_future,
+            relative_offset=0,
+            timestamp_ms=0,
+            checksum=0,
+            serialized_key_size=0,
+            serialized_value_size=0,
+            serialized_header_size=0,
+        )
+        future.failure(KafkaError("Failed to produce"))
+        kafka_produce.return_value = future
+        data = {"event": "some_event", "properties": {"distinct_id": 2, "token": self.team.api_token}}
+
+        spill_buffer = SpillBuffer(tempfile.mkdtemp(), segment_size_bytes=1024, max_bytes=100_000)
+        with patch("posthog.api.capture.get_spill_buffer", return_value=spill_buffer):
+            response = self.client.get("/e/?data=%s" % quote(self._to_json(data)), HTTP_ORIGIN="https://localhost")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(spill_buffer.stats().depth, 1)
+
+        produced: List[Dict] = []
+        spill_buffer.drain(lambda topic, key, data: produced.append(data), lambda futures: None)
+        self.assertEqual(json.loads(produced[0]["data"])["event"], "some_event")
+
     @patch("posthog.kafka_client.client._KafkaProducer.produce")
     def test_capture_event_ip(self, kafka_produce):
         data = {"event": "some_event", "properties": {"distinct_id": 2, "token": self.team.api_token}}
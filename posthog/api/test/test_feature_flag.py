@@ -1249,6 +1249,80 @@ class TestFeatureFlag(APIBaseTest):
             sorted_flags[0],
         )
 
+    def test_evaluate_batch(self):
+        FeatureFlag.objects.all().delete()
+        Person.objects.create(team=self.team, distinct_ids=["1", "2"], properties={"email": "tim@posthog.com"})
+        Person.objects.create(team=self.team, distinct_ids=["3"], properties={"email": "tom@example.com"})
+        FeatureFlag.objects.create(
+            team=self.team,
+            key="email-flag",
+            created_by=self.user,
+            filters={"groups": [{"properties": [{"key": "email", "value": "tim@posthog.com", "type": "person"}]}]},
+        )
+        FeatureFlag.objects.create(
+            team=self.team,
+            key="variant-flag",
+            created_by=self.user,
+            filters={
+                "groups": [{"rollout_percentage": 100}],
+                "multivariate": {
+                    "variants": [
+                        {"key": "first-variant", "rollout_percentage": 50},
+                        {"key": "second-variant", "rollout_percentage": 50},
+                    ]
+                },
+            },
+        )
+
+        response = self.client.post(
+            f"/api/projects/{self.team.id}/feature_flags/evaluate_batch",
+            {"distinct_ids": ["1", "2", "3", "unknown"]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        flags = response.json()["flags"]
+        self.assertEqual(set(flags.keys()), {"1", "2", "3", "unknown"})
+        for distinct_id in ["1", "2"]:
+            self.assertEqual(flags[distinct_id]["email-flag"], True)
+        for distinct_id in ["3", "unknown"]:
+            self.assertNotIn("email-flag", flags[distinct_id])
+        for distinct_id in flags:
+            self.assertIn(flags[distinct_id]["variant-flag"], ["first-variant", "second-variant"])
+
+    def test_evaluate_batch_query_count_does_not_depend_on_batch_size(self):
+        FeatureFlag.objects.all().delete()
+        FeatureFlag.objects.create(
+            team=self.team,
+            key="email-flag",
+            created_by=self.user,
+            filters={"groups": [{"properties": [{"key": "email", "value": "tim@posthog.com", "type": "person"}]}]},
+        )
+        for i in range(20):
+            Person.objects.create(team=self.team, distinct_ids=[f"person_{i}"], properties={"email": "tim@posthog.com"})
+
+        with capture_db_queries() as small_batch:
+            self.client.post(
+                f"/api/projects/{self.team.id}/feature_flags/evaluate_batch",
+                {"distinct_ids": ["person_0"]},
+                format="json",
+            )
+        with capture_db_queries() as large_batch:
+            response = self.client.post(
+                f"/api/projects/{self.team.id}/feature_flags/evaluate_batch",
+                {"distinct_ids": [f"person_{i}" for i in range(20)]},
+                format="json",
+            )
+
+        self.assertEqual(len(small_batch.captured_queries), len(large_batch.captured_queries))
+        self.assertTrue(all(flags == {"email-flag": True} for flags in response.json()["flags"].values()))
+
+    def test_evaluate_batch_validates_distinct_ids(self):
+        response = self.client.post(
+            f"/api/projects/{self.team.id}/feature_flags/evaluate_batch", {"distinct_ids": []}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     @patch("posthog.api.feature_flag.report_user_action")
     def test_evaluation_reasons(self, mock_capture):
         FeatureFlag.objects.all().delete()
@@ -12,6 +12,7 @@ from rest_framework import status
 from ee.api.test.base import LicensedTestMixin
 from ee.models import DashboardPrivilege
 from ee.models.explicit_team_membership import ExplicitTeamMembership
+from posthog.caching import insight_result_cache
 from posthog.caching.update_cache import synchronously_update_insight_cache
 from posthog.models import (
     Cohort,
@@ -753,6 +754,23 @@ class TestInsight(ClickhouseTestMixin, LicensedTestMixin, APIBaseTest, QueryMatc
         self.assertEqual(objects[0].filters["layout"], "horizontal")
         self.assertEqual(len(objects[0].short_id), 8)
 
+    def test_insight_result_found_under_current_filters_hash(self):
+        insight = Insight.objects.create(filters={"events": [{"id": "$pageview"}]}, team=self.team)
+        current_filters_hash = insight.filters_hash
+        # As if the hash was stored before the way filters are serialized changed
+        Insight.objects.filter(pk=insight.pk).update(filters_hash="stale_filters_hash")
+        insight_result_cache.set(
+            current_filters_hash, {"result": [{"data": [1, 2]}], "last_refresh": timezone.now()}, timeout=60
+        )
+
+        response = self.client.get(f"/api/projects/{self.team.id}/insights/{insight.pk}/").json()
+
+        self.assertEqual(response["result"], [{"data": [1, 2]}])
+        self.assertEqual(response["filters_hash"], current_filters_hash)
+        # Reads don't write, the stored hash is fixed by the `recompute_insight_filters_hashes` command
+        insight.refresh_from_db()
+        self.assertEqual(insight.filters_hash, "stale_filters_hash")
+
     @patch("posthog.api.insight.synchronously_update_insight_cache", wraps=synchronously_update_insight_cache)
     def test_insight_refreshing(self, spy_update_insight_cache):
         dashboard_id, _ = self._create_dashboard({"filters": {"date_from": "-14d"}})
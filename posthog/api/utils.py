@@ -2,7 +2,7 @@ import json
 import re
 from dataclasses import dataclass
 from enum import Enum, auto
-from typing import Any, List, Optional, Tuple, Union, cast
+from typing import Any, List, Optional, Tuple, Union
 from uuid import UUID
 
 import structlog
@@ -18,7 +18,7 @@ from posthog.models import Entity, EventDefinition
 from posthog.models.entity import MathType
 from posthog.models.filters.filter import Filter
 from posthog.models.filters.stickiness_filter import StickinessFilter
-from posthog.models.team import Team
+from posthog.models.team import Team, get_cached_team_for_token
 from posthog.models.user import User
 from posthog.utils import cors_response, load_data_from_request
 
@@ -276,16 +276,14 @@ def get_event_ingestion_context_for_token(token: str) -> Optional[EventIngestion
     """
     Based on a token associated with a Team, retrieve the context that is
     required to ingest events.
+
+    Served from the per-process team token cache where possible, see
+    `posthog.models.team.team_caching`.
     """
-    try:
-        team_id, anonymize_ips = Team.objects.values_list("id", "anonymize_ips").get(api_token=token)
-        # NOTE: Not sure why, but I needed to do this cast otherwise I got
-        # `Optional[bool]` instead of `bool` from mypy, even though
-        # anonymize_ips is non-null in the model
-        anonymize_ips = cast(bool, anonymize_ips)
-        return EventIngestionContext(team_id=team_id, anonymize_ips=anonymize_ips)
-    except Team.DoesNotExist:
+    team = get_cached_team_for_token(token)
+    if team is None:
         return None
+    return EventIngestionContext(team_id=team.id, anonymize_ips=team.anonymize_ips)
 
 
 def get_event_ingestion_context_for_personal_api_key(
@@ -1,6 +1,9 @@
+import threading
+import time
+from collections import OrderedDict
 from datetime import timedelta
 from functools import wraps
-from typing import no_type_check
+from typing import Any, Callable, Tuple, no_type_check
 
 from django.utils.timezone import now
 
@@ -41,3 +44,56 @@ def instance_memoize(callback):
         return memo[args]
 
     return _inner
+
+
+class LocalTTLCache:
+    """
+    A bounded, thread-safe, in-process LRU cache where every entry also expires after `ttl_seconds`.
+
+    Used for hot-path lookups (e.g. token to team on /capture and /decide) where a round trip to Redis or
+    Postgres on every request is too expensive, and a few seconds of staleness is acceptable.
+    """
+
+    _missing = object()
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key, self._missing)
+            if entry is self._missing:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Any, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: Any) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_where(self, predicate: Callable[[Any, Any], bool]) -> None:
+        "Evicts every entry for which `predicate(key, value)` is truthy."
+        with self._lock:
+            for key in [key for key, (_, value) in self._entries.items() if predicate(key, value)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,49 @@
+"""
+Short-lived cache of serialized persons and groups, as shown in persons modals and other actors lists.
+
+The same top actors are listed again and again while an actors list is paged through or several insights are
+clicked into, so `get_people` and `get_groups` only go to Postgres for the actors missing from here. Entries are
+dropped when persons or groups are written through Django (see `posthog.models.person.util` and
+`posthog.models.group.util`). Updates made by the plugin server only show up once entries expire, which is why the
+TTL is kept short.
+"""
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from statshog.defaults.django import statsd
+
+PERSON = "person"
+
+
+def group_kind(group_type_index: int) -> str:
+    return f"group_{group_type_index}"
+
+
+def is_enabled() -> bool:
+    return settings.ACTOR_HYDRATION_CACHE_TTL_SECONDS > 0
+
+
+def _key(kind: str, team_id: int, actor_id: Any) -> str:
+    return f"actor_hydration:{team_id}:{kind}:{actor_id}"
+
+
+def get_many(kind: str, team_id: int, actor_ids: Iterable[Any]) -> Dict[str, Any]:
+    "Returns the cached actors found, by their id as a string."
+    keys = {_key(kind, team_id, actor_id): str(actor_id) for actor_id in actor_ids}
+    found = cache.get_many(list(keys))
+    statsd.incr("actor_hydration_cache.hit", len(found), tags={"kind": kind})
+    statsd.incr("actor_hydration_cache.miss", len(keys) - len(found), tags={"kind": kind})
+    return {keys[key]: actor for key, actor in found.items()}
+
+
+def set_many(kind: str, team_id: int, actors: Mapping[str, Any]) -> None:
+    cache.set_many(
+        {_key(kind, team_id, actor_id): actor for actor_id, actor in actors.items()},
+        timeout=settings.ACTOR_HYDRATION_CACHE_TTL_SECONDS,
+    )
+
+
+def invalidate(kind: str, team_id: int, actor_id: Optional[Any]) -> None:
+    if actor_id is not None and is_enabled():
+        cache.delete(_key(kind, team_id, actor_id))
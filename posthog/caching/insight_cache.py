@@ -1,17 +1,20 @@
 from datetime import datetime, timedelta
 from time import perf_counter
 from typing import Any, Dict, List, Optional, Tuple, cast
-from uuid import UUID
+from uuid import UUID, uuid4
 
 import structlog
 from django.conf import settings
-from django.core.cache import cache
 from django.db import connection
 from django.utils.timezone import now
 from sentry_sdk.api import capture_exception
 from statshog.defaults.django import statsd
 
+from posthog.caching import insight_result_cache
 from posthog.caching.calculate_results import calculate_result_by_insight
+from posthog.caching.insight_query_cost import count_running_queries, record_refresh_read_rows
+from posthog.caching.single_flight import single_flight
+from posthog.clickhouse.query_tagging import tag_queries
 from posthog.models import Dashboard, Insight, InsightCachingState, Team
 from posthog.models.instance_setting import get_instance_setting
 
@@ -20,6 +23,13 @@ logger = structlog.get_logger(__name__)
 REQUEUE_DELAY = timedelta(hours=2)
 MAX_ATTEMPTS = 3
 
+# Refreshes are scheduled by how overdue they are, weighed by priority, over how much they cost. A refresh that
+# hasn't been measured yet is assumed to take DEFAULT_REFRESH_DURATION_MS, reading READ_ROWS_PER_COST_SECOND rows
+# costs as much as a second of query time.
+DEFAULT_REFRESH_DURATION_MS = 1000
+MIN_REFRESH_DURATION_MS = 100
+READ_ROWS_PER_COST_SECOND = 100_000_000
+
 
 def schedule_cache_updates():
     from posthog.celery import update_cache_task
@@ -27,7 +37,24 @@ def schedule_cache_updates():
     # :TODO: Separate celery queue for updates rather than limiting via this method
     PARALLEL_INSIGHT_CACHE = get_instance_setting("PARALLEL_DASHBOARD_ITEM_CACHE")
 
-    to_update = fetch_states_in_need_of_updating(limit=PARALLEL_INSIGHT_CACHE)
+    try:
+        record_refresh_read_rows()
+    except Exception as err:
+        logger.warn("Failed to record read rows of insight cache refreshes", exception=err)
+
+    limit = PARALLEL_INSIGHT_CACHE
+    max_running_queries = settings.INSIGHT_CACHE_MAX_RUNNING_CLICKHOUSE_QUERIES
+    running_queries = count_running_queries() if max_running_queries > 0 else None
+    if running_queries is not None:
+        statsd.gauge("insight_cache_scheduler_clickhouse_running_queries", running_queries)
+        # Back off while ClickHouse is busy, refreshes can wait for it to catch up with the queries users are waiting on
+        limit = min(limit, max(max_running_queries - running_queries, 0))
+        if limit == 0:
+            statsd.incr("insight_cache_scheduler_backpressure")
+            logger.info("Not scheduling cache updates, ClickHouse is busy", running_queries=running_queries)
+            return
+
+    to_update = fetch_states_in_need_of_updating(limit=limit)
     # :TRICKY: Schedule tasks and deduplicate by ID to avoid clashes
     representative_by_cache_key = set()
     for team_id, cache_key, caching_state_id in to_update:
@@ -46,41 +73,92 @@ def schedule_cache_updates():
 
 
 def fetch_states_in_need_of_updating(limit: int) -> List[Tuple[int, str, UUID]]:
+    """
+    Picks the caching states most worth refreshing: never calculated ones first, then by how overdue they are times
+    how often they should be refreshed, over what their last refresh cost.
+
+    Teams can't have more than INSIGHT_CACHE_MAX_REFRESHES_PER_TEAM refreshes queued at once, so that a team with
+    many expensive insights can't hold up everyone else's.
+    """
     current_time = now()
     with connection.cursor() as cursor:
         cursor.execute(
             """
-            SELECT team_id, cache_key, id
-            FROM posthog_insightcachingstate
-            WHERE target_cache_age_seconds IS NOT NULL
-            AND refresh_attempt < %(max_attempts)s
-            AND (
-                last_refresh IS NULL OR
-                last_refresh < %(current_time)s - target_cache_age_seconds * interval '1' second
+            WITH in_flight AS (
+                SELECT team_id, count(*) AS in_flight
+                FROM posthog_insightcachingstate
+                WHERE last_refresh_queued_at >= %(last_refresh_queued_at_threshold)s
+                AND (last_refresh IS NULL OR last_refresh < last_refresh_queued_at)
+                GROUP BY team_id
+            ), candidates AS (
+                SELECT
+                    team_id,
+                    cache_key,
+                    id,
+                    last_refresh IS NULL AS never_refreshed,
+                    (
+                        EXTRACT(EPOCH FROM (%(current_time)s - last_refresh)) / target_cache_age_seconds
+                        * (86400.0 / target_cache_age_seconds)
+                    ) / (
+                        GREATEST(
+                            COALESCE(last_refresh_duration_ms, %(default_duration_ms)s),
+                            %(min_duration_ms)s
+                        ) / 1000.0
+                        + COALESCE(last_refresh_read_rows, 0) / %(read_rows_per_cost_second)s
+                    ) AS value_per_cost
+                FROM posthog_insightcachingstate
+                WHERE target_cache_age_seconds IS NOT NULL
+                AND refresh_attempt < %(max_attempts)s
+                AND (
+                    last_refresh IS NULL OR
+                    last_refresh < %(current_time)s - target_cache_age_seconds * interval '1' second
+                )
+                AND (
+                    last_refresh_queued_at IS NULL OR
+                    last_refresh_queued_at < %(last_refresh_queued_at_threshold)s
+                )
+            ), ranked AS (
+                SELECT
+                    *,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY team_id ORDER BY never_refreshed DESC, value_per_cost DESC NULLS LAST
+                    ) AS team_rank
+                FROM candidates
             )
-            AND (
-                last_refresh_queued_at IS NULL OR
-                last_refresh_queued_at < %(last_refresh_queued_at_threshold)s
-            )
-            ORDER BY last_refresh ASC NULLS FIRST
+            SELECT ranked.team_id, ranked.cache_key, ranked.id
+            FROM ranked
+            LEFT JOIN in_flight ON in_flight.team_id = ranked.team_id
+            WHERE ranked.team_rank + COALESCE(in_flight.in_flight, 0) <= %(max_per_team)s
+            ORDER BY ranked.never_refreshed DESC, ranked.value_per_cost DESC NULLS LAST
             LIMIT %(limit)s
             """,
             {
                 "max_attempts": MAX_ATTEMPTS,
                 "current_time": current_time,
                 "last_refresh_queued_at_threshold": current_time - REQUEUE_DELAY,
+                "default_duration_ms": DEFAULT_REFRESH_DURATION_MS,
+                "min_duration_ms": MIN_REFRESH_DURATION_MS,
+                "read_rows_per_cost_second": float(READ_ROWS_PER_COST_SECOND),
+                "max_per_team": settings.INSIGHT_CACHE_MAX_REFRESHES_PER_TEAM,
                 "limit": limit,
             },
         )
         return cursor.fetchall()
 
 
-def update_cache(caching_state_id: UUID):
+def update_cache(caching_state_id: UUID, revalidate: bool = False):
+    """
+    Recalculates the result of an insight caching state if it's due. `revalidate` recalculates it regardless, for
+    stale results that were just served (see posthog/caching/stale_while_revalidate.py).
+    """
     caching_state = InsightCachingState.objects.get(pk=caching_state_id)
 
-    if caching_state.target_cache_age_seconds is None or (
-        caching_state.last_refresh is not None
-        and now() - caching_state.last_refresh < timedelta(seconds=caching_state.target_cache_age_seconds)
+    if not revalidate and (
+        caching_state.target_cache_age_seconds is None
+        or (
+            caching_state.last_refresh is not None
+            and now() - caching_state.last_refresh < timedelta(seconds=caching_state.target_cache_age_seconds)
+        )
     ):
         statsd.incr("caching_state_update_skipped")
         return
@@ -99,8 +177,15 @@ def update_cache(caching_state_id: UUID):
         "last_refresh_queued_at": caching_state.last_refresh_queued_at,
     }
 
+    # Lets record_refresh_read_rows find this refresh's queries in ClickHouse's query log
+    tag_queries(cache_refresh_id=str(uuid4()))
+
     try:
-        cache_key, cache_type, result = calculate_result_by_insight(team=team, insight=insight, dashboard=dashboard)
+        cache_key, cache_type, result = single_flight(
+            caching_state.cache_key,
+            lambda: calculate_result_by_insight(team=team, insight=insight, dashboard=dashboard),
+            tag="update_cache",
+        )
     except Exception as err:
         capture_exception(err, metadata)
         exception = err
@@ -113,6 +198,7 @@ def update_cache(caching_state_id: UUID):
             cast(str, cache_key),
             timestamp,
             {"result": result, "type": cache_type, "last_refresh": timestamp},
+            duration=duration,
         )
         statsd.incr("caching_state_update_success")
         statsd.incr("caching_state_update_rows_updated", rows_updated)
@@ -131,20 +217,25 @@ def update_cache(caching_state_id: UUID):
         if caching_state.refresh_attempt < MAX_ATTEMPTS:
             from posthog.celery import update_cache_task
 
-            update_cache_task.apply_async(args=[caching_state_id], countdown=timedelta(minutes=10).total_seconds())
+            update_cache_task.apply_async(
+                args=[caching_state_id, revalidate], countdown=timedelta(minutes=10).total_seconds()
+            )
 
         InsightCachingState.objects.filter(pk=caching_state.pk).update(
             refresh_attempt=caching_state.refresh_attempt + 1, last_refresh_queued_at=now()
         )
 
 
-def update_cached_state(team_id: int, cache_key: str, timestamp: datetime, result: Any):
-    cache.set(cache_key, result, settings.CACHED_RESULTS_TTL)
+def update_cached_state(
+    team_id: int, cache_key: str, timestamp: datetime, result: Any, duration: Optional[float] = None
+):
+    insight_result_cache.set(cache_key, result, settings.CACHED_RESULTS_TTL, team_id=team_id)
 
+    cost: Dict[str, Any] = {"last_refresh_duration_ms": int(duration * 1000)} if duration is not None else {}
     # :TRICKY: We update _all_ states with same cache_key to avoid needless re-calculations and
     #   handle race conditions around cache_key changing.
     return InsightCachingState.objects.filter(team_id=team_id, cache_key=cache_key).update(
-        last_refresh=timestamp, refresh_attempt=0
+        last_refresh=timestamp, refresh_attempt=0, **cost
     )
 
 
@@ -0,0 +1,79 @@
+import operator
+from datetime import timedelta
+from functools import reduce
+from typing import List, Optional, Tuple
+
+import structlog
+from django.conf import settings
+from django.db.models import BigIntegerField, Case, F, Q, Value, When
+from statshog.defaults.django import statsd
+
+from posthog.client import sync_execute
+from posthog.models import InsightCachingState
+
+logger = structlog.get_logger(__name__)
+
+# How far back to look for insight cache refreshes in the query log. Runs often, so overlapping windows are fine
+QUERY_LOG_LOOKBACK = timedelta(minutes=15)
+
+# Queries of insight cache refreshes are tagged with `cache_refresh_id`, see `update_cache`
+GET_REFRESH_READ_ROWS_SQL = """
+SELECT team_id, cache_key, toInt64(avg(read_rows))
+FROM (
+    SELECT
+        JSONExtractInt(log_comment, 'team_id') AS team_id,
+        JSONExtractString(log_comment, 'cache_key') AS cache_key,
+        JSONExtractString(log_comment, 'cache_refresh_id') AS cache_refresh_id,
+        sum(read_rows) AS read_rows
+    FROM clusterAllReplicas(%(cluster)s, system, 'query_log')
+    WHERE type = 'QueryFinish'
+      AND is_initial_query
+      AND event_time > now() - toIntervalSecond(%(lookback_seconds)s)
+      AND JSONExtractString(log_comment, 'cache_refresh_id') != ''
+    GROUP BY team_id, cache_key, cache_refresh_id
+)
+GROUP BY team_id, cache_key
+"""
+
+GET_RUNNING_QUERIES_SQL = """
+SELECT count()
+FROM clusterAllReplicas(%(cluster)s, system, 'processes')
+WHERE is_initial_query
+"""
+
+
+def record_refresh_read_rows() -> int:
+    """
+    Stores how many rows recent insight cache refreshes read, as ClickHouse's query log has them.
+    Returns how many caching states got updated.
+    """
+    rows: List[Tuple[int, str, int]] = sync_execute(
+        GET_REFRESH_READ_ROWS_SQL,
+        {"cluster": settings.CLICKHOUSE_CLUSTER, "lookback_seconds": int(QUERY_LOG_LOOKBACK.total_seconds())},
+    )
+    if not rows:
+        return 0
+
+    read_rows_by_key = {(team_id, cache_key): read_rows for team_id, cache_key, read_rows in rows}
+    matches = [Q(team_id=team_id, cache_key=cache_key) for team_id, cache_key in read_rows_by_key]
+    updated = InsightCachingState.objects.filter(reduce(operator.or_, matches)).update(
+        last_refresh_read_rows=Case(
+            *(
+                When(team_id=team_id, cache_key=cache_key, then=Value(read_rows))
+                for (team_id, cache_key), read_rows in read_rows_by_key.items()
+            ),
+            default=F("last_refresh_read_rows"),
+            output_field=BigIntegerField(),
+        )
+    )
+    statsd.incr("insight_cache_read_rows_recorded", updated)
+    return updated
+
+
+def count_running_queries() -> Optional[int]:
+    "Number of queries running on the ClickHouse cluster, or None if that can't be told right now."
+    try:
+        return sync_execute(GET_RUNNING_QUERIES_SQL, {"cluster": settings.CLICKHOUSE_CLUSTER})[0][0]
+    except Exception as err:
+        logger.warn("insight_cache.count_running_queries_failed", exception=err)
+        return None
@@ -0,0 +1,186 @@
+"""
+Storage for calculated insight results, in front of Django's cache.
+
+Results are pickled and compressed (zstd or lz4 when installed, zlib otherwise) before they're sent to Redis, as
+breakdown and paths results easily reach megabytes. Recently used results are also kept compressed in a small
+in-process tier, so the same result being read several times by one request or by a dashboard being polled doesn't
+go to Redis each time.
+
+Every team gets a budget of bytes in Redis. Once a team's results go over it, its least recently written results are
+evicted, so that a few teams with huge results can't push everyone else's results (and other keys) out of Redis.
+
+Values not written through here (e.g. before compression was enabled) are read as they are.
+"""
+import pickle
+import time
+import zlib
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import structlog
+from django.conf import settings
+from django.core.cache import cache
+from statshog.defaults.django import statsd
+
+from posthog.cache_utils import LocalTTLCache
+from posthog.redis import get_client
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover
+    lz4_frame = None
+
+logger = structlog.get_logger(__name__)
+
+# Prefix of values written by this module, followed by a byte naming the compression used
+MAGIC = b"\x00phirc"
+
+# Evicting is done a few keys at a time, to bound the work a single write does
+EVICTION_BATCH_SIZE = 20
+
+
+def _zstd_compress(data: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=3).compress(data)
+
+
+def _zstd_decompress(data: bytes) -> bytes:
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+CODECS: Dict[str, Tuple[bytes, Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    "none": (b"0", lambda data: data, lambda data: data),
+    "zlib": (b"1", lambda data: zlib.compress(data, 6), zlib.decompress),
+}
+if lz4_frame is not None:
+    CODECS["lz4"] = (b"2", lz4_frame.compress, lz4_frame.decompress)
+if zstandard is not None:
+    CODECS["zstd"] = (b"3", _zstd_compress, _zstd_decompress)
+
+DECOMPRESSORS_BY_ID = {codec_id: decompress for codec_id, _, decompress in CODECS.values()}
+
+_local_tier = LocalTTLCache(
+    max_size=settings.INSIGHT_RESULT_CACHE_LOCAL_MAX_ENTRIES,
+    ttl_seconds=settings.INSIGHT_RESULT_CACHE_LOCAL_TTL_SECONDS,
+)
+
+
+def _codec_name() -> str:
+    codec = settings.INSIGHT_RESULT_CACHE_COMPRESSION
+    if codec == "auto":
+        return "zstd" if "zstd" in CODECS else "lz4" if "lz4" in CODECS else "zlib"
+    if codec not in CODECS:
+        raise ImportError(f"INSIGHT_RESULT_CACHE_COMPRESSION is set to {codec}, which is not available")
+    return codec
+
+
+def encode(value: Any) -> Any:
+    codec = _codec_name()
+    if codec == "none":
+        return value
+    codec_id, compress, _ = CODECS[codec]
+    return MAGIC + codec_id + compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def decode(stored: Any) -> Any:
+    if not isinstance(stored, bytes) or not stored.startswith(MAGIC):
+        return stored
+    codec_id = stored[len(MAGIC) : len(MAGIC) + 1]
+    return pickle.loads(DECOMPRESSORS_BY_ID[codec_id](stored[len(MAGIC) + 1 :]))
+
+
+def get(key: str) -> Any:
+    stored = _local_tier.get(key)
+    if stored is not None:
+        statsd.incr("insight_result_cache.hit", tags={"tier": "local"})
+    else:
+        stored = cache.get(key)
+        if stored is None:
+            statsd.incr("insight_result_cache.miss")
+            return None
+        statsd.incr("insight_result_cache.hit", tags={"tier": "redis"})
+        if isinstance(stored, bytes):
+            statsd.incr("insight_result_cache.bytes_read", len(stored))
+            _set_local(key, stored)
+    # Decoding every time also means callers always get their own copy to modify
+    return decode(stored)
+
+
+def set(key: str, value: Any, timeout: int, team_id: Optional[int] = None) -> None:
+    stored = encode(value)
+    cache.set(key, stored, timeout)
+
+    if isinstance(stored, bytes):
+        statsd.incr("insight_result_cache.bytes_written", len(stored))
+        _set_local(key, stored)
+        if team_id is not None:
+            _enforce_team_budget(team_id, key, len(stored))
+    else:
+        _local_tier.delete(key)
+
+
+def touch(key: str, timeout: int) -> None:
+    cache.touch(key, timeout=timeout)
+
+
+def delete(key: str) -> None:
+    _local_tier.delete(key)
+    cache.delete(key)
+
+
+def _set_local(key: str, stored: bytes) -> None:
+    if len(stored) <= settings.INSIGHT_RESULT_CACHE_LOCAL_MAX_ENTRY_BYTES:
+        _local_tier.set(key, stored)
+    else:
+        _local_tier.delete(key)
+
+
+def _team_keys(team_id: int) -> Tuple[str, str, str]:
+    prefix = f"insight_result_cache:team:{team_id}"
+    return f"{prefix}:written_at", f"{prefix}:sizes", f"{prefix}:total_bytes"
+
+
+def _enforce_team_budget(team_id: int, key: str, size: int) -> None:
+    budget = settings.INSIGHT_RESULT_CACHE_TEAM_BUDGET_BYTES
+    if budget <= 0:
+        return
+
+    written_at_key, sizes_key, total_key = _team_keys(team_id)
+    try:
+        redis = get_client()
+        previous_size = int(redis.hget(sizes_key, key) or 0)
+        pipeline = redis.pipeline()
+        pipeline.zadd(written_at_key, {key: time.time()})
+        pipeline.hset(sizes_key, key, size)
+        pipeline.incrby(total_key, size - previous_size)
+        for accounting_key in (written_at_key, sizes_key, total_key):
+            pipeline.expire(accounting_key, settings.CACHED_RESULTS_TTL)
+        total_bytes = pipeline.execute()[2]
+        statsd.gauge("insight_result_cache.team_bytes", total_bytes, tags={"team_id": team_id})
+
+        while total_bytes > budget:
+            # :TRICKY: Results that expired by themselves are still counted until they come up for eviction here
+            oldest_keys = [
+                oldest_key.decode()
+                for oldest_key in redis.zrange(written_at_key, 0, EVICTION_BATCH_SIZE - 1)
+                if oldest_key.decode() != key
+            ]
+            if not oldest_keys:
+                break
+            sizes = redis.hmget(sizes_key, oldest_keys)
+            for oldest_key, oldest_size in zip(oldest_keys, sizes):
+                delete(oldest_key)
+                pipeline.zrem(written_at_key, oldest_key)
+                pipeline.hdel(sizes_key, oldest_key)
+                pipeline.decrby(total_key, int(oldest_size or 0))
+                total_bytes -= int(oldest_size or 0)
+                statsd.incr("insight_result_cache.evicted", tags={"team_id": team_id})
+                if total_bytes <= budget:
+                    break
+            pipeline.execute()
+    except Exception as err:
+        # The budget is only a safeguard, never fail writing a result over it
+        logger.warn("insight_result_cache.budget_failed", team_id=team_id, exception=err)
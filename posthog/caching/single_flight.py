@@ -0,0 +1,118 @@
+import pickle
+import time
+import uuid
+from typing import Callable, Optional, TypeVar
+
+import structlog
+from django.conf import settings
+from statshog.defaults.django import statsd
+
+from posthog.redis import get_client
+
+logger = structlog.get_logger(__name__)
+
+T = TypeVar("T")
+
+# Waiters poll for the leader's result, starting fast and backing off, as most calculations are quick
+MIN_POLL_INTERVAL_SECONDS = 0.05
+MAX_POLL_INTERVAL_SECONDS = 1.0
+
+
+def _lock_key(key: str, tag: str) -> str:
+    # Callers share keys, e.g. insight cache keys, but not the shape of their results
+    return f"single_flight:lock:{tag}:{key}"
+
+
+def _result_key(flight_id: str) -> str:
+    return f"single_flight:result:{flight_id}"
+
+
+def single_flight(key: str, compute: Callable[[], T], tag: str = "unknown") -> T:
+    """
+    Makes sure only one process calculates `compute()` for a given key and tag at a time, across all web and Celery
+    workers. Calls with different tags never share results, even for the same key.
+
+    The first caller takes a lock in Redis and runs the calculation. Everyone else arriving while it runs waits for
+    it and gets a copy of its result instead of starting the same calculation. If the leader fails, one of the
+    waiters takes over. Waiters that time out, or can't reach Redis, calculate the result themselves.
+
+    Results are pickled, like the Django cache does, so they must be picklable.
+    """
+    if not settings.SINGLE_FLIGHT_ENABLED:
+        return compute()
+
+    deadline = time.monotonic() + settings.SINGLE_FLIGHT_WAIT_TIMEOUT_SECONDS
+    wait_started_at: Optional[float] = None
+    poll_interval = MIN_POLL_INTERVAL_SECONDS
+
+    while True:
+        flight_id = uuid.uuid4().hex
+        try:
+            client = get_client()
+            acquired = client.set(
+                _lock_key(key, tag), flight_id, nx=True, ex=settings.SINGLE_FLIGHT_LOCK_TIMEOUT_SECONDS
+            )
+            leader_flight_id = None if acquired else client.get(_lock_key(key, tag))
+        except Exception as e:
+            logger.warning("single_flight_redis_failed", key=key, exc_info=e)
+            statsd.incr("single_flight_error", tags={"tag": tag})
+            return compute()
+
+        if acquired:
+            statsd.incr("single_flight_leader", tags={"tag": tag})
+            return _compute_as_leader(key, flight_id, compute, tag)
+
+        if leader_flight_id is not None:
+            if wait_started_at is None:
+                wait_started_at = time.monotonic()
+            result_payload = client.get(_result_key(leader_flight_id.decode("utf-8")))
+            if result_payload is not None:
+                statsd.incr("single_flight_coalesced", tags={"tag": tag})
+                statsd.timing("single_flight_wait_time", (time.monotonic() - wait_started_at) * 1000, tags={"tag": tag})
+                return pickle.loads(result_payload)
+
+        # Either the leader is still calculating, or it failed and released the lock. In both cases look again:
+        # we'll either find a result or become the leader ourselves.
+        if time.monotonic() + poll_interval > deadline:
+            statsd.incr("single_flight_wait_timeout", tags={"tag": tag})
+            logger.warning("single_flight_wait_timeout", key=key)
+            return compute()
+
+        time.sleep(poll_interval)
+        poll_interval = min(poll_interval * 2, MAX_POLL_INTERVAL_SECONDS)
+
+
+def _compute_as_leader(key: str, flight_id: str, compute: Callable[[], T], tag: str) -> T:
+    try:
+        result = compute()
+    except Exception:
+        # Let one of the waiters try instead
+        _finish_flight(key, flight_id, tag, result_ttl_seconds=None)
+        raise
+
+    try:
+        get_client().set(_result_key(flight_id), pickle.dumps(result), ex=settings.SINGLE_FLIGHT_RESULT_TTL_SECONDS)
+    except Exception as e:
+        logger.warning("single_flight_result_store_failed", key=key, exc_info=e)
+        statsd.incr("single_flight_error", tags={"tag": tag})
+        _finish_flight(key, flight_id, tag, result_ttl_seconds=None)
+    else:
+        # The lock is kept around for as long as the result, so that waiters find the result through it
+        _finish_flight(key, flight_id, tag, result_ttl_seconds=settings.SINGLE_FLIGHT_RESULT_TTL_SECONDS)
+    return result
+
+
+def _finish_flight(key: str, flight_id: str, tag: str, result_ttl_seconds: Optional[int]) -> None:
+    try:
+        client = get_client()
+        # :TRICKY: Only touch our own lock: if ours expired mid-calculation, another leader may have taken over.
+        # The check and the update aren't atomic, but losing that race only costs a duplicate calculation.
+        if client.get(_lock_key(key, tag)) != flight_id.encode("utf-8"):
+            return
+        if result_ttl_seconds is None:
+            client.delete(_lock_key(key, tag))
+        else:
+            client.expire(_lock_key(key, tag), result_ttl_seconds)
+    except Exception as e:
+        logger.warning("single_flight_release_failed", key=key, exc_info=e)
+        statsd.incr("single_flight_error", tags={"tag": tag})
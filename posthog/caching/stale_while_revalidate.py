@@ -0,0 +1,69 @@
+from datetime import timedelta
+from enum import Enum
+from typing import Any, Dict
+
+import structlog
+from django.conf import settings
+from django.db.models import Q
+from django.utils.timezone import now
+from statshog.defaults.django import statsd
+
+from posthog.caching.utils import ensure_is_date
+from posthog.models import InsightCachingState, Team
+
+logger = structlog.get_logger(__name__)
+
+# How long to wait for a queued revalidation before queueing another one for the same result
+REVALIDATE_REQUEUE_DELAY = timedelta(minutes=10)
+
+
+class CacheFreshness(str, Enum):
+    FRESH = "fresh"
+    # Served right away while a newer result is calculated in the background
+    STALE = "stale"
+    # Too old to be served at all
+    EXPIRED = "expired"
+
+
+def get_cache_freshness(team: Team, cached_result_package: Dict[str, Any]) -> CacheFreshness:
+    if not settings.STALE_WHILE_REVALIDATE_ENABLED:
+        return CacheFreshness.FRESH
+
+    last_refresh = ensure_is_date(cached_result_package.get("last_refresh"))
+    if last_refresh is None:
+        # cached before results were timestamped, there's nothing to go by
+        return CacheFreshness.FRESH
+
+    age_seconds = (now() - last_refresh).total_seconds()
+    if age_seconds > (team.insight_cache_max_age_seconds or settings.CACHED_RESULTS_TTL):
+        return CacheFreshness.EXPIRED
+    if age_seconds > settings.STALE_WHILE_REVALIDATE_AFTER_SECONDS:
+        return CacheFreshness.STALE
+    return CacheFreshness.FRESH
+
+
+def revalidate_in_background(team_id: int, cache_key: str) -> bool:
+    """
+    Queues a recalculation of a stale cached result through the insight caching states using it.
+
+    Returns False if nothing was queued, because no saved insight or dashboard tile uses the result or because a
+    recalculation was queued recently already.
+    """
+    from posthog.celery import update_cache_task
+
+    not_queued_recently = Q(last_refresh_queued_at__isnull=True) | Q(
+        last_refresh_queued_at__lt=now() - REVALIDATE_REQUEUE_DELAY
+    )
+    caching_states = InsightCachingState.objects.filter(team_id=team_id, cache_key=cache_key)
+    caching_state_id = caching_states.filter(not_queued_recently).values_list("pk", flat=True).first()
+    if caching_state_id is None:
+        return False
+
+    # :TRICKY: Claim the states first, so that concurrent requests for the same stale result queue only one task
+    if caching_states.filter(not_queued_recently).update(last_refresh_queued_at=now()) == 0:
+        return False
+
+    update_cache_task.delay(caching_state_id, revalidate=True)
+    statsd.incr("stale_while_revalidate_queued")
+    logger.info("Queued revalidation of stale insight cache", team_id=team_id, cache_key=cache_key)
+    return True
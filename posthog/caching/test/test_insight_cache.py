@@ -8,6 +8,7 @@ from freezegun import freeze_time
 
 from posthog.caching.insight_cache import fetch_states_in_need_of_updating, schedule_cache_updates, update_cache
 from posthog.caching.insight_caching_state import upsert
+from posthog.caching.insight_query_cost import record_refresh_read_rows
 from posthog.caching.test.test_insight_caching_state import create_insight, filter_dict
 from posthog.decorators import CacheType
 from posthog.models import InsightCachingState, Team, User
@@ -164,3 +165,91 @@ def test_update_cache_when_recently_refreshed(spy_calculate_result_by_insight, t
 
     assert spy_calculate_result_by_insight.call_count == 0
     assert updated_caching_state.last_refresh == caching_state.last_refresh
+
+
+@pytest.mark.django_db
+def test_fetch_states_in_need_of_updating_prefers_cheap_refreshes(team: Team, user: User):
+    expensive = create_insight_caching_state(team, user, filters={**filter_dict, "events": [{"id": "$pageleave"}]})
+    cheap = create_insight_caching_state(team, user)
+    InsightCachingState.objects.filter(pk=expensive.pk).update(last_refresh_duration_ms=60_000)
+    InsightCachingState.objects.filter(pk=cheap.pk).update(last_refresh_duration_ms=500)
+
+    assert [id for _, _, id in fetch_states_in_need_of_updating(limit=1)] == [cheap.pk]
+
+
+@pytest.mark.django_db
+def test_fetch_states_in_need_of_updating_prefers_more_overdue_refreshes(team: Team, user: User):
+    create_insight_caching_state(team, user, last_refresh=timedelta(days=2))
+    more_overdue = create_insight_caching_state(
+        team, user, filters={**filter_dict, "events": [{"id": "$pageleave"}]}, last_refresh=timedelta(days=20)
+    )
+
+    assert [id for _, _, id in fetch_states_in_need_of_updating(limit=1)] == [more_overdue.pk]
+
+
+@pytest.mark.django_db
+def test_fetch_states_in_need_of_updating_caps_refreshes_per_team(settings, team: Team, user: User):
+    settings.INSIGHT_CACHE_MAX_REFRESHES_PER_TEAM = 2
+    for event in ["$pageview", "$pageleave", "$autocapture"]:
+        create_insight_caching_state(team, user, filters={**filter_dict, "events": [{"id": event}]})
+    other_team = Team.objects.create(organization=team.organization)
+    create_insight_caching_state(other_team, user)
+
+    results = fetch_states_in_need_of_updating(limit=10)
+
+    assert sorted(team_id for team_id, _, _ in results) == sorted([team.pk, team.pk, other_team.pk])
+
+    # refreshes that are still queued count towards the cap
+    create_insight_caching_state(
+        team,
+        user,
+        filters={**filter_dict, "events": [{"id": "$identify"}]},
+        last_refresh_queued_at=timedelta(minutes=5),
+    )
+
+    results = fetch_states_in_need_of_updating(limit=10)
+
+    assert sorted(team_id for team_id, _, _ in results) == sorted([team.pk, other_team.pk])
+
+
+@pytest.mark.django_db
+@patch("posthog.caching.insight_cache.count_running_queries", return_value=150)
+@patch("posthog.celery.update_cache_task")
+def test_schedule_cache_updates_backs_off_when_clickhouse_is_busy(
+    update_cache_task, _count_running_queries, settings, team: Team, user: User
+):
+    settings.INSIGHT_CACHE_MAX_RUNNING_CLICKHOUSE_QUERIES = 100
+    create_insight_caching_state(team, user, last_refresh=None)
+
+    schedule_cache_updates()
+
+    assert update_cache_task.delay.call_count == 0
+    assert InsightCachingState.objects.get(team=team).last_refresh_queued_at is None
+
+
+@pytest.mark.django_db
+@freeze_time("2020-01-04T13:01:01Z")
+def test_update_cache_records_duration(cache, team: Team, user: User):
+    caching_state = create_insight_caching_state(team, user)
+
+    update_cache(caching_state.pk)
+
+    assert InsightCachingState.objects.get(team=team).last_refresh_duration_ms is not None
+
+
+@pytest.mark.django_db
+def test_record_refresh_read_rows(team: Team, user: User):
+    caching_state = create_insight_caching_state(team, user)
+    other_caching_state = create_insight_caching_state(
+        team, user, filters={**filter_dict, "events": [{"id": "$pageleave"}]}
+    )
+    InsightCachingState.objects.filter(pk=other_caching_state.pk).update(last_refresh_read_rows=5)
+
+    with patch(
+        "posthog.caching.insight_query_cost.sync_execute",
+        return_value=[(team.pk, caching_state.cache_key, 1_000_000), (team.pk + 1, other_caching_state.cache_key, 7)],
+    ):
+        assert record_refresh_read_rows() == 1
+
+    assert InsightCachingState.objects.get(pk=caching_state.pk).last_refresh_read_rows == 1_000_000
+    assert InsightCachingState.objects.get(pk=other_caching_state.pk).last_refresh_read_rows == 5
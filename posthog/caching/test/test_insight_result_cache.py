@@ -0,0 +1,87 @@
+import os
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from posthog.caching import insight_result_cache
+from posthog.redis import get_client
+
+
+@override_settings(
+    INSIGHT_RESULT_CACHE_COMPRESSION="zlib",
+    INSIGHT_RESULT_CACHE_LOCAL_MAX_ENTRY_BYTES=10_000,
+    INSIGHT_RESULT_CACHE_TEAM_BUDGET_BYTES=0,
+)
+class TestInsightResultCache(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        get_client().flushdb()
+        insight_result_cache._local_tier.clear()
+        self.addCleanup(insight_result_cache._local_tier.clear)
+
+    def test_stores_results_compressed(self):
+        package = {"result": [{"data": [1.0] * 1000, "label": "$pageview"}], "type": "Trends"}
+
+        insight_result_cache.set("key", package, 60)
+
+        stored = cache.get("key")
+        self.assertTrue(stored.startswith(insight_result_cache.MAGIC))
+        self.assertLess(len(stored), 200)
+        self.assertEqual(insight_result_cache.get("key"), package)
+
+    def test_reads_values_stored_uncompressed(self):
+        cache.set("key", {"result": [1, 2, 3]}, 60)
+
+        self.assertEqual(insight_result_cache.get("key"), {"result": [1, 2, 3]})
+
+    @override_settings(INSIGHT_RESULT_CACHE_COMPRESSION="none")
+    def test_no_compression(self):
+        insight_result_cache.set("key", {"result": [1, 2, 3]}, 60)
+
+        self.assertEqual(cache.get("key"), {"result": [1, 2, 3]})
+        self.assertEqual(insight_result_cache.get("key"), {"result": [1, 2, 3]})
+
+    def test_serves_recent_results_from_local_tier(self):
+        insight_result_cache.set("key", {"result": [1, 2, 3]}, 60)
+        cache.delete("key")
+
+        self.assertEqual(insight_result_cache.get("key"), {"result": [1, 2, 3]})
+
+        insight_result_cache._local_tier.clear()
+        self.assertIsNone(insight_result_cache.get("key"))
+
+    @override_settings(INSIGHT_RESULT_CACHE_LOCAL_MAX_ENTRY_BYTES=10)
+    def test_large_results_skip_local_tier(self):
+        insight_result_cache.set("key", {"result": [1, 2, 3]}, 60)
+
+        self.assertEqual(len(insight_result_cache._local_tier), 0)
+        self.assertEqual(insight_result_cache.get("key"), {"result": [1, 2, 3]})
+
+    def test_callers_get_their_own_copy(self):
+        insight_result_cache.set("key", {"result": [1, 2, 3]}, 60)
+
+        insight_result_cache.get("key")["is_cached"] = True
+
+        self.assertEqual(insight_result_cache.get("key"), {"result": [1, 2, 3]})
+
+    @override_settings(INSIGHT_RESULT_CACHE_TEAM_BUDGET_BYTES=2500)
+    def test_evicts_oldest_results_of_team_over_budget(self):
+        # random bytes don't compress, so every result takes a bit over 1000 bytes
+        for key in ["a", "b", "c"]:
+            insight_result_cache.set(key, os.urandom(1000), 60, team_id=1)
+        insight_result_cache.set("other_team", os.urandom(1000), 60, team_id=2)
+
+        self.assertIsNone(cache.get("a"))
+        self.assertIsNone(insight_result_cache.get("a"))
+        self.assertIsNotNone(insight_result_cache.get("b"))
+        self.assertIsNotNone(insight_result_cache.get("c"))
+        self.assertIsNotNone(insight_result_cache.get("other_team"))
+
+    @override_settings(INSIGHT_RESULT_CACHE_TEAM_BUDGET_BYTES=2500)
+    def test_rewriting_a_result_does_not_count_twice(self):
+        for _ in range(5):
+            insight_result_cache.set("a", os.urandom(1000), 60, team_id=1)
+        insight_result_cache.set("b", os.urandom(1000), 60, team_id=1)
+
+        self.assertIsNotNone(insight_result_cache.get("a"))
+        self.assertIsNotNone(insight_result_cache.get("b"))
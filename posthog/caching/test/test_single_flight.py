@@ -0,0 +1,87 @@
+import pickle
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase, override_settings
+
+from posthog.caching.single_flight import _lock_key, _result_key, single_flight
+from posthog.redis import get_client
+
+
+@override_settings(SINGLE_FLIGHT_ENABLED=True)
+class TestSingleFlight(SimpleTestCase):
+    def setUp(self):
+        get_client().flushdb()
+
+    def test_disabled_calculates_directly(self):
+        compute = MagicMock(return_value=[1, 2, 3])
+
+        with override_settings(SINGLE_FLIGHT_ENABLED=False):
+            self.assertEqual(single_flight("key", compute), [1, 2, 3])
+
+        compute.assert_called_once()
+        self.assertIsNone(get_client().get(_lock_key("key", "unknown")))
+
+    def test_leader_calculates_and_shares_result(self):
+        compute = MagicMock(return_value={"result": [1, 2, 3]})
+
+        self.assertEqual(single_flight("key", compute), {"result": [1, 2, 3]})
+        # a caller arriving right after the leader finished gets the same result without calculating
+        self.assertEqual(single_flight("key", compute), {"result": [1, 2, 3]})
+
+        compute.assert_called_once()
+
+    def test_waiter_gets_result_of_running_calculation(self):
+        get_client().set(_lock_key("key", "unknown"), "other-flight")
+        compute = MagicMock(return_value="own result")
+
+        def leader_finishes(seconds):
+            get_client().set(_result_key("other-flight"), pickle.dumps("other result"))
+
+        with patch("posthog.caching.single_flight.time.sleep", side_effect=leader_finishes) as mock_sleep:
+            self.assertEqual(single_flight("key", compute), "other result")
+
+        compute.assert_not_called()
+        mock_sleep.assert_called_once()
+
+    def test_waiter_takes_over_when_leader_fails(self):
+        get_client().set(_lock_key("key", "unknown"), "other-flight")
+        compute = MagicMock(return_value="own result")
+
+        def leader_fails(seconds):
+            get_client().delete(_lock_key("key", "unknown"))
+
+        with patch("posthog.caching.single_flight.time.sleep", side_effect=leader_fails):
+            self.assertEqual(single_flight("key", compute), "own result")
+
+        compute.assert_called_once()
+
+    @override_settings(SINGLE_FLIGHT_WAIT_TIMEOUT_SECONDS=0)
+    def test_waiter_calculates_itself_after_timeout(self):
+        get_client().set(_lock_key("key", "unknown"), "other-flight")
+        compute = MagicMock(return_value="own result")
+
+        self.assertEqual(single_flight("key", compute), "own result")
+
+        compute.assert_called_once()
+        # the other calculation still holds the lock
+        self.assertEqual(get_client().get(_lock_key("key", "unknown")), b"other-flight")
+
+    def test_failed_calculation_releases_lock(self):
+        compute = MagicMock(side_effect=ValueError("query failed"))
+
+        with self.assertRaises(ValueError):
+            single_flight("key", compute)
+
+        self.assertIsNone(get_client().get(_lock_key("key", "unknown")))
+
+    def test_redis_errors_fall_back_to_calculating(self):
+        compute = MagicMock(return_value="result")
+
+        with patch("posthog.caching.single_flight.get_client", side_effect=ConnectionError("redis is down")):
+            self.assertEqual(single_flight("key", compute), "result")
+
+        compute.assert_called_once()
+
+    def test_different_tags_dont_share_results(self):
+        self.assertEqual(single_flight("key", lambda: ["list"], tag="update_cache_item"), ["list"])
+        self.assertEqual(single_flight("key", lambda: {"result": []}, tag="cached_function"), {"result": []})
@@ -0,0 +1,83 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+from django.utils.timezone import now
+from freezegun import freeze_time
+
+from posthog.caching.insight_cache import update_cache
+from posthog.caching.stale_while_revalidate import CacheFreshness, get_cache_freshness, revalidate_in_background
+from posthog.caching.test.test_insight_cache import create_insight_caching_state
+from posthog.models import InsightCachingState, Team, User
+
+
+@pytest.fixture
+def stale_while_revalidate(settings):
+    settings.STALE_WHILE_REVALIDATE_ENABLED = True
+    settings.STALE_WHILE_REVALIDATE_AFTER_SECONDS = 60 * 60
+
+
+@pytest.mark.django_db
+@freeze_time("2020-01-04T13:01:01Z")
+@pytest.mark.parametrize(
+    "age,max_age_seconds,expected",
+    [
+        (timedelta(minutes=5), None, CacheFreshness.FRESH),
+        (timedelta(hours=2), None, CacheFreshness.STALE),
+        (timedelta(days=8), None, CacheFreshness.EXPIRED),
+        (timedelta(hours=2), 60 * 60, CacheFreshness.EXPIRED),
+        (None, 60, CacheFreshness.FRESH),
+    ],
+)
+def test_get_cache_freshness(stale_while_revalidate, team: Team, age, max_age_seconds, expected):
+    team.insight_cache_max_age_seconds = max_age_seconds
+    cached_result_package = {"result": [1], "last_refresh": now() - age if age is not None else None}
+
+    assert get_cache_freshness(team, cached_result_package) == expected
+
+
+@pytest.mark.django_db
+def test_get_cache_freshness_when_disabled(settings, team: Team):
+    settings.STALE_WHILE_REVALIDATE_ENABLED = False
+
+    assert (
+        get_cache_freshness(team, {"result": [1], "last_refresh": now() - timedelta(days=30)}) == CacheFreshness.FRESH
+    )
+
+
+@pytest.mark.django_db
+@freeze_time("2020-01-04T13:01:01Z")
+@patch("posthog.celery.update_cache_task")
+def test_revalidate_in_background_queues_once(update_cache_task, team: Team, user: User):
+    caching_state = create_insight_caching_state(team, user)
+    create_insight_caching_state(team, user)
+
+    assert revalidate_in_background(team.pk, caching_state.cache_key)
+    assert not revalidate_in_background(team.pk, caching_state.cache_key)
+
+    update_cache_task.delay.assert_called_once()
+    assert update_cache_task.delay.call_args.kwargs == {"revalidate": True}
+    assert all(state.last_refresh_queued_at == now() for state in InsightCachingState.objects.filter(team=team))
+
+
+@pytest.mark.django_db
+@patch("posthog.celery.update_cache_task")
+def test_revalidate_in_background_without_caching_state(update_cache_task, team: Team):
+    assert not revalidate_in_background(team.pk, "some_ad_hoc_cache_key")
+
+    update_cache_task.delay.assert_not_called()
+
+
+@pytest.mark.django_db
+@freeze_time("2020-01-04T13:01:01Z")
+@patch("posthog.caching.insight_cache.calculate_result_by_insight")
+def test_revalidate_recalculates_recently_refreshed_state(spy_calculate_result_by_insight, team: Team, user: User):
+    caching_state = create_insight_caching_state(
+        team, user, last_refresh=timedelta(hours=2), target_cache_age=timedelta(days=1)
+    )
+    spy_calculate_result_by_insight.return_value = (caching_state.cache_key, "Trends", [])
+
+    update_cache(caching_state.pk, revalidate=True)
+
+    assert spy_calculate_result_by_insight.call_count == 1
+    assert InsightCachingState.objects.get(team=team).last_refresh == now()
@@ -994,7 +994,7 @@ class TestUpdateCache(APIBaseTest):
         statsd_incr.assert_any_call("update_cache_item_success", tags=ANY)
 
     @freeze_time("2021-08-25T22:09:14.252Z")
-    @patch("posthog.caching.update_cache.cache.set")
+    @patch("posthog.caching.insight_result_cache.cache.set")
     @patch("posthog.caching.calculate_results._calculate_by_filter", return_value={"not": "empty result"})
     @patch("posthog.caching.update_cache.group.apply_async")
     @patch("posthog.celery.update_cache_item_task.s")
@@ -1021,7 +1021,7 @@ class TestUpdateCache(APIBaseTest):
         assert tile.last_refresh.isoformat() == "2021-08-25T22:09:14.252000+00:00"
 
     @freeze_time("2021-08-25T22:09:14.252Z")
-    @patch("posthog.caching.update_cache.cache.set")
+    @patch("posthog.caching.insight_result_cache.cache.set")
     @patch("posthog.caching.calculate_results._calculate_by_filter", return_value={"not": "empty result"})
     @patch("posthog.caching.update_cache.group.apply_async")
     @patch("posthog.celery.update_cache_item_task.s")
@@ -1063,7 +1063,7 @@ class TestUpdateCacheForSharedInsights(APIBaseTest):
 
             yield [i for i, _ in recent_teams]
 
-    @patch("posthog.caching.update_cache.cache.set")
+    @patch("posthog.caching.insight_result_cache.cache.set")
     @patch("posthog.caching.calculate_results._calculate_by_filter", return_value={"not": "empty result"})
     @patch("posthog.caching.update_cache.group.apply_async")
     @patch("posthog.celery.update_cache_item_task.s")
@@ -1084,7 +1084,7 @@ class TestUpdateCacheForSharedInsights(APIBaseTest):
         assert insight.filters_hash != test_hash
         assert insight.last_refresh is not None
 
-    @patch("posthog.caching.update_cache.cache.set")
+    @patch("posthog.caching.insight_result_cache.cache.set")
     @patch("posthog.caching.calculate_results._calculate_by_filter", return_value={"not": "empty result"})
     @patch("posthog.caching.update_cache.group.apply_async")
     @patch("posthog.celery.update_cache_item_task.s")
@@ -1116,7 +1116,7 @@ class TestCacheEventsLastSeenUsedToSkipQueries(APIBaseTest):
 
             yield [i for i, _ in recent_teams]
 
-    @patch("posthog.caching.update_cache.cache.set")
+    @patch("posthog.caching.insight_result_cache.cache.set")
     @patch("posthog.caching.calculate_results._calculate_by_filter", return_value={"not": "empty result"})
     @patch("posthog.caching.update_cache.group.apply_async")
     @patch("posthog.celery.update_cache_item_task.s")
@@ -1146,7 +1146,7 @@ class TestCacheEventsLastSeenUsedToSkipQueries(APIBaseTest):
 
         patch_calculate_by_filter.assert_not_called()
 
-    @patch("posthog.caching.update_cache.cache.set")
+    @patch("posthog.caching.insight_result_cache.cache.set")
     @patch("posthog.caching.calculate_results._calculate_by_filter", return_value={"not": "empty result"})
     @patch("posthog.caching.update_cache.group.apply_async")
     @patch("posthog.celery.update_cache_item_task.s")
@@ -1188,7 +1188,7 @@ class TestCacheEventsLastSeenUsedToSkipQueries(APIBaseTest):
 
         patch_calculate_by_filter.assert_any_call(ANY, self.team, "Trends")
 
-    @patch("posthog.caching.update_cache.cache.set")
+    @patch("posthog.caching.insight_result_cache.cache.set")
     @patch("posthog.caching.calculate_results._calculate_by_filter", return_value={"not": "empty result"})
     @patch("posthog.caching.update_cache.group.apply_async")
     @patch("posthog.celery.update_cache_item_task.s")
@@ -1229,7 +1229,7 @@ class TestCacheEventsLastSeenUsedToSkipQueries(APIBaseTest):
 
         patch_calculate_by_filter.assert_any_call(ANY, self.team, "Retention")
 
-    @patch("posthog.caching.update_cache.cache.set")
+    @patch("posthog.caching.insight_result_cache.cache.set")
     @patch("posthog.caching.calculate_results._calculate_by_filter", return_value={"not": "empty result"})
     @patch("posthog.caching.update_cache.group.apply_async")
     @patch("posthog.celery.update_cache_item_task.s")
@@ -1269,7 +1269,7 @@ class TestCacheEventsLastSeenUsedToSkipQueries(APIBaseTest):
 
         patch_calculate_by_filter.assert_any_call(ANY, self.team, "Path")
 
-    @patch("posthog.caching.update_cache.cache.set")
+    @patch("posthog.caching.insight_result_cache.cache.set")
     @patch("posthog.caching.calculate_results._calculate_by_filter", return_value={"not": "empty result"})
     @patch("posthog.caching.update_cache.group.apply_async")
     @patch("posthog.celery.update_cache_item_task.s")
@@ -1,5 +1,6 @@
 import datetime
 import json
+from functools import partial
 from typing import Any, Dict, List, Optional, Tuple, Union
 
 import structlog
@@ -7,7 +8,6 @@ from celery import group
 from celery.canvas import Signature
 from dateutil.relativedelta import relativedelta
 from django.conf import settings
-from django.core.cache import cache
 from django.db.models import Q
 from django.db.models.expressions import F
 from django.db.models.query import QuerySet
@@ -15,12 +15,14 @@ from django.utils import timezone
 from sentry_sdk import capture_exception
 from statshog.defaults.django import statsd
 
+from posthog.caching import insight_result_cache
 from posthog.caching.calculate_results import (
     cache_includes_latest_events,
     calculate_result_by_cache_type,
     get_cache_type,
 )
 from posthog.caching.reporting import CacheUpdateReporting
+from posthog.caching.single_flight import single_flight
 from posthog.caching.utils import active_teams
 from posthog.celery import update_cache_item_task
 from posthog.decorators import CacheType
@@ -28,6 +30,7 @@ from posthog.logging.timing import timed
 from posthog.models import Dashboard, DashboardTile, Filter, Insight, Team
 from posthog.models.filters.utils import get_filter
 from posthog.models.instance_setting import get_instance_setting
+from posthog.queries.executor import run_in_parallel
 from posthog.utils import generate_cache_key
 
 logger = structlog.get_logger(__name__)
@@ -169,12 +172,14 @@ def update_cache_item(key: str, cache_type: CacheType, payload: dict) -> Optiona
     result = None
 
     if cache_includes_latest_events(payload, filter):
-        cache.touch(key, timeout=settings.CACHED_RESULTS_TTL)
+        insight_result_cache.touch(key, timeout=settings.CACHED_RESULTS_TTL)
         cache_update_reporting.on_results("update_cache_item_can_skip_because_events_do_not_invalidate_cache")
     else:
         try:
             if (dashboard_id and dashboard_tiles_queryset.exists()) or insights_queryset.exists():
-                result = _update_cache_for_queryset(cache_type, filter, key, team)
+                result = single_flight(
+                    key, lambda: _update_cache_for_queryset(cache_type, filter, key, team), tag="update_cache_item"
+                )
         except Exception as e:
             cache_update_reporting.on_query_error(e)
             raise e
@@ -201,7 +206,12 @@ def _update_cache_for_queryset(
 ) -> Optional[List[Dict[str, Any]]]:
     result = calculate_result_by_cache_type(cache_type, filter, team)
 
-    cache.set(key, {"result": result, "type": cache_type, "last_refresh": timezone.now()}, settings.CACHED_RESULTS_TTL)
+    insight_result_cache.set(
+        key,
+        {"result": result, "type": cache_type, "last_refresh": timezone.now()},
+        settings.CACHED_RESULTS_TTL,
+        team_id=team.pk,
+    )
 
     return result
 
@@ -214,6 +224,39 @@ def synchronously_update_insight_cache(insight: Insight, dashboard: Optional[Das
     return result
 
 
+def synchronously_update_dashboard_cache(
+    dashboard: Dashboard, tiles: List[DashboardTile]
+) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Refreshes all insights of a dashboard at once, returning their results by insight id.
+
+    Tiles which end up with the same filters (e.g. once the dashboard's filters override theirs) are calculated only
+    once, and the distinct calculations run at the same time.
+    """
+    params_by_cache_key: Dict[str, Tuple[CacheType, Dict]] = {}
+    cache_key_by_insight_id: Dict[int, str] = {}
+    for tile in tiles:
+        insight = tile.insight
+        if insight is None or not insight.filters:
+            continue
+        cache_key, cache_type, payload = insight_update_task_params(insight, dashboard)
+        update_filters_hash(cache_key, dashboard, insight)
+        params_by_cache_key.setdefault(cache_key, (cache_type, payload))
+        cache_key_by_insight_id[insight.pk] = cache_key
+
+    cache_keys = list(params_by_cache_key.keys())
+    statsd.incr("update_cache_dashboard_refresh_deduplicated", len(cache_key_by_insight_id) - len(cache_keys))
+    results = run_in_parallel(
+        dashboard.team_id, [partial(update_cache_item, key, *params_by_cache_key[key]) for key in cache_keys]
+    )
+    result_by_cache_key = dict(zip(cache_keys, results))
+
+    for tile in tiles:
+        if tile.insight is not None and tile.insight.pk in cache_key_by_insight_id:
+            tile.insight.refresh_from_db()
+    return {insight_id: result_by_cache_key[cache_key] for insight_id, cache_key in cache_key_by_insight_id.items()}
+
+
 def update_filters_hash(cache_key: str, dashboard: Optional[Dashboard], insight: Insight) -> None:
     """check if the cache key has changed, usually because of a new default filter
     # there are three possibilities
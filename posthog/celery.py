@@ -505,10 +505,10 @@ def schedule_cache_updates_task():
 
 
 @app.task(ignore_result=True)
-def update_cache_task(caching_state_id: UUID):
+def update_cache_task(caching_state_id: UUID, revalidate: bool = False):
     from posthog.caching.insight_cache import update_cache
 
-    update_cache(caching_state_id)
+    update_cache(caching_state_id, revalidate=revalidate)
 
 
 @app.task(ignore_result=True)
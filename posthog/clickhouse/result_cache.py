@@ -0,0 +1,95 @@
+"""
+Cache of ClickHouse query results, used by `sync_execute` for call sites passing `result_cache=`.
+
+Results are keyed on the SQL as it's sent to ClickHouse, minus the annotation comment naming the request or task it
+came from, so the same query issued by different requests shares a result. Rows are pickled and compressed, which
+keeps datetimes, UUIDs and tuples as ClickHouse returned them, unlike a JSON round trip.
+
+How long a result may be served from cache depends on the class of query, see `QueryResultCacheClass`.
+"""
+import hashlib
+import json
+import pickle
+import re
+import zlib
+from enum import Enum
+from typing import Any, Dict, Optional
+
+import structlog
+from django.conf import settings
+from statshog.defaults.django import statsd
+
+from posthog.clickhouse.query_tagging import get_query_tag_value
+from posthog.redis import get_client
+
+logger = structlog.get_logger(__name__)
+
+# Bump when the encoding changes, so entries written by older code are never decoded
+ENCODING_VERSION = b"\x01"
+
+# Leading `/* user_id:1 request:... */` comment added by `_annotate_tagged_query`
+ANNOTATION_REGEX = re.compile(r"^\s*/\*.*?\*/\s*", re.DOTALL)
+
+
+class QueryResultCacheClass(str, Enum):
+    # Values of a property, listed while filters are being edited
+    PROPERTY_VALUES = "property_values"
+    # Small lookups feeding into an insight query, e.g. the top breakdown values
+    INSIGHT_LOOKUP = "insight_lookup"
+
+
+TTL_SECONDS_BY_CLASS: Dict[QueryResultCacheClass, int] = {
+    QueryResultCacheClass.PROPERTY_VALUES: 5 * 60,
+    QueryResultCacheClass.INSIGHT_LOOKUP: 60,
+}
+
+
+def cache_key(prepared_sql: str, query_settings: Optional[Dict[str, Any]], with_column_types: bool) -> str:
+    normalized_sql = ANNOTATION_REGEX.sub("", prepared_sql, count=1).strip()
+    key_parts = json.dumps(
+        [settings.CLICKHOUSE_DATABASE, normalized_sql, query_settings or {}, with_column_types],
+        sort_keys=True,
+        default=str,
+    )
+    return f"clickhouse_result_cache:{hashlib.sha256(key_parts.encode('utf-8')).hexdigest()}"
+
+
+def encode(result: Any) -> bytes:
+    return ENCODING_VERSION + zlib.compress(pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL), 1)
+
+
+def decode(stored: bytes) -> Any:
+    if not stored.startswith(ENCODING_VERSION):
+        raise ValueError("Unknown encoding of cached ClickHouse result")
+    return pickle.loads(zlib.decompress(stored[len(ENCODING_VERSION) :]))
+
+
+def get(key: str) -> Optional[Any]:
+    """Returns the cached result, or None if there's none. Never raises, the cache is only a shortcut."""
+    try:
+        stored = get_client().get(key)
+        result = decode(stored) if stored is not None else None
+    except Exception as err:
+        logger.warn("clickhouse_result_cache.get_failed", exception=err)
+        result = None
+
+    _incr("hit" if result is not None else "miss")
+    return result
+
+
+def set(key: str, result: Any, query_class: QueryResultCacheClass) -> None:
+    try:
+        stored = encode(result)
+        if len(stored) > settings.CLICKHOUSE_RESULT_CACHE_MAX_BYTES:
+            _incr("too_large")
+            return
+        get_client().set(key, stored, ex=TTL_SECONDS_BY_CLASS[query_class])
+        statsd.incr("clickhouse_result_cache.bytes_written", len(stored))
+    except Exception as err:
+        logger.warn("clickhouse_result_cache.set_failed", exception=err)
+
+
+def _incr(outcome: str) -> None:
+    statsd.incr(
+        f"clickhouse_result_cache.{outcome}", tags={"query_type": get_query_tag_value("query_type") or "unknown"}
+    )
@@ -24,9 +24,11 @@ from dataclasses_json import dataclass_json
 from django.conf import settings as app_settings
 from statshog.defaults.django import statsd
 
-from posthog import redis
+from posthog import json_codec, redis
 from posthog.celery import enqueue_clickhouse_execute_with_progress
+from posthog.clickhouse import result_cache as clickhouse_result_cache
 from posthog.clickhouse.query_tagging import get_query_tag_value, get_query_tags
+from posthog.clickhouse.result_cache import QueryResultCacheClass
 from posthog.errors import wrap_query_error
 from posthog.settings import (
     CLICKHOUSE_CA,
@@ -121,13 +123,12 @@ def cache_sync_execute(query, args=None, redis_client=None, ttl=CACHE_TTL, setti
     if not redis_client:
         redis_client = redis.get_client()
     key = _key_hash(query, args)
-    if redis_client.exists(key):
-        result = _deserialize(redis_client.get(key))
-        return result
-    else:
-        result = sync_execute(query, args, settings=settings, with_column_types=with_column_types)
-        redis_client.set(key, _serialize(result), ex=ttl)
-        return result
+    cached = redis_client.get(key)
+    if cached is not None:
+        return _deserialize(cached)
+    result = sync_execute(query, args, settings=settings, with_column_types=with_column_types)
+    redis_client.set(key, _serialize(result), ex=ttl)
+    return result
 
 
 def validated_client_query_id() -> Optional[str]:
@@ -146,7 +147,14 @@ def sync_execute(
     settings=None,
     with_column_types=False,
     flush=True,
+    result_cache: Optional[QueryResultCacheClass] = None,
 ):
+    """
+    Runs a query on ClickHouse and returns its result.
+
+    Passing `result_cache` allows serving the result of the same query from Redis for a while, for how long depends
+    on the class of query. Only pass it for queries where results a little out of date are fine.
+    """
     if TEST and flush:
         try:
             from posthog.test.base import flush_persons_and_events
@@ -160,6 +168,14 @@ def sync_execute(
 
         prepared_sql, prepared_args, tags = _prepare_query(client=client, query=query, args=args)
 
+        cache_key = None
+        # Inserts aren't cached, they're the only queries left with `prepared_args`
+        if result_cache is not None and prepared_args is None and app_settings.CLICKHOUSE_RESULT_CACHE_ENABLED:
+            cache_key = clickhouse_result_cache.cache_key(prepared_sql, settings, with_column_types)
+            cached_result = clickhouse_result_cache.get(cache_key)
+            if cached_result is not None:
+                return cached_result
+
         timeout_task = QUERY_TIMEOUT_THREAD.schedule(_notify_of_slow_query_failure)
 
         settings = {**default_settings(), **(settings or {}), "log_comment": json.dumps(tags, separators=(",", ":"))}
@@ -185,6 +201,9 @@ def sync_execute(
 
             if app_settings.SHELL_PLUS_PRINT_SQL:
                 print("Execution time: %.6fs" % (execution_time,))
+
+    if cache_key is not None and result_cache is not None:
+        clickhouse_result_cache.set(cache_key, result, result_cache)
     return result
 
 
@@ -480,14 +499,11 @@ def _prepare_query(client: SyncClient, query: str, args: QueryArgs):
 
 
 def _deserialize(result_bytes: bytes) -> List[Tuple]:
-    results = []
-    for x in json.loads(result_bytes):
-        results.append(tuple(x))
-    return results
+    return [tuple(x) for x in json_codec.loads(result_bytes)]
 
 
 def _serialize(result: Any) -> bytes:
-    return json.dumps(result).encode("utf-8")
+    return json_codec.dumps_bytes(result)
 
 
 def _query_hash(query: str, team_id: int, args: Any) -> str:
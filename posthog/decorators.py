@@ -3,13 +3,15 @@ from functools import wraps
 from typing import Any, Callable, Dict, List, TypeVar, Union, cast
 
 from django.conf import settings
-from django.core.cache import cache
 from django.urls import resolve
 from django.utils.timezone import now
 from rest_framework.request import Request
 from rest_framework.viewsets import GenericViewSet
 from statshog.defaults.django import statsd
 
+from posthog.caching import insight_result_cache
+from posthog.caching.single_flight import single_flight
+from posthog.caching.stale_while_revalidate import CacheFreshness, get_cache_freshness, revalidate_in_background
 from posthog.models import DashboardTile, User
 from posthog.models.filters.utils import get_filter
 from posthog.models.insight import Insight
@@ -55,28 +57,41 @@ def cached_function(f: Callable[[U, Request], T]) -> Callable[[U, Request], T]:
                 route = "unknown"
 
             if cached_result_package and cached_result_package.get("result"):
-                cached_result_package["is_cached"] = True
-                statsd.incr("posthog_cached_function_cache_hit", tags={"route": route})
-                return cached_result_package
-            else:
-                statsd.incr("posthog_cached_function_cache_miss", tags={"route": route})
-
-        # call function being wrapped
-        fresh_result_package = cast(T, f(self, request))
-        # cache new data
-        if isinstance(fresh_result_package, dict):
-            result = fresh_result_package.get("result")
-            if not isinstance(result, dict) or not result.get("loading"):
-                fresh_result_package["last_refresh"] = now()
-                fresh_result_package["is_cached"] = False
-                cache.set(cache_key, fresh_result_package, settings.CACHED_RESULTS_TTL)
-                if filter:
-                    Insight.objects.filter(team_id=team.pk, filters_hash=cache_key).update(last_refresh=now())
-
-                    DashboardTile.objects.filter(insight__team_id=team.pk, filters_hash=cache_key).update(
-                        last_refresh=now()
+                freshness = get_cache_freshness(team, cached_result_package)
+                if freshness != CacheFreshness.EXPIRED:
+                    cached_result_package["is_cached"] = True
+                    if freshness == CacheFreshness.STALE:
+                        cached_result_package["is_stale"] = True
+                        revalidate_in_background(team.pk, cache_key)
+                    statsd.incr(
+                        "posthog_cached_function_cache_hit", tags={"route": route, "freshness": freshness.value}
                     )
+                    return cached_result_package
+
+            statsd.incr("posthog_cached_function_cache_miss", tags={"route": route})
+
+        def calculate_and_cache() -> T:
+            # call function being wrapped
+            fresh_result_package = cast(T, f(self, request))
+            # cache new data
+            if isinstance(fresh_result_package, dict):
+                result = fresh_result_package.get("result")
+                if not isinstance(result, dict) or not result.get("loading"):
+                    fresh_result_package["last_refresh"] = now()
+                    fresh_result_package["is_cached"] = False
+                    insight_result_cache.set(
+                        cache_key, fresh_result_package, settings.CACHED_RESULTS_TTL, team_id=team.pk
+                    )
+                    if filter:
+                        Insight.objects.filter(team_id=team.pk, filters_hash=cache_key).update(last_refresh=now())
+
+                        DashboardTile.objects.filter(insight__team_id=team.pk, filters_hash=cache_key).update(
+                            last_refresh=now()
+                        )
+
+            return fresh_result_package
 
-        return fresh_result_package
+        # concurrent requests for the same uncached insight share one calculation
+        return single_flight(cache_key, calculate_and_cache, tag="cached_function")
 
     return wrapper
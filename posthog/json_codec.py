@@ -0,0 +1,63 @@
+"""
+JSON encoding for hot paths: capture, the Kafka client and cached query results.
+
+Uses orjson when it's installed and JSON_CODEC_BACKEND allows it, with the standard library as the fallback. The
+standard library backend produces exactly the same bytes as plain `json.dumps` does. orjson output is compact and
+doesn't escape non-ASCII characters, but decodes to the same values, with the exception of NaN and Infinity, which
+orjson encodes as `null` (which is also all a strict JSON parser like the plugin server's would accept).
+
+Anything orjson refuses to encode (lone surrogates, integers over 64 bits, non-string keys...) or decode (NaN
+literals written by the standard library) goes through the standard library instead, so switching backends never
+turns a payload that used to work into an error.
+"""
+import json
+from typing import Any, Callable, Optional, Union
+
+from django.conf import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def _orjson_enabled() -> bool:
+    backend = settings.JSON_CODEC_BACKEND
+    if backend == "stdlib":
+        return False
+    if backend == "orjson" and orjson is None:
+        raise ImportError("JSON_CODEC_BACKEND is set to orjson, but orjson is not installed")
+    return orjson is not None
+
+
+def _raise_type_error(value: Any) -> Any:
+    raise TypeError(f"Object of type {value.__class__.__name__} is not JSON serializable")
+
+
+def dumps_bytes(value: Any, *, default: Optional[Callable[[Any], Any]] = None, sort_keys: bool = False) -> bytes:
+    if _orjson_enabled():
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            # :TRICKY: Datetimes and dataclasses are passed through to `default` so that they are handled
+            # exactly like the standard library would (i.e. usually by raising)
+            return orjson.dumps(value, default=default or _raise_type_error, option=option)
+        except (orjson.JSONEncodeError, TypeError):
+            pass
+    return json.dumps(value, default=default, sort_keys=sort_keys).encode("utf-8")
+
+
+def dumps(value: Any, *, default: Optional[Callable[[Any], Any]] = None, sort_keys: bool = False) -> str:
+    if _orjson_enabled():
+        return dumps_bytes(value, default=default, sort_keys=sort_keys).decode("utf-8")
+    return json.dumps(value, default=default, sort_keys=sort_keys)
+
+
+def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    if _orjson_enabled():
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(bytes(data) if isinstance(data, memoryview) else data)
@@ -1,6 +1,7 @@
 import json
+import time
 from enum import Enum
-from typing import Any, Callable, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
 import kafka.errors
 from kafka import KafkaConsumer as KC
@@ -10,11 +11,15 @@ from kafka.structs import TopicPartition
 from statshog.defaults.django import statsd
 from structlog import get_logger
 
+from posthog import json_codec
 from posthog.client import async_execute, sync_execute
 from posthog.kafka_client import helper
 from posthog.settings import (
     KAFKA_BASE64_KEYS,
     KAFKA_HOSTS,
+    KAFKA_PRODUCER_BATCH_SIZE,
+    KAFKA_PRODUCER_COMPRESSION_TYPE,
+    KAFKA_PRODUCER_LINGER_MS,
     KAFKA_SASL_MECHANISM,
     KAFKA_SASL_PASSWORD,
     KAFKA_SASL_USER,
@@ -98,24 +103,34 @@ def _sasl_params():
     return {}
 
 
+def _producer_tuning_params():
+    return {
+        "linger_ms": KAFKA_PRODUCER_LINGER_MS,
+        "batch_size": KAFKA_PRODUCER_BATCH_SIZE,
+        "compression_type": KAFKA_PRODUCER_COMPRESSION_TYPE,
+    }
+
+
 class _KafkaProducer:
     def __init__(self, test=TEST):
         if test:
             self.producer = KafkaProducerForTests()
         elif KAFKA_BASE64_KEYS:
-            self.producer = helper.get_kafka_producer(retries=KAFKA_PRODUCER_RETRIES, value_serializer=lambda d: d)
+            self.producer = helper.get_kafka_producer(
+                retries=KAFKA_PRODUCER_RETRIES, value_serializer=lambda d: d, **_producer_tuning_params()
+            )
         else:
             self.producer = KP(
                 retries=KAFKA_PRODUCER_RETRIES,
                 bootstrap_servers=KAFKA_HOSTS,
                 security_protocol=KAFKA_SECURITY_PROTOCOL or _KafkaSecurityProtocol.PLAINTEXT,
+                **_producer_tuning_params(),
                 **_sasl_params(),
             )
 
     @staticmethod
     def json_serializer(d):
-        b = json.dumps(d).encode("utf-8")
-        return b
+        return json_codec.dumps_bytes(d)
 
     def on_send_success(self, record_metadata: RecordMetadata):
         statsd.incr("posthog_cloud_kafka_send_success", tags={"topic": record_metadata.topic})
@@ -220,3 +235,18 @@ class ClickhouseProducer:
             sync_execute(sql, data)
         else:
             async_execute(sql, data)
+
+
+def wait_for_futures(futures: Sequence[FutureRecordMetadata], timeout_seconds: float) -> None:
+    """
+    Waits for a whole batch of produce requests to be acknowledged against a single deadline, rather than giving
+    every future its own timeout. Once the slowest ack is in the remaining `get()` calls return immediately.
+
+    Raises the first produce error, or `KafkaTimeoutError` once the deadline has passed.
+    """
+    deadline = time.monotonic() + timeout_seconds
+    for future in futures:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 and not future.is_done:
+            raise kafka.errors.KafkaTimeoutError(f"Timed out waiting for {len(futures)} messages to be acked")
+        future.get(timeout=max(remaining, 0))
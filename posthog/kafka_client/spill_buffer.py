@@ -0,0 +1,409 @@
+import fcntl
+import glob
+import itertools
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import structlog
+from django.conf import settings
+from kafka.producer.future import FutureRecordMetadata
+from statshog.defaults.django import statsd
+
+from posthog import json_codec
+
+logger = structlog.get_logger(__name__)
+
+# Every record is prefixed with its payload length and a crc32 of the payload. Segments are pre-allocated (and so
+# zero-filled), which means a zero length marks the end of the written part of a segment.
+RECORD_HEADER = struct.Struct("<II")
+SEGMENT_SUFFIX = ".segment"
+OFFSET_SUFFIX = ".offset"
+DRAIN_CHUNK_SIZE = 1000
+
+
+@dataclass(frozen=True)
+class SpillBufferStats:
+    depth: int
+    bytes: int
+    oldest_age_seconds: float
+
+
+@dataclass
+class _Segment:
+    sequence: int
+    path: str
+    records: int = 0
+    bytes: int = 0
+    oldest_timestamp: Optional[float] = None
+
+    @property
+    def offset_path(self) -> str:
+        return self.path[: -len(SEGMENT_SUFFIX)] + OFFSET_SUFFIX
+
+
+class SpillBuffer:
+    """
+    Durable, append-only log of Kafka messages that could not be produced, stored as fixed size memory-mapped
+    segment files.
+
+    Each process claims its own slot directory under `directory` with a file lock, so gunicorn workers never share
+    a segment. Slots with segments that no process holds the lock of are adopted and drained by whichever process
+    finds them first, see `drain_leftover_segments`.
+
+    Delivery is at-least-once: a message may be produced again if draining fails halfway through a chunk.
+    """
+
+    def __init__(self, directory: str, segment_size_bytes: int, max_bytes: int, slot: Optional[Tuple[str, int]] = None):
+        "`slot` is a slot directory and the fd of its lock, already locked. A free slot is claimed if not given."
+        self.segment_size_bytes = segment_size_bytes
+        self.max_bytes = max_bytes
+        self.directory, self._lock_fd = slot if slot is not None else _claim_slot_directory(directory)
+
+        self._lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self._sealed: List[_Segment] = [self._load_segment(path) for path in self._segment_paths()]
+        self._active: Optional[_Segment] = None
+        self._active_map: Optional[mmap.mmap] = None
+        self._write_offset = 0
+        self._next_sequence = max((segment.sequence for segment in self._sealed), default=-1) + 1
+
+    def append(self, topic: str, key: Optional[str], data: Dict) -> bool:
+        "Returns False if the message was dropped because the buffer is full."
+        payload = json_codec.dumps_bytes({"topic": topic, "key": key, "data": data, "timestamp": time.time()})
+        record_size = RECORD_HEADER.size + len(payload)
+
+        with self._lock:
+            if self._total_bytes() + record_size > self.max_bytes:
+                statsd.incr("kafka_spill_buffer_dropped")
+                return False
+
+            if self._active is None or self._write_offset + record_size > len(self._active_map):  # type: ignore
+                self._roll(min_size=record_size)
+
+            assert self._active is not None and self._active_map is not None
+            RECORD_HEADER.pack_into(self._active_map, self._write_offset, len(payload), zlib.crc32(payload))
+            self._active_map[self._write_offset + RECORD_HEADER.size : self._write_offset + record_size] = payload
+            self._write_offset += record_size
+
+            self._active.records += 1
+            self._active.bytes += record_size
+            if self._active.oldest_timestamp is None:
+                self._active.oldest_timestamp = time.time()
+
+        statsd.incr("kafka_spill_buffer_appended", tags={"topic": topic})
+        return True
+
+    def drain(
+        self, produce: Callable[[str, Optional[str], Dict], FutureRecordMetadata], wait: Callable[[List], None]
+    ) -> int:
+        """
+        Replays buffered messages oldest first, deleting each segment once all of its messages have been acked.
+        Stops at the first error, which is re-raised so that the caller can back off. Returns the messages drained.
+        """
+        drained = 0
+        with self._drain_lock:
+            while True:
+                with self._lock:
+                    if not self._sealed and self._active is not None and self._active.records > 0:
+                        self._seal_active()
+                    if not self._sealed:
+                        return drained
+                    segment = self._sealed[0]
+
+                drained += self._drain_segment(segment, produce, wait)
+
+                with self._lock:
+                    self._sealed.remove(segment)
+                _remove_if_exists(segment.path)
+                _remove_if_exists(segment.offset_path)
+
+    def flush(self) -> None:
+        "Forces buffered writes of the active segment to disk. Without this they still survive process crashes."
+        with self._lock:
+            if self._active_map is not None:
+                self._active_map.flush()
+
+    def stats(self) -> SpillBufferStats:
+        with self._lock:
+            segments = self._segments()
+            timestamps = [segment.oldest_timestamp for segment in segments if segment.oldest_timestamp is not None]
+            return SpillBufferStats(
+                depth=sum(segment.records for segment in segments),
+                bytes=self._total_bytes(),
+                oldest_age_seconds=time.time() - min(timestamps) if timestamps else 0.0,
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._active is not None:
+                self._seal_active()
+            os.close(self._lock_fd)
+
+    def _drain_segment(
+        self,
+        segment: _Segment,
+        produce: Callable[[str, Optional[str], Dict], FutureRecordMetadata],
+        wait: Callable[[List], None],
+    ) -> int:
+        drained = 0
+        offset = _read_offset(segment.offset_path)
+        records = _read_records(segment.path, offset)
+        while True:
+            chunk = list(itertools.islice(records, DRAIN_CHUNK_SIZE))
+            if not chunk:
+                return drained
+
+            wait([produce(message["topic"], message["key"], message["data"]) for message, _ in chunk])
+
+            offset = chunk[-1][1]
+            _write_offset(segment.offset_path, offset)
+            drained += len(chunk)
+            with self._lock:
+                segment.records -= len(chunk)
+                segment.bytes = max(os.path.getsize(segment.path) - offset, 0)
+                segment.oldest_timestamp = chunk[-1][0]["timestamp"]
+            statsd.incr("kafka_spill_buffer_drained", len(chunk))
+
+    def _roll(self, min_size: int) -> None:
+        if self._active is not None:
+            self._seal_active()
+
+        sequence = self._next_sequence
+        self._next_sequence += 1
+        path = os.path.join(self.directory, f"{sequence:020d}{SEGMENT_SUFFIX}")
+        size = max(self.segment_size_bytes, min_size + RECORD_HEADER.size)
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            os.ftruncate(fd, size)
+            self._active_map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        self._active = _Segment(sequence=sequence, path=path)
+        self._write_offset = 0
+
+    def _seal_active(self) -> None:
+        assert self._active is not None and self._active_map is not None
+        self._active_map.flush()
+        self._active_map.close()
+        # Drop the unused, pre-allocated tail so that sealed segments only take up the space they need
+        os.truncate(self._active.path, self._write_offset)
+
+        if self._active.records > 0:
+            self._sealed.append(self._active)
+        else:
+            _remove_if_exists(self._active.path)
+        self._active, self._active_map, self._write_offset = None, None, 0
+
+    def _segments(self) -> List[_Segment]:
+        return self._sealed + ([self._active] if self._active is not None else [])
+
+    def _total_bytes(self) -> int:
+        return sum(segment.bytes for segment in self._segments())
+
+    def _segment_paths(self) -> List[str]:
+        return sorted(
+            os.path.join(self.directory, filename)
+            for filename in os.listdir(self.directory)
+            if filename.endswith(SEGMENT_SUFFIX)
+        )
+
+    def _load_segment(self, path: str) -> _Segment:
+        sequence = int(os.path.basename(path)[: -len(SEGMENT_SUFFIX)])
+        segment = _Segment(sequence=sequence, path=path)
+        offset = _read_offset(segment.offset_path)
+        for message, end_offset in _read_records(path, offset):
+            segment.records += 1
+            segment.bytes = end_offset - offset
+            if segment.oldest_timestamp is None:
+                segment.oldest_timestamp = message["timestamp"]
+        # A previous process may have died before sealing this segment, so trim it to what was actually written
+        os.truncate(path, offset + segment.bytes)
+        return segment
+
+
+def _read_records(path: str, offset: int) -> Iterator[Tuple[Dict, int]]:
+    "Yields (message, offset just past the message), stopping at the end of written data or at a torn write."
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size <= offset:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as segment_map:
+            while offset + RECORD_HEADER.size <= len(segment_map):
+                length, checksum = RECORD_HEADER.unpack_from(segment_map, offset)
+                start, end = offset + RECORD_HEADER.size, offset + RECORD_HEADER.size + length
+                if length == 0 or end > len(segment_map):
+                    return
+                payload = segment_map[start:end]
+                if zlib.crc32(payload) != checksum:
+                    logger.warning("kafka_spill_buffer_corrupt_record", path=path, offset=offset)
+                    statsd.incr("kafka_spill_buffer_corrupt_record")
+                    return
+                offset = end
+                yield json_codec.loads(payload), offset
+
+
+def _read_offset(path: str) -> int:
+    try:
+        with open(path) as file:
+            return int(file.read() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def _write_offset(path: str, offset: int) -> None:
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w") as file:
+        file.write(str(offset))
+    os.replace(temporary_path, path)
+
+
+def _remove_if_exists(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _claim_slot_directory(directory: str) -> Tuple[str, int]:
+    for slot in itertools.count():
+        slot_directory = os.path.join(directory, f"slot-{slot}")
+        os.makedirs(slot_directory, exist_ok=True)
+        fd = _lock_slot_directory(slot_directory)
+        if fd is not None:
+            return slot_directory, fd
+    raise AssertionError("unreachable")
+
+
+def _claim_leftover_slot_directories(directory: str) -> List[Tuple[str, int]]:
+    "Claims the slots with segments that no process holds the lock of, e.g. left behind by a restarted worker."
+    slots = []
+    for slot_directory in sorted(glob.glob(os.path.join(directory, "slot-*"))):
+        if not glob.glob(os.path.join(slot_directory, f"*{SEGMENT_SUFFIX}")):
+            continue
+        fd = _lock_slot_directory(slot_directory)
+        if fd is not None:
+            slots.append((slot_directory, fd))
+    return slots
+
+
+def _lock_slot_directory(slot_directory: str) -> Optional[int]:
+    fd = os.open(os.path.join(slot_directory, "lock"), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+
+_spill_buffer: Optional[SpillBuffer] = None
+_spill_buffer_lock = threading.Lock()
+_checked_for_leftover_segments = False
+
+
+def get_spill_buffer() -> Optional[SpillBuffer]:
+    "Returns this process' spill buffer, creating it and its drainer thread on first use, or None when disabled."
+    global _spill_buffer
+
+    if not settings.KAFKA_SPILL_BUFFER_ENABLED:
+        return None
+
+    if _spill_buffer is None:
+        with _spill_buffer_lock:
+            if _spill_buffer is None:
+                spill_buffer = SpillBuffer(
+                    directory=settings.KAFKA_SPILL_BUFFER_DIRECTORY,
+                    segment_size_bytes=settings.KAFKA_SPILL_BUFFER_SEGMENT_SIZE_BYTES,
+                    max_bytes=settings.KAFKA_SPILL_BUFFER_MAX_BYTES,
+                )
+                # :TRICKY: Tests drain the buffer themselves
+                if not settings.TEST:
+                    threading.Thread(
+                        target=_drain_forever, args=(spill_buffer,), name="kafka-spill-buffer-drainer", daemon=True
+                    ).start()
+                _spill_buffer = spill_buffer
+    return _spill_buffer
+
+
+def drain_leftover_segments() -> None:
+    """
+    Adopts slots with segments that no running process holds the lock of, e.g. left behind by a worker that was
+    restarted, and drains each in a thread of its own. Otherwise they would only be drained once a process happened
+    to claim their slot for spilling. Only checks once per process, after which drainer threads keep adopting slots of
+    workers that die later on.
+    """
+    global _checked_for_leftover_segments
+
+    if _checked_for_leftover_segments or not settings.KAFKA_SPILL_BUFFER_ENABLED:
+        return
+    _checked_for_leftover_segments = True
+    _start_leftover_drainers()
+
+
+def _start_leftover_drainers() -> List[threading.Thread]:
+    threads = []
+    for slot in _claim_leftover_slot_directories(settings.KAFKA_SPILL_BUFFER_DIRECTORY):
+        spill_buffer = SpillBuffer(
+            directory=settings.KAFKA_SPILL_BUFFER_DIRECTORY,
+            segment_size_bytes=settings.KAFKA_SPILL_BUFFER_SEGMENT_SIZE_BYTES,
+            max_bytes=settings.KAFKA_SPILL_BUFFER_MAX_BYTES,
+            slot=slot,
+        )
+        logger.info("kafka_spill_buffer_adopted", directory=spill_buffer.directory, depth=spill_buffer.stats().depth)
+        statsd.incr("kafka_spill_buffer_adopted")
+        thread = threading.Thread(
+            target=_drain_until_empty, args=(spill_buffer,), name="kafka-spill-buffer-leftover-drainer", daemon=True
+        )
+        thread.start()
+        threads.append(thread)
+    return threads
+
+
+def drain_spill_buffer(spill_buffer: SpillBuffer) -> int:
+    from posthog.kafka_client.client import KafkaProducer, wait_for_futures
+
+    return spill_buffer.drain(
+        produce=lambda topic, key, data: KafkaProducer().produce(topic=topic, data=data, key=key),
+        wait=lambda futures: wait_for_futures(futures, timeout_seconds=settings.KAFKA_PRODUCE_ACK_TIMEOUT_SECONDS),
+    )
+
+
+def _drain_until_empty(spill_buffer: SpillBuffer) -> None:
+    "Drains an adopted slot, then releases it so that it can be claimed again."
+    backoff_seconds = settings.KAFKA_SPILL_BUFFER_MIN_BACKOFF_SECONDS
+    while True:
+        try:
+            drain_spill_buffer(spill_buffer)
+            spill_buffer.close()
+            return
+        except Exception as e:
+            logger.warning("kafka_spill_buffer_drain_failed", backoff_seconds=backoff_seconds, exc_info=e)
+            statsd.incr("kafka_spill_buffer_drain_error")
+            backoff_seconds = min(backoff_seconds * 2, settings.KAFKA_SPILL_BUFFER_MAX_BACKOFF_SECONDS)
+        time.sleep(backoff_seconds)
+
+
+def _drain_forever(spill_buffer: SpillBuffer) -> None:
+    backoff_seconds = settings.KAFKA_SPILL_BUFFER_MIN_BACKOFF_SECONDS
+    while True:
+        try:
+            spill_buffer.flush()
+            drain_spill_buffer(spill_buffer)
+            _start_leftover_drainers()
+            backoff_seconds = settings.KAFKA_SPILL_BUFFER_MIN_BACKOFF_SECONDS
+        except Exception as e:
+            logger.warning("kafka_spill_buffer_drain_failed", backoff_seconds=backoff_seconds, exc_info=e)
+            statsd.incr("kafka_spill_buffer_drain_error")
+            backoff_seconds = min(backoff_seconds * 2, settings.KAFKA_SPILL_BUFFER_MAX_BACKOFF_SECONDS)
+
+        stats = spill_buffer.stats()
+        statsd.gauge("kafka_spill_buffer_depth", stats.depth)
+        statsd.gauge("kafka_spill_buffer_bytes", stats.bytes)
+        statsd.gauge("kafka_spill_buffer_oldest_age_seconds", stats.oldest_age_seconds)
+        time.sleep(backoff_seconds)
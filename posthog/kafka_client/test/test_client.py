@@ -2,8 +2,10 @@ from unittest.mock import patch
 
 import kafka
 from django.test import TestCase
+from kafka.producer.future import FutureProduceResult, FutureRecordMetadata
+from kafka.structs import TopicPartition
 
-from posthog.kafka_client.client import _KafkaProducer, build_kafka_consumer
+from posthog.kafka_client.client import _KafkaProducer, build_kafka_consumer, wait_for_futures
 
 
 class KafkaClientTestCase(TestCase):
@@ -70,3 +72,43 @@ class KafkaClientTestCase(TestCase):
             producer = _KafkaProducer(test=False)
         for key, value in expected_sasl_config.items():
             self.assertEqual(value, producer.producer.config[key])  # type: ignore
+
+    @patch("posthog.kafka_client.client.KAFKA_PRODUCER_LINGER_MS", 20)
+    @patch("posthog.kafka_client.client.KAFKA_PRODUCER_BATCH_SIZE", 65536)
+    @patch("posthog.kafka_client.client.KAFKA_PRODUCER_COMPRESSION_TYPE", "gzip")
+    def test_kafka_producer_tuning_params(self):
+        with patch.dict(kafka.KafkaProducer.DEFAULT_CONFIG, {"api_version": (2, 5, 0)}):
+            producer = _KafkaProducer(test=False)
+        self.assertEqual(producer.producer.config["linger_ms"], 20)  # type: ignore
+        self.assertEqual(producer.producer.config["batch_size"], 65536)  # type: ignore
+        self.assertEqual(producer.producer.config["compression_type"], "gzip")  # type: ignore
+
+    def test_wait_for_futures(self):
+        producer = _KafkaProducer(test=True)
+        futures = [producer.produce(topic=self.topic, data=self.payload) for _ in range(3)]
+
+        wait_for_futures(futures, timeout_seconds=1)
+
+    def test_wait_for_futures_raises_first_error(self):
+        failed_future = _unresolved_future()
+        failed_future.failure(kafka.errors.MessageSizeTooLargeError())
+        futures = [_KafkaProducer(test=True).produce(topic=self.topic, data=self.payload), failed_future]
+
+        with self.assertRaises(kafka.errors.MessageSizeTooLargeError):
+            wait_for_futures(futures, timeout_seconds=1)
+
+    def test_wait_for_futures_times_out(self):
+        with self.assertRaises(kafka.errors.KafkaTimeoutError):
+            wait_for_futures([_unresolved_future(), _unresolved_future()], timeout_seconds=0.01)
+
+
+def _unresolved_future() -> FutureRecordMetadata:
+    return FutureRecordMetadata(
+        produce_future=FutureProduceResult(topic_partition=TopicPartition("test_topic", 1)),
+        relative_offset=0,
+        timestamp_ms=0,
+        checksum=0,
+        serialized_key_size=0,
+        serialized_value_size=0,
+        serialized_header_size=0,
+    )
@@ -0,0 +1,110 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from posthog.kafka_client.spill_buffer import SpillBuffer, _start_leftover_drainers
+
+
+class TestSpillBuffer(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.produced = []
+
+    def _produce(self, topic, key, data):
+        self.produced.append((topic, key, data))
+
+    def _wait(self, futures):
+        pass
+
+    def test_append_and_drain(self):
+        spill_buffer = SpillBuffer(self.directory, segment_size_bytes=256, max_bytes=100_000)
+        for index in range(10):
+            self.assertTrue(spill_buffer.append("events", f"key-{index}", {"index": index}))
+
+        stats = spill_buffer.stats()
+        self.assertEqual(stats.depth, 10)
+        self.assertGreater(stats.bytes, 0)
+        self.assertGreaterEqual(stats.oldest_age_seconds, 0)
+
+        self.assertEqual(spill_buffer.drain(self._produce, self._wait), 10)
+        self.assertEqual(self.produced, [("events", f"key-{index}", {"index": index}) for index in range(10)])
+        self.assertEqual(spill_buffer.stats().depth, 0)
+        self.assertEqual([name for name in os.listdir(spill_buffer.directory) if name != "lock"], [])
+
+    def test_drops_messages_once_full(self):
+        spill_buffer = SpillBuffer(self.directory, segment_size_bytes=1024, max_bytes=200)
+
+        self.assertTrue(spill_buffer.append("events", None, {"index": 1}))
+        self.assertFalse(spill_buffer.append("events", None, {"padding": "x" * 200}))
+        self.assertEqual(spill_buffer.stats().depth, 1)
+
+    def test_failed_drain_keeps_messages(self):
+        spill_buffer = SpillBuffer(self.directory, segment_size_bytes=1024, max_bytes=100_000)
+        spill_buffer.append("events", None, {"index": 1})
+
+        def failing_wait(futures):
+            raise TimeoutError()
+
+        with self.assertRaises(TimeoutError):
+            spill_buffer.drain(self._produce, failing_wait)
+        self.assertEqual(spill_buffer.stats().depth, 1)
+
+        self.produced = []
+        self.assertEqual(spill_buffer.drain(self._produce, self._wait), 1)
+        self.assertEqual(self.produced, [("events", None, {"index": 1})])
+
+    def test_messages_survive_restarts(self):
+        spill_buffer = SpillBuffer(self.directory, segment_size_bytes=128, max_bytes=100_000)
+        for index in range(5):
+            spill_buffer.append("events", None, {"index": index})
+        spill_buffer.close()
+
+        restarted_buffer = SpillBuffer(self.directory, segment_size_bytes=128, max_bytes=100_000)
+        self.assertEqual(restarted_buffer.directory, spill_buffer.directory)
+        self.assertEqual(restarted_buffer.stats().depth, 5)
+        self.assertEqual(restarted_buffer.drain(self._produce, self._wait), 5)
+        self.assertEqual([data["index"] for _, _, data in self.produced], list(range(5)))
+
+    def test_processes_claim_separate_slots(self):
+        first_buffer = SpillBuffer(self.directory, segment_size_bytes=128, max_bytes=100_000)
+        second_buffer = SpillBuffer(self.directory, segment_size_bytes=128, max_bytes=100_000)
+
+        self.assertNotEqual(first_buffer.directory, second_buffer.directory)
+
+    @patch("posthog.kafka_client.client.wait_for_futures")
+    @patch("posthog.kafka_client.client.KafkaProducer")
+    def test_drains_leftover_segments_of_unclaimed_slots(self, mock_kafka_producer, mock_wait_for_futures):
+        running_buffer = SpillBuffer(self.directory, segment_size_bytes=128, max_bytes=100_000)
+        running_buffer.append("events", None, {"index": 0})
+        leftover_buffer = SpillBuffer(self.directory, segment_size_bytes=128, max_bytes=100_000)
+        for index in range(1, 4):
+            leftover_buffer.append("events", None, {"index": index})
+        # slot-0 ends up free and empty, while slot-1 is left behind with segments
+        running_buffer.drain(self._produce, self._wait)
+        running_buffer.close()
+        leftover_buffer.close()
+        self.assertEqual(os.path.basename(leftover_buffer.directory), "slot-1")
+
+        with self.settings(KAFKA_SPILL_BUFFER_ENABLED=True, KAFKA_SPILL_BUFFER_DIRECTORY=self.directory):
+            threads = _start_leftover_drainers()
+            for thread in threads:
+                thread.join(timeout=10)
+
+            self.assertEqual(len(threads), 1)
+            self.assertEqual(
+                [call.kwargs["data"]["index"] for call in mock_kafka_producer.return_value.produce.call_args_list],
+                [1, 2, 3],
+            )
+            self.assertEqual([name for name in os.listdir(leftover_buffer.directory) if name != "lock"], [])
+            # Drained slots are released rather than adopted again
+            self.assertEqual(_start_leftover_drainers(), [])
+
+    def test_slots_locked_by_running_processes_are_not_adopted(self):
+        running_buffer = SpillBuffer(self.directory, segment_size_bytes=128, max_bytes=100_000)
+        running_buffer.append("events", None, {"index": 0})
+        running_buffer.flush()
+
+        with self.settings(KAFKA_SPILL_BUFFER_ENABLED=True, KAFKA_SPILL_BUFFER_DIRECTORY=self.directory):
+            self.assertEqual(_start_leftover_drainers(), [])
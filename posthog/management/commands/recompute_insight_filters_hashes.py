@@ -0,0 +1,82 @@
+from typing import Any, Callable, List
+
+import structlog
+from django.core.management.base import BaseCommand
+from django.db.models import QuerySet
+
+from posthog.models import DashboardTile, Insight
+from posthog.models.insight import generate_insight_cache_key
+
+logger = structlog.get_logger(__name__)
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = """Recompute the stored filters_hash of insights and dashboard tiles, e.g. after the way filters are
+        serialized changed. Cached results are looked up by these hashes, so stale ones make insights look uncached.
+        Recommended: run first without `--live-run`
+        """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--team-id", default=None, type=int, help="Specify a team to recompute hashes for.")
+        parser.add_argument("--live-run", action="store_true", help="Run changes, default is dry-run")
+
+    def handle(self, *args, **options):
+        run(options)
+
+
+def run(options):
+    live_run = options["live_run"]
+    team_id = options["team_id"]
+
+    insights = Insight.objects.filter(deleted=False).select_related("team").order_by("pk")
+    tiles = (
+        DashboardTile.objects.exclude(deleted=True)
+        .filter(insight__deleted=False)
+        .select_related("insight__team", "dashboard")
+        .order_by("pk")
+    )
+    if team_id:
+        insights = insights.filter(team_id=team_id)
+        tiles = tiles.filter(insight__team_id=team_id)
+
+    recompute_filters_hashes(insights, lambda insight: generate_insight_cache_key(insight, None), live_run)
+    recompute_filters_hashes(tiles, lambda tile: generate_insight_cache_key(tile.insight, tile.dashboard), live_run)
+
+
+def recompute_filters_hashes(queryset: QuerySet, get_filters_hash: Callable[[Any], str], live_run: bool) -> int:
+    model_name = queryset.model.__name__
+    instances_to_update: List[Any] = []
+    updated = 0
+
+    for instance in queryset.iterator(chunk_size=BATCH_SIZE):
+        insight = instance if isinstance(instance, Insight) else instance.insight
+        if not insight.filters:
+            continue
+
+        try:
+            filters_hash = get_filters_hash(instance)
+        except Exception:
+            # Already logged by `generate_insight_cache_key`
+            continue
+
+        if instance.filters_hash != filters_hash:
+            logger.info(f"Updating filters_hash of {model_name} {instance.pk}")
+            instance.filters_hash = filters_hash
+            instances_to_update.append(instance)
+
+        if len(instances_to_update) >= BATCH_SIZE:
+            updated += _update_filters_hashes(queryset, instances_to_update, live_run)
+            instances_to_update = []
+
+    updated += _update_filters_hashes(queryset, instances_to_update, live_run)
+    logger.info(f"{'Updated' if live_run else 'Would update'} {updated} {model_name} filters hashes")
+    return updated
+
+
+def _update_filters_hashes(queryset: QuerySet, instances: List[Any], live_run: bool) -> int:
+    # `bulk_update` doesn't send post_save, so saved hashes don't cascade into dashboard tiles or activity logs
+    if live_run and instances:
+        queryset.model.objects.bulk_update(instances, ["filters_hash"])
+    return len(instances)
@@ -0,0 +1,32 @@
+from posthog.management.commands.recompute_insight_filters_hashes import run
+from posthog.models import Dashboard, DashboardTile, Insight
+from posthog.models.insight import generate_insight_cache_key
+from posthog.test.base import BaseTest
+
+
+class TestRecomputeInsightFiltersHashes(BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.insight = Insight.objects.create(team=self.team, filters={"events": [{"id": "$pageview"}]})
+        self.dashboard = Dashboard.objects.create(team=self.team, filters={"date_from": "-14d"})
+        self.tile = DashboardTile.objects.create(dashboard=self.dashboard, insight=self.insight)
+        # As if the hashes were stored before the way filters are serialized changed
+        Insight.objects.filter(pk=self.insight.pk).update(filters_hash="stale_filters_hash")
+        DashboardTile.objects.filter(pk=self.tile.pk).update(filters_hash="stale_filters_hash")
+
+    def test_dry_run_changes_nothing(self):
+        run({"team_id": None, "live_run": False})
+
+        self.insight.refresh_from_db()
+        self.tile.refresh_from_db()
+        self.assertEqual(self.insight.filters_hash, "stale_filters_hash")
+        self.assertEqual(self.tile.filters_hash, "stale_filters_hash")
+
+    def test_live_run_recomputes_hashes(self):
+        run({"team_id": self.team.pk, "live_run": True})
+
+        self.insight.refresh_from_db()
+        self.tile.refresh_from_db()
+        self.assertEqual(self.insight.filters_hash, generate_insight_cache_key(self.insight, None))
+        self.assertEqual(self.tile.filters_hash, generate_insight_cache_key(self.insight, self.dashboard))
+        self.assertNotEqual(self.insight.filters_hash, self.tile.filters_hash)
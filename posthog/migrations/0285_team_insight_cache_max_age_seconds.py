@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2022-12-09 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posthog", "0284_improved_caching_state_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="team",
+            name="insight_cache_max_age_seconds",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
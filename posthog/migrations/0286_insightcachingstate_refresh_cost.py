@@ -0,0 +1,23 @@
+# Generated by Django 3.2.16 on 2022-12-12 09:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posthog", "0285_team_insight_cache_max_age_seconds"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="insightcachingstate",
+            name="last_refresh_duration_ms",
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name="insightcachingstate",
+            name="last_refresh_read_rows",
+            field=models.BigIntegerField(null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.16 on 2022-12-14 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posthog", "0286_insightcachingstate_refresh_cost"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cohort",
+            name="last_calculation_queued_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="cohort",
+            name="last_calculation_duration_ms",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
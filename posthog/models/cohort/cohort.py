@@ -1,6 +1,7 @@
+import io
 import time
 from datetime import datetime
-from typing import Any, Dict, List, Literal, Optional, cast
+from typing import Any, Dict, Iterable, List, Literal, Optional, cast
 
 import structlog
 from django.conf import settings
@@ -9,6 +10,7 @@ from django.db.models import Case, Q, When
 from django.db.models.expressions import F
 from django.utils import timezone
 from sentry_sdk import capture_exception
+from statshog.defaults.django import statsd
 
 from posthog.constants import PropertyOperatorType
 from posthog.models.filters.filter import Filter
@@ -29,6 +31,10 @@ INSERT INTO "posthog_cohortpeople" ("person_id", "cohort_id", "version")
 ON CONFLICT DO NOTHING
 """
 
+COPY_COHORT_PEOPLE_QUERY = """
+COPY "posthog_cohortpeople" ("person_id", "cohort_id", "version") FROM STDIN
+"""
+
 
 class Group:
     def __init__(
@@ -87,6 +93,8 @@ class Cohort(models.Model):
     is_calculating: models.BooleanField = models.BooleanField(default=False)
     last_calculation: models.DateTimeField = models.DateTimeField(blank=True, null=True)
     errors_calculating: models.IntegerField = models.IntegerField(default=0)
+    last_calculation_queued_at: models.DateTimeField = models.DateTimeField(blank=True, null=True)
+    last_calculation_duration_ms: models.IntegerField = models.IntegerField(blank=True, null=True)
 
     is_static: models.BooleanField = models.BooleanField(default=False)
 
@@ -195,29 +203,28 @@ class Cohort(models.Model):
         }
 
     def calculate_people(self, new_version: int, batch_size=10000, pg_batch_size=1000):
+        """
+        Copies the cohort's people from ClickHouse into Postgres as of `new_version`. Person ids are read from
+        ClickHouse `batch_size` at a time, and `pg_batch_size` at a time get resolved to Postgres ids and copied in.
+        """
+        from posthog.models.cohort.util import iter_person_id_batches_by_cohort_id
+
         if self.is_static:
             return
+
+        start_time = time.monotonic()
+        inserted = 0
         try:
+            with connection.cursor() as cursor:
+                for uuids in iter_person_id_batches_by_cohort_id(self.team, self.pk, batch_size=batch_size):
+                    for i in range(0, len(uuids), pg_batch_size):
+                        person_ids = Person.objects.filter(
+                            team_id=self.team_id, uuid__in=uuids[i : i + pg_batch_size]
+                        ).values_list("id", flat=True)
+                        inserted += copy_cohort_people(cursor, self.pk, new_version, person_ids)
 
-            # Paginate fetch batch_size from clickhouse and paginate insert pg_batch_size into postgres
-            cursor = 0
-            persons = self._clickhouse_persons_query(batch_size=batch_size, offset=cursor)
-            while persons:
-                # TODO: Insert from a subquery instead of pulling retrieving
-                # then sending large lists of data backwards and forwards.
-                to_insert = [
-                    CohortPeople(person_id=person_id, cohort_id=self.pk, version=new_version)
-                    #  Just pull out the person id as we don't need anything
-                    #  else.
-                    for person_id in persons.values_list("id", flat=True)
-                ]
-                #  TODO: make sure this bulk_create doesn't actually return anything
-                CohortPeople.objects.bulk_create(to_insert, batch_size=pg_batch_size)
-
-                cursor += batch_size
-                persons = self._clickhouse_persons_query(batch_size=batch_size, offset=cursor)
-                if persons.exists() and not TEST:
-                    time.sleep(5)
+                    statsd.incr("cohort_calculate_people_rows", len(uuids))
+                    logger.info("cohort_calculate_people_progress", id=self.pk, version=new_version, inserted=inserted)
 
         except Exception as err:
             # Clear the pending version people if there's an error
@@ -225,15 +232,33 @@ class Cohort(models.Model):
 
             raise err
 
-    def calculate_people_ch(self, pending_version):
+        statsd.timing("cohort_calculate_people_duration_ms", (time.monotonic() - start_time) * 1000)
+        logger.info(
+            "cohort_calculate_people_completed",
+            id=self.pk,
+            version=new_version,
+            inserted=inserted,
+            duration=(time.monotonic() - start_time),
+        )
+
+    def calculate_people_ch(self, pending_version, incremental=False, source_cohort_id=None):
         from posthog.models.cohort.util import recalculate_cohortpeople
         from posthog.tasks.cohorts_in_feature_flag import get_cohort_ids_in_feature_flags
 
-        logger.info("cohort_calculation_started", id=self.pk, current_version=self.version, new_version=pending_version)
+        logger.info(
+            "cohort_calculation_started",
+            id=self.pk,
+            current_version=self.version,
+            new_version=pending_version,
+            incremental=incremental,
+            source_cohort_id=source_cohort_id,
+        )
         start_time = time.monotonic()
 
         try:
-            count = recalculate_cohortpeople(self, pending_version)
+            count = recalculate_cohortpeople(
+                self, pending_version, incremental=incremental, source_cohort_id=source_cohort_id
+            )
 
             # only precalculate if used in feature flag
             ids = get_cohort_ids_in_feature_flags()
@@ -244,6 +269,7 @@ class Cohort(models.Model):
                 self.count = count
 
             self.last_calculation = timezone.now()
+            self.last_calculation_duration_ms = int((time.monotonic() - start_time) * 1000)
             self.errors_calculating = 0
         except Exception:
             self.errors_calculating = F("errors_calculating") + 1
@@ -349,12 +375,6 @@ class Cohort(models.Model):
     def __str__(self):
         return self.name
 
-    def _clickhouse_persons_query(self, batch_size=10000, offset=0):
-        from posthog.models.cohort.util import get_person_ids_by_cohort_id
-
-        uuids = get_person_ids_by_cohort_id(team=self.team, cohort_id=self.pk, limit=batch_size, offset=offset)
-        return Person.objects.filter(uuid__in=uuids, team=self.team)
-
     __repr__ = sane_repr("id", "name", "last_calculation")
 
 
@@ -375,6 +395,15 @@ class CohortPeople(models.Model):
         indexes = [models.Index(fields=["cohort_id", "person_id"])]
 
 
+def copy_cohort_people(cursor, cohort_id: int, version: Optional[int], person_ids: Iterable[int]) -> int:
+    "Inserts the persons into the cohort with COPY, which is much cheaper than INSERTs. Returns how many were copied."
+    version_value = r"\N" if version is None else str(int(version))
+    rows = [f"{person_id}\t{cohort_id}\t{version_value}\n" for person_id in person_ids]
+    if rows:
+        cursor.copy_expert(COPY_COHORT_PEOPLE_QUERY, io.StringIO("".join(rows)))
+    return len(rows)
+
+
 def batch_delete_cohort_people(cohort_id: int, version: int, batch_size: int = 1000):
     while batch := CohortPeople.objects.filter(cohort_id=cohort_id, version=version).values("id")[:batch_size]:
         CohortPeople.objects.filter(id__in=batch)._raw_delete(batch.db)  # type: ignore
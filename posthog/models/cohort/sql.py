@@ -48,6 +48,45 @@ FROM cohortpeople
 WHERE team_id = %(team_id)s AND cohort_id = %(cohort_id)s AND version < %(new_version)s AND sign = 1
 """
 
+# Same as above for the persons returned by `changed_person_ids` only. Everyone else keeps the rows of the version
+# they were last calculated in
+RECALCULATE_COHORT_INCREMENTALLY_BY_ID = """
+INSERT INTO cohortpeople
+SELECT id, %(cohort_id)s as cohort_id, %(team_id)s as team_id, 1 AS sign, %(new_version)s AS version
+FROM (
+    {cohort_filter}
+) as person
+WHERE id IN ({changed_person_ids})
+UNION ALL
+SELECT person_id, cohort_id, team_id, -1, version
+FROM cohortpeople
+WHERE team_id = %(team_id)s AND cohort_id = %(cohort_id)s AND version < %(new_version)s
+AND person_id IN ({changed_person_ids})
+GROUP BY person_id, cohort_id, team_id, version
+HAVING sum(sign) > 0
+"""
+
+# Persons whose properties or distinct ids changed since `changed_since`
+GET_CHANGED_PERSON_IDS_SQL = """
+SELECT id FROM person WHERE team_id = %(team_id)s AND _timestamp > %(changed_since)s
+UNION ALL
+SELECT person_id FROM person_distinct_id2 WHERE team_id = %(team_id)s AND _timestamp > %(changed_since)s
+"""
+
+# Persons with events of `changed_event_{idx}` that arrived since `changed_since`, or that dropped out of a time window
+# between `expired_from_{idx}` and `expired_to_{idx}`. Events from before `expired_from_{idx}` were already outside the
+# window at the last calculation, so they can't change membership
+GET_PERSON_IDS_WITH_CHANGED_EVENTS_SQL = """
+SELECT pdi.person_id FROM events
+INNER JOIN ({GET_TEAM_PERSON_DISTINCT_IDS}) as pdi
+ON events.distinct_id = pdi.distinct_id
+WHERE team_id = %(team_id)s AND event = %(changed_event_{idx})s AND timestamp > %(expired_from_{idx})s
+AND (
+    events._timestamp > %(changed_since)s
+    OR (timestamp > %(expired_from_{idx})s AND timestamp <= %(expired_to_{idx})s)
+)
+"""
+
 GET_DISTINCT_ID_BY_ENTITY_SQL = """
 SELECT distinct_id FROM events WHERE team_id = %(team_id)s {date_query} AND {entity_query}
 """
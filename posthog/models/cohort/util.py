@@ -1,9 +1,20 @@
 import uuid
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+    cast,
+)
 
+import pytz
 import structlog
 from dateutil import parser
+from dateutil.relativedelta import relativedelta
 from django.conf import settings
 from django.utils import timezone
 from rest_framework.exceptions import ValidationError
@@ -15,13 +26,16 @@ from posthog.models.action.util import format_action_filter
 from posthog.models.cohort.cohort import Cohort
 from posthog.models.cohort.sql import (
     CALCULATE_COHORT_PEOPLE_SQL,
+    GET_CHANGED_PERSON_IDS_SQL,
     GET_COHORT_SIZE_SQL,
     GET_COHORTS_BY_PERSON_UUID,
     GET_DISTINCT_ID_BY_ENTITY_SQL,
     GET_PERSON_ID_BY_ENTITY_COUNT_SQL,
     GET_PERSON_ID_BY_PRECALCULATED_COHORT_ID,
+    GET_PERSON_IDS_WITH_CHANGED_EVENTS_SQL,
     GET_STATIC_COHORTPEOPLE_BY_PERSON_UUID,
     RECALCULATE_COHORT_BY_ID,
+    RECALCULATE_COHORT_INCREMENTALLY_BY_ID,
 )
 from posthog.models.person.sql import (
     GET_LATEST_PERSON_SQL,
@@ -29,12 +43,15 @@ from posthog.models.person.sql import (
     INSERT_PERSON_STATIC_COHORT,
     PERSON_STATIC_COHORT_TABLE,
 )
-from posthog.models.property import Property, PropertyGroup
+from posthog.models.property import BehavioralPropertyType, Property, PropertyGroup
 from posthog.queries.person_distinct_id_query import get_team_distinct_ids_query
 
 # temporary marker to denote when cohortpeople table started being populated
 TEMP_PRECALCULATED_MARKER = parser.parse("2021-06-07T15:00:00+00:00")
 
+# Time windows of behavioral filters which incremental calculations can tell the expiring events of
+INCREMENTAL_TIME_INTERVALS = ("day", "week", "month", "year")
+
 logger = structlog.get_logger(__name__)
 
 
@@ -208,13 +225,15 @@ def format_cohort_subquery(cohort: Cohort, index: int, custom_match_field="perso
     return person_query, params
 
 
-def get_person_ids_by_cohort_id(team: Team, cohort_id: int, limit: Optional[int] = None, offset: Optional[int] = None):
+def _cohort_person_filter(team: Team, cohort_id: int) -> Tuple[str, Dict[str, Any]]:
     from posthog.models.property.util import parse_prop_grouped_clauses
 
     filters = Filter(data={"properties": [{"key": "id", "value": cohort_id, "type": "cohort"}]})
-    filter_query, filter_params = parse_prop_grouped_clauses(
-        team_id=team.pk, property_group=filters.property_groups, table_name="pdi"
-    )
+    return parse_prop_grouped_clauses(team_id=team.pk, property_group=filters.property_groups, table_name="pdi")
+
+
+def get_person_ids_by_cohort_id(team: Team, cohort_id: int, limit: Optional[int] = None, offset: Optional[int] = None):
+    filter_query, filter_params = _cohort_person_filter(team, cohort_id)
 
     results = sync_execute(
         GET_PERSON_IDS_BY_FILTER.format(
@@ -231,6 +250,36 @@ def get_person_ids_by_cohort_id(team: Team, cohort_id: int, limit: Optional[int]
     return [str(row[0]) for row in results]
 
 
+def iter_person_id_batches_by_cohort_id(team: Team, cohort_id: int, batch_size: int) -> Iterator[List[str]]:
+    """
+    Person ids of the cohort, `batch_size` at a time. Batches are paged through by person id, so that getting to the
+    last one doesn't mean going through all the ones before again, as an OFFSET would.
+    """
+    filter_query, filter_params = _cohort_person_filter(team, cohort_id)
+    after: Optional[str] = None
+
+    while True:
+        results = sync_execute(
+            GET_PERSON_IDS_BY_FILTER.format(
+                person_query=GET_LATEST_PERSON_SQL,
+                distinct_query=filter_query + (" AND p.id > toUUID(%(after)s)" if after is not None else ""),
+                query="",
+                GET_TEAM_PERSON_DISTINCT_IDS=get_team_distinct_ids_query(team.pk),
+                offset="",
+                limit="ORDER BY p.id ASC LIMIT %(limit)s",
+            ),
+            {**filter_params, "team_id": team.pk, "after": after, "limit": batch_size},
+        )
+        if not results:
+            return
+
+        yield [str(row[0]) for row in results]
+
+        if len(results) < batch_size:
+            return
+        after = str(results[-1][0])
+
+
 def insert_static_cohort(person_uuids: List[Optional[uuid.UUID]], cohort_id: int, team: Team):
     persons = (
         {
@@ -245,18 +294,46 @@ def insert_static_cohort(person_uuids: List[Optional[uuid.UUID]], cohort_id: int
     sync_execute(INSERT_PERSON_STATIC_COHORT, persons)
 
 
-def recalculate_cohortpeople(cohort: Cohort, pending_version: int) -> Optional[int]:
+def recalculate_cohortpeople(
+    cohort: Cohort, pending_version: int, incremental: bool = False, source_cohort_id: Optional[int] = None
+) -> Optional[int]:
+    """
+    Calculates the cohort's people as of `pending_version`.
+
+    With `incremental`, only the persons who may have moved in or out of the cohort since it was last calculated are
+    checked again, if `can_recalculate_incrementally` allows for it.
+
+    With `source_cohort_id`, people are copied over from that cohort instead, which has the same definition and was
+    just calculated.
+    """
 
-    cohort_query, cohort_params = format_person_query(cohort, 0)
+    if source_cohort_id is not None:
+        source_query, cohort_params = format_precalculated_cohort_query(source_cohort_id, 0)
+        cohort_query = f"SELECT person_id AS id FROM ({source_query})"
+    else:
+        cohort_query, cohort_params = format_person_query(cohort, 0)
 
     before_count = get_cohort_size(cohort.pk, cohort.team_id)
 
+    is_incremental = incremental and source_cohort_id is None and can_recalculate_incrementally(cohort, pending_version)
+
     if before_count:
         logger.info(
-            "Recalculating cohortpeople starting", team_id=cohort.team_id, cohort_id=cohort.pk, size_before=before_count
+            "Recalculating cohortpeople starting",
+            team_id=cohort.team_id,
+            cohort_id=cohort.pk,
+            size_before=before_count,
+            incremental=is_incremental,
         )
 
-    recalcluate_cohortpeople_sql = RECALCULATE_COHORT_BY_ID.format(cohort_filter=cohort_query)
+    if is_incremental:
+        changed_person_ids_query, changed_person_ids_params = get_changed_person_ids_query(cohort)
+        recalcluate_cohortpeople_sql = RECALCULATE_COHORT_INCREMENTALLY_BY_ID.format(
+            cohort_filter=cohort_query, changed_person_ids=changed_person_ids_query
+        )
+        cohort_params = {**cohort_params, **changed_person_ids_params}
+    else:
+        recalcluate_cohortpeople_sql = RECALCULATE_COHORT_BY_ID.format(cohort_filter=cohort_query)
 
     sync_execute(
         recalcluate_cohortpeople_sql,
@@ -277,6 +354,75 @@ def recalculate_cohortpeople(cohort: Cohort, pending_version: int) -> Optional[i
     return count
 
 
+def can_recalculate_incrementally(cohort: Cohort, pending_version: int) -> bool:
+    """
+    Cohorts are calculated from scratch when they never were, when the calculation before didn't go through (e.g. the
+    one queued after the cohort's filters changed), and every `COHORT_FULL_RECALCULATION_EVERY_N_VERSIONS` versions,
+    to make up for anything incremental calculations missed.
+    """
+    return (
+        settings.COHORT_INCREMENTAL_RECALCULATION_ENABLED
+        and not cohort.is_static
+        and cohort.last_calculation is not None
+        and cohort.version is not None
+        and cohort.version == pending_version - 1
+        and not cohort.errors_calculating
+        and pending_version % settings.COHORT_FULL_RECALCULATION_EVERY_N_VERSIONS != 0
+        and len(cohort.properties.values) > 0
+        and all(_can_check_incrementally(prop) for prop in cohort.properties.flat)
+    )
+
+
+def _can_check_incrementally(prop: Property) -> bool:
+    "Whether a person can only start or stop matching the property when the person or their events change."
+    if prop.type == "person":
+        # Relative dates match other persons as time passes
+        return prop.operator not in ("is_date_exact", "is_date_after", "is_date_before")
+    return (
+        prop.type == "behavioral"
+        and prop.value in (BehavioralPropertyType.PERFORMED_EVENT, BehavioralPropertyType.PERFORMED_EVENT_MULTIPLE)
+        and prop.event_type == "events"
+        and prop.time_value is not None
+        and prop.time_interval in INCREMENTAL_TIME_INTERVALS
+    )
+
+
+def get_changed_person_ids_query(cohort: Cohort) -> Tuple[str, Dict[str, Any]]:
+    """
+    Persons who may have moved in or out of the cohort since it was last calculated: those whose properties or
+    distinct ids changed, who performed any of the cohort's events, or whose events dropped out of a time window.
+    """
+    now = timezone.now()
+    changed_since = cast(datetime, cohort.last_calculation) - timedelta(
+        seconds=settings.COHORT_INCREMENTAL_RECALCULATION_LOOKBACK_SECONDS
+    )
+
+    queries = [GET_CHANGED_PERSON_IDS_SQL]
+    params: Dict[str, Any] = {"changed_since": _format_timestamp(changed_since)}
+    for idx, prop in enumerate(cohort.properties.flat):
+        if prop.type != "behavioral":
+            continue
+        time_window = relativedelta(**{f"{prop.time_interval}s": int(cast(int, prop.time_value))})
+        queries.append(
+            GET_PERSON_IDS_WITH_CHANGED_EVENTS_SQL.format(
+                idx=idx, GET_TEAM_PERSON_DISTINCT_IDS=get_team_distinct_ids_query(cohort.team_id)
+            )
+        )
+        params.update(
+            {
+                f"changed_event_{idx}": prop.key,
+                f"expired_from_{idx}": _format_timestamp(changed_since - time_window),
+                f"expired_to_{idx}": _format_timestamp(now - time_window),
+            }
+        )
+
+    return " UNION ALL ".join(queries), params
+
+
+def _format_timestamp(timestamp: datetime) -> str:
+    return timestamp.astimezone(pytz.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
 def get_cohort_size(cohort_id: int, team_id: int) -> Optional[int]:
     count_result = sync_execute(GET_COHORT_SIZE_SQL, {"cohort_id": cohort_id, "team_id": team_id})
 
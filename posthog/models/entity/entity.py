@@ -1,4 +1,3 @@
-import inspect
 from typing import Any, Counter, Dict, Literal, Optional, Union
 
 from django.conf import settings
@@ -8,6 +7,7 @@ from posthog.constants import TREND_FILTER_TYPE_ACTIONS, TREND_FILTER_TYPE_EVENT
 from posthog.models.action import Action
 from posthog.models.filters.mixins.funnel import FunnelFromToStepsMixin
 from posthog.models.filters.mixins.property import PropertyMixin
+from posthog.models.filters.mixins.utils import marked_methods
 from posthog.models.filters.utils import validate_group_type_index
 from posthog.models.property import GroupTypeIndex
 from posthog.models.utils import sane_repr
@@ -157,8 +157,7 @@ class ExclusionEntity(Entity, FunnelFromToStepsMixin):
 
         ret = super().to_dict()
 
-        for _, func in inspect.getmembers(self, inspect.ismethod):
-            if hasattr(func, "include_dict"):  # provided by @include_dict decorator
-                ret.update(func())
+        for name in marked_methods(type(self), "include_dict"):
+            ret.update(getattr(self, name)())
 
         return ret
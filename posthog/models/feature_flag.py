@@ -1,17 +1,36 @@
 import hashlib
+import json
+import uuid
 from dataclasses import dataclass
 from enum import Enum
-from typing import Any, Dict, List, Optional, Tuple, Union, cast
-
+from typing import (
+    Any,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    cast,
+)
+
+import structlog
+from django.conf import settings
 from django.core.cache import cache
-from django.db import models
-from django.db.models.expressions import ExpressionWrapper, RawSQL
+from django.db import models, transaction
+from django.db.models import Q
+from django.db.models.expressions import ExpressionWrapper, F, RawSQL
 from django.db.models.fields import BooleanField
 from django.db.models.query import QuerySet
-from django.db.models.signals import pre_delete
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.utils import timezone
 from sentry_sdk.api import capture_exception
+from statshog.defaults.django import statsd
 
+from posthog import json_codec
+from posthog.cache_utils import LocalTTLCache
 from posthog.client import sync_execute
 from posthog.constants import PropertyOperatorType
 from posthog.models.cohort import Cohort
@@ -24,11 +43,14 @@ from posthog.models.property import GroupTypeIndex, GroupTypeName
 from posthog.models.property.property import Property, PropertyGroup
 from posthog.models.signals import mutable_receiver
 from posthog.models.team.team import Team
-from posthog.queries.base import match_property, properties_to_Q
+from posthog.queries.base import match_property, match_property_locally, properties_to_Q
+from posthog.redis import get_client
 
 from .filters import Filter
 from .person import Person, PersonDistinctId
 
+logger = structlog.get_logger(__name__)
+
 __LONG_SCALE__ = float(0xFFFFFFFFFFFFFFF)
 
 
@@ -65,6 +87,58 @@ class FeatureFlagMatch:
     condition_index: Optional[int] = None
 
 
+@dataclass(frozen=True)
+class CompiledFeatureFlagCondition:
+    index: int
+    properties: Tuple[Property, ...]
+    rollout_percentage: Optional[float]
+    # Only set if it points to one of the flag's variants
+    variant_override: Optional[str]
+
+
+@dataclass(frozen=True)
+class CompiledFeatureFlagVariant:
+    key: str
+    value_min: float
+    value_max: float
+
+
+@dataclass(frozen=True)
+class CompiledFeatureFlag:
+    """
+    Immutable evaluation plan for a feature flag: properties are parsed, conditions sorted and variant boundaries
+    computed once per flag definition instead of on every /decide request.
+    """
+
+    key: str
+    aggregation_group_type_index: Optional[GroupTypeIndex]
+    ensure_experience_continuity: bool
+    conditions: Tuple[CompiledFeatureFlagCondition, ...]
+    # Stable sort of conditions with variant overrides to the top. This ensures that if overrides are present, they are
+    # evaluated first, and the variant override is applied to the first matching condition.
+    evaluation_order: Tuple[CompiledFeatureFlagCondition, ...]
+    # Define contiguous sub-domains within [0, 1].
+    # By looking up a random hash value, you can find the associated variant key.
+    # e.g. the first of two variants with 50% rollout percentage will have value_max: 0.5
+    # and the second will have value_min: 0.5 and value_max: 1.0
+    variants: Tuple[CompiledFeatureFlagVariant, ...]
+    hash_prefix: bytes
+
+    def get_hash(self, identifier: str, salt: str = "") -> float:
+        hash_val = int(hashlib.sha1(self.hash_prefix + f"{identifier}{salt}".encode("utf-8")).hexdigest()[:15], 16)
+        return hash_val / __LONG_SCALE__
+
+    def get_variant(self, hash_value: float) -> Optional[str]:
+        for variant in self.variants:
+            if variant.value_min <= hash_value < variant.value_max:
+                return variant.key
+        return None
+
+
+# Compiled flags are keyed by their full definition, so any change to a flag yields a new entry in every process
+_compiled_feature_flags = LocalTTLCache(max_size=10_000, ttl_seconds=60 * 60)
+
+
 class FeatureFlag(models.Model):
     class Meta:
         constraints = [models.UniqueConstraint(fields=["team", "key"], name="unique key for team")]
@@ -261,6 +335,56 @@ class FeatureFlag(models.Model):
             for cohort in Cohort.objects.filter(pk__in=self.cohort_ids):
                 update_cohort(cohort)
 
+    def compile(self) -> CompiledFeatureFlag:
+        # :TRICKY: Memoized on the instance, as the definitions cache hands the same instances to every request until
+        # a flag changes, so that evaluations don't serialize the definition. Updates assign new `filters`, which
+        # invalidates the memo.
+        fields = (self.pk, self.key, self.ensure_experience_continuity, self.rollout_percentage)
+        memoized = getattr(self, "_compiled_flag", None)
+        if memoized is not None and memoized[0] is self.filters and memoized[1] == fields:
+            return memoized[2]
+
+        cache_key = (*fields, json.dumps(self.get_filters(), sort_keys=True, default=str))
+        compiled_flag = _compiled_feature_flags.get(cache_key)
+        if compiled_flag is None:
+            compiled_flag = self._compile()
+            _compiled_feature_flags.set(cache_key, compiled_flag)
+        self._compiled_flag = (self.filters, fields, compiled_flag)
+        return compiled_flag
+
+    def _compile(self) -> CompiledFeatureFlag:
+        variant_keys = {variant["key"] for variant in self.variants}
+        conditions = tuple(
+            CompiledFeatureFlagCondition(
+                index=index,
+                properties=tuple(Filter(data=condition).property_groups.flat)
+                if len(condition.get("properties", [])) > 0
+                else (),
+                rollout_percentage=condition.get("rollout_percentage"),
+                variant_override=condition.get("variant") if condition.get("variant") in variant_keys else None,
+            )
+            for index, condition in enumerate(self.conditions)
+        )
+
+        variants = []
+        value_min = 0.0
+        for variant in self.variants:
+            value_max = value_min + variant["rollout_percentage"] / 100
+            variants.append(CompiledFeatureFlagVariant(key=variant["key"], value_min=value_min, value_max=value_max))
+            value_min = value_max
+
+        return CompiledFeatureFlag(
+            key=self.key,
+            aggregation_group_type_index=self.aggregation_group_type_index,
+            ensure_experience_continuity=bool(self.ensure_experience_continuity),
+            conditions=conditions,
+            evaluation_order=tuple(
+                sorted(conditions, key=lambda condition: 0 if self.conditions[condition.index].get("variant") else 1)
+            ),
+            variants=tuple(variants),
+            hash_prefix=f"{self.key}.".encode("utf-8"),
+        )
+
     def __str__(self):
         return f"{self.key} ({self.pk})"
 
@@ -268,6 +392,125 @@ class FeatureFlag(models.Model):
 @mutable_receiver(pre_delete, sender=Experiment)
 def delete_experiment_flags(sender, instance, **kwargs):
     FeatureFlag.objects.filter(experiment=instance).update(deleted=True)
+    bump_team_feature_flags_version(instance.team_id)
+
+
+@mutable_receiver([post_save, post_delete], sender=FeatureFlag)
+def feature_flag_changed(sender, instance: FeatureFlag, **kwargs):
+    bump_team_feature_flags_version(instance.team_id)
+
+
+# Fields needed to evaluate flags, see `get_active_feature_flags`
+FEATURE_FLAG_EVALUATION_FIELDS = (
+    "id",
+    "team_id",
+    "filters",
+    "key",
+    "rollout_percentage",
+    "ensure_experience_continuity",
+)
+
+_feature_flag_definitions = LocalTTLCache(
+    max_size=settings.FEATURE_FLAG_DEFINITIONS_CACHE_MAX_TEAMS,
+    ttl_seconds=settings.FEATURE_FLAG_DEFINITIONS_CACHE_TTL_SECONDS,
+)
+
+
+def _team_feature_flags_version_key(team_id: int) -> str:
+    return f"team_feature_flags_version:{team_id}"
+
+
+def _team_feature_flags_key(team_id: int, version: str) -> str:
+    return f"team_feature_flags:{team_id}:{version}"
+
+
+def bump_team_feature_flags_version(team_id: int) -> None:
+    """
+    Invalidates cached flag definitions for a team everywhere by replacing its version.
+
+    :TRICKY: Versions are random rather than incremented, so that losing the version key in Redis can never
+    make a previously cached (and possibly stale) set of definitions current again.
+    """
+
+    def _bump():
+        try:
+            get_client().set(_team_feature_flags_version_key(team_id), uuid.uuid4().hex)
+        except Exception as e:
+            logger.warning("feature_flag_definitions_cache_bump_failed", team_id=team_id, exc_info=e)
+            statsd.incr("feature_flag_definitions_cache_error", tags={"operation": "bump"})
+
+    # Bumping before the transaction commits would let a concurrent request cache the old definitions under the new
+    # version
+    transaction.on_commit(_bump)
+
+
+def _get_team_feature_flags_version(team_id: int) -> str:
+    client = get_client()
+    version = client.get(_team_feature_flags_version_key(team_id))
+    if version is None:
+        version = uuid.uuid4().hex.encode("utf-8")
+        if not client.set(_team_feature_flags_version_key(team_id), version, nx=True):
+            version = client.get(_team_feature_flags_version_key(team_id))
+    return version.decode("utf-8")
+
+
+def _fetch_active_feature_flags(team_id: int) -> List[FeatureFlag]:
+    return list(
+        FeatureFlag.objects.filter(team_id=team_id, active=True, deleted=False).only(*FEATURE_FLAG_EVALUATION_FIELDS)
+    )
+
+
+def get_active_feature_flags_for_team(team_id: int) -> List[FeatureFlag]:
+    """
+    Returns the team's active flags, looking in the per-process cache and then in Redis before hitting Postgres.
+
+    Cached flags are unsaved `FeatureFlag` instances with only `FEATURE_FLAG_EVALUATION_FIELDS` set.
+    """
+    if not settings.FEATURE_FLAG_DEFINITIONS_CACHE_ENABLED:
+        return _fetch_active_feature_flags(team_id)
+
+    try:
+        version = _get_team_feature_flags_version(team_id)
+    except Exception as e:
+        logger.warning("feature_flag_definitions_cache_version_failed", team_id=team_id, exc_info=e)
+        statsd.incr("feature_flag_definitions_cache_error", tags={"operation": "version"})
+        return _fetch_active_feature_flags(team_id)
+
+    cached = _feature_flag_definitions.get(team_id)
+    if cached is not None and cached[0] == version:
+        statsd.incr("feature_flag_definitions_cache_hit", tags={"tier": "local"})
+        return cached[1]
+
+    feature_flags: Optional[List[FeatureFlag]] = None
+    try:
+        payload = get_client().get(_team_feature_flags_key(team_id, version))
+        if payload is not None:
+            feature_flags = [FeatureFlag(**values) for values in json_codec.loads(payload)]
+            statsd.incr("feature_flag_definitions_cache_hit", tags={"tier": "redis"})
+    except Exception as e:
+        logger.warning("feature_flag_definitions_cache_get_failed", team_id=team_id, exc_info=e)
+        statsd.incr("feature_flag_definitions_cache_error", tags={"operation": "get"})
+
+    if feature_flags is None:
+        statsd.incr("feature_flag_definitions_cache_miss")
+        feature_flags = _fetch_active_feature_flags(team_id)
+        try:
+            get_client().set(
+                _team_feature_flags_key(team_id, version),
+                json_codec.dumps_bytes(
+                    [
+                        {field: getattr(flag, field) for field in FEATURE_FLAG_EVALUATION_FIELDS}
+                        for flag in feature_flags
+                    ]
+                ),
+                ex=settings.FEATURE_FLAG_DEFINITIONS_CACHE_TTL_SECONDS,
+            )
+        except Exception as e:
+            logger.warning("feature_flag_definitions_cache_set_failed", team_id=team_id, exc_info=e)
+            statsd.incr("feature_flag_definitions_cache_error", tags={"operation": "set"})
+
+    _feature_flag_definitions.set(team_id, (version, feature_flags))
+    return feature_flags
 
 
 class FeatureFlagHashKeyOverride(models.Model):
@@ -302,6 +545,66 @@ class FlagsMatcherCache:
         return {value: key for key, value in self.group_types_to_indexes.items()}
 
 
+@dataclass(frozen=True)
+class PersonFlagProperties:
+    id: int
+    properties: Dict[str, Any]
+
+
+_missing = object()
+_person_flag_properties = LocalTTLCache(
+    max_size=settings.FEATURE_FLAG_PROPERTIES_CACHE_MAX_SIZE,
+    ttl_seconds=settings.FEATURE_FLAG_PROPERTIES_CACHE_TTL_SECONDS,
+)
+
+
+def get_person_properties_for_flags(team_id: int, distinct_id: str) -> Optional[PersonFlagProperties]:
+    cache_key = ("person", team_id, distinct_id)
+    person = _person_flag_properties.get(cache_key, _missing)
+    if person is _missing:
+        row = (
+            Person.objects.filter(
+                team_id=team_id, persondistinctid__distinct_id=distinct_id, persondistinctid__team_id=team_id
+            )
+            .values_list("id", "properties")
+            .first()
+        )
+        person = PersonFlagProperties(id=row[0], properties=row[1] or {}) if row else None
+        _person_flag_properties.set(cache_key, person)
+    return cast(Optional[PersonFlagProperties], person)
+
+
+def get_group_properties_for_flags(
+    team_id: int, group_type_index: GroupTypeIndex, group_key: str
+) -> Optional[Dict[str, Any]]:
+    cache_key = ("group", team_id, group_type_index, group_key)
+    group_properties = _person_flag_properties.get(cache_key, _missing)
+    if group_properties is _missing:
+        group_properties = (
+            Group.objects.filter(team_id=team_id, group_type_index=group_type_index, group_key=group_key)
+            .values_list("group_properties", flat=True)
+            .first()
+        )
+        _person_flag_properties.set(cache_key, group_properties)
+    return cast(Optional[Dict[str, Any]], group_properties)
+
+
+def get_cohort_ids_for_person(team_id: int, person_id: int) -> FrozenSet[int]:
+    "Cohorts the person is currently in, matching the version checks done by `Property.property_to_Q`."
+    from posthog.models.cohort import CohortPeople
+
+    cache_key = ("cohorts", team_id, person_id)
+    cohort_ids = _person_flag_properties.get(cache_key)
+    if cohort_ids is None:
+        cohort_ids = frozenset(
+            CohortPeople.objects.filter(person_id=person_id, cohort__team_id=team_id)
+            .filter(Q(cohort__is_static=True) | Q(cohort__version__isnull=True) | Q(version=F("cohort__version")))
+            .values_list("cohort_id", flat=True)
+        )
+        _person_flag_properties.set(cache_key, cohort_ids)
+    return cohort_ids
+
+
 class FeatureFlagMatcher:
     def __init__(
         self,
@@ -312,6 +615,8 @@ class FeatureFlagMatcher:
         hash_key_overrides: Dict[str, str] = {},
         property_value_overrides: Dict[str, str] = {},
         group_property_value_overrides: Dict[str, Dict[str, str]] = {},
+        compiled_flags: Optional[Dict[str, CompiledFeatureFlag]] = None,
+        precomputed_query_conditions: Optional[Dict[str, bool]] = None,
     ):
         self.feature_flags = feature_flags
         self.distinct_id = distinct_id
@@ -320,6 +625,17 @@ class FeatureFlagMatcher:
         self.hash_key_overrides = hash_key_overrides
         self.property_value_overrides = property_value_overrides
         self.group_property_value_overrides = group_property_value_overrides
+        # Both can be shared between matchers when evaluating flags for many distinct_ids at once,
+        # see `get_feature_flags_for_distinct_ids`
+        self._compiled_flags: Dict[str, CompiledFeatureFlag] = compiled_flags if compiled_flags is not None else {}
+        self.precomputed_query_conditions = precomputed_query_conditions
+        self._hashes: Dict[Tuple[str, str], float] = {}
+
+    def get_compiled_flag(self, feature_flag: FeatureFlag) -> CompiledFeatureFlag:
+        compiled_flag = self._compiled_flags.get(feature_flag.key)
+        if compiled_flag is None:
+            compiled_flag = self._compiled_flags[feature_flag.key] = feature_flag.compile()
+        return compiled_flag
 
     def get_match(self, feature_flag: FeatureFlag) -> FeatureFlagMatch:
         # If aggregating flag by groups and relevant group type is not passed - flag is off!
@@ -328,30 +644,20 @@ class FeatureFlagMatcher:
 
         highest_priority_evaluation_reason = FeatureFlagMatchReason.NO_CONDITION_MATCH
         highest_priority_index = 0
-        # Stable sort conditions with variant overrides to the top. This ensures that if overrides are present, they are
-        # evaluated first, and the variant override is applied to the first matching condition.
-        # :TRICKY: We need to include the enumeration index before the sort so the flag evaluation reason gets the right condition index.
-        sorted_flag_conditions = sorted(
-            enumerate(feature_flag.conditions),
-            key=lambda condition_tuple: 0 if condition_tuple[1].get("variant") else 1,
-        )
-        for index, condition in sorted_flag_conditions:
-            is_match, evaluation_reason = self.is_condition_match(feature_flag, condition, index)
+        # :TRICKY: Conditions are pre-sorted with variant overrides first, but keep their original index
+        # so the flag evaluation reason gets the right condition index.
+        for condition in self.get_compiled_flag(feature_flag).evaluation_order:
+            is_match, evaluation_reason = self.is_condition_match(feature_flag, condition)
             if is_match:
-                variant_override = condition.get("variant")
-                if variant_override in [variant["key"] for variant in feature_flag.variants]:
-                    variant = variant_override
-                else:
-                    variant = self.get_matching_variant(feature_flag)
                 return FeatureFlagMatch(
                     match=True,
-                    variant=variant,
+                    variant=condition.variant_override or self.get_matching_variant(feature_flag),
                     reason=evaluation_reason,
-                    condition_index=index,
+                    condition_index=condition.index,
                 )
 
             highest_priority_evaluation_reason, highest_priority_index = self.get_highest_priority_match_evaluation(
-                highest_priority_evaluation_reason, highest_priority_index, evaluation_reason, index
+                highest_priority_evaluation_reason, highest_priority_index, evaluation_reason, condition.index
             )
 
         return FeatureFlagMatch(
@@ -376,21 +682,14 @@ class FeatureFlagMatcher:
         return flags_enabled, flag_evaluation_reasons
 
     def get_matching_variant(self, feature_flag: FeatureFlag) -> Optional[str]:
-        for variant in self.variant_lookup_table(feature_flag):
-            if (
-                self.get_hash(feature_flag, salt="variant") >= variant["value_min"]
-                and self.get_hash(feature_flag, salt="variant") < variant["value_max"]
-            ):
-                return variant["key"]
-        return None
+        return self.get_compiled_flag(feature_flag).get_variant(self.get_hash(feature_flag, salt="variant"))
 
     def is_condition_match(
-        self, feature_flag: FeatureFlag, condition: Dict, condition_index: int
+        self, feature_flag: FeatureFlag, condition: CompiledFeatureFlagCondition
     ) -> Tuple[bool, FeatureFlagMatchReason]:
-        rollout_percentage = condition.get("rollout_percentage")
-        if len(condition.get("properties", [])) > 0:
-            properties = Filter(data=condition).property_groups.flat
-            if self.can_compute_locally(properties, feature_flag.aggregation_group_type_index):
+        rollout_percentage = condition.rollout_percentage
+        if len(condition.properties) > 0:
+            if self.can_compute_locally(condition.properties, feature_flag.aggregation_group_type_index):
                 # :TRICKY: If overrides are enough to determine if a condition is a match,
                 # we can skip checking the query.
                 # This ensures match even if the person hasn't been ingested yet.
@@ -399,9 +698,9 @@ class FeatureFlagMatcher:
                     target_properties = self.group_property_value_overrides.get(
                         self.cache.group_type_index_to_name[feature_flag.aggregation_group_type_index], {}
                     )
-                condition_match = all(match_property(property, target_properties) for property in properties)
+                condition_match = all(match_property(property, target_properties) for property in condition.properties)
             else:
-                condition_match = self._condition_matches(feature_flag, condition_index)
+                condition_match = self._condition_matches(feature_flag, condition)
 
             if not condition_match:
                 return False, FeatureFlagMatchReason.NO_CONDITION_MATCH
@@ -413,21 +712,54 @@ class FeatureFlagMatcher:
 
         return True, FeatureFlagMatchReason.CONDITION_MATCH
 
-    def _condition_matches(self, feature_flag: FeatureFlag, condition_index: int) -> bool:
-        return self.query_conditions.get(f"flag_{feature_flag.pk}_condition_{condition_index}", False)
+    def _condition_matches(self, feature_flag: FeatureFlag, condition: CompiledFeatureFlagCondition) -> bool:
+        if self.precomputed_query_conditions is not None:
+            query_conditions = self.precomputed_query_conditions
+        elif settings.FEATURE_FLAG_LOCAL_PROPERTY_EVALUATION:
+            return self._condition_matches_locally(feature_flag, condition)
+        else:
+            query_conditions = self.query_conditions
+        return query_conditions.get(f"flag_{feature_flag.pk}_condition_{condition.index}", False)
 
-    # Define contiguous sub-domains within [0, 1].
-    # By looking up a random hash value, you can find the associated variant key.
-    # e.g. the first of two variants with 50% rollout percentage will have value_max: 0.5
-    # and the second will have value_min: 0.5 and value_max: 1.0
-    def variant_lookup_table(self, feature_flag: FeatureFlag):
-        lookup_table = []
-        value_min = 0
-        for variant in feature_flag.variants:
-            value_max = value_min + variant["rollout_percentage"] / 100
-            lookup_table.append({"value_min": value_min, "value_max": value_max, "key": variant["key"]})
-            value_min = value_max
-        return lookup_table
+    def _condition_matches_locally(self, feature_flag: FeatureFlag, condition: CompiledFeatureFlagCondition) -> bool:
+        """
+        Evaluates a condition in Python against person or group properties fetched once per matcher (and cached
+        briefly across requests), instead of adding it to the `query_conditions` query.
+        """
+        cohort_ids: Optional[FrozenSet[int]] = None
+        if feature_flag.aggregation_group_type_index is None:
+            person = self.person_for_local_evaluation
+            if person is None:
+                return False
+            stored_properties, overrides = person.properties, self.property_value_overrides
+            if any(property.type == "cohort" for property in condition.properties):
+                cohort_ids = get_cohort_ids_for_person(self.cache.team_id, person.id)
+        else:
+            group_type_name = self.cache.group_type_index_to_name.get(feature_flag.aggregation_group_type_index)
+            group_key = self.groups.get(group_type_name)  # type: ignore
+            if group_key is None:
+                return False
+            group_properties = get_group_properties_for_flags(
+                self.cache.team_id, feature_flag.aggregation_group_type_index, group_key
+            )
+            if group_properties is None:
+                return False
+            stored_properties = group_properties
+            overrides = self.group_property_value_overrides.get(cast(str, group_type_name), {})
+
+        for property in condition.properties:
+            # :TRICKY: Same precedence as `properties_to_Q`: overrides win, except for is_not_set which always looks
+            # at the stored properties.
+            target_properties = (
+                overrides if property.key in overrides and property.operator != "is_not_set" else stored_properties
+            )
+            if not match_property_locally(property, target_properties, cohort_ids):
+                return False
+        return True
+
+    @cached_property
+    def person_for_local_evaluation(self) -> Optional["PersonFlagProperties"]:
+        return get_person_properties_for_flags(self.cache.team_id, self.distinct_id)
 
     @cached_property
     def query_conditions(self) -> Dict[str, bool]:
@@ -452,10 +784,10 @@ class FeatureFlagMatcher:
         person_fields = []
 
         for feature_flag in self.feature_flags:
-            for index, condition in enumerate(feature_flag.conditions):
-                key = f"flag_{feature_flag.pk}_condition_{index}"
+            for condition in self.get_compiled_flag(feature_flag).conditions:
+                key = f"flag_{feature_flag.pk}_condition_{condition.index}"
                 expr: Any = None
-                if len(condition.get("properties", {})) > 0:
+                if len(condition.properties) > 0:
                     # Feature Flags don't support OR filtering yet
                     target_properties = self.property_value_overrides
                     if feature_flag.aggregation_group_type_index is not None:
@@ -463,7 +795,7 @@ class FeatureFlagMatcher:
                             self.cache.group_type_index_to_name[feature_flag.aggregation_group_type_index], {}
                         )
                     expr = properties_to_Q(
-                        Filter(data=condition).property_groups.flat,
+                        list(condition.properties),
                         team_id=team_id,
                         is_direct_query=True,
                         override_property_values=target_properties,
@@ -529,12 +861,15 @@ class FeatureFlagMatcher:
     # uniformly distributed between 0 and 1, so if we want to show this feature to 20% of traffic
     # we can do _hash(key, identifier) < 0.2
     def get_hash(self, feature_flag: FeatureFlag, salt="") -> float:
-        hash_key = f"{feature_flag.key}.{self.hashed_identifier(feature_flag)}{salt}"
-        hash_val = int(hashlib.sha1(hash_key.encode("utf-8")).hexdigest()[:15], 16)
-        return hash_val / __LONG_SCALE__
+        hash_value = self._hashes.get((feature_flag.key, salt))
+        if hash_value is None:
+            hash_value = self._hashes[(feature_flag.key, salt)] = self.get_compiled_flag(feature_flag).get_hash(
+                str(self.hashed_identifier(feature_flag)), salt
+            )
+        return hash_value
 
     def can_compute_locally(
-        self, properties: List[Property], group_type_index: Optional[GroupTypeIndex] = None
+        self, properties: Sequence[Property], group_type_index: Optional[GroupTypeIndex] = None
     ) -> bool:
         target_properties = self.property_value_overrides
         if group_type_index is not None:
@@ -612,9 +947,7 @@ def get_active_feature_flags(
     group_property_value_overrides: Dict[str, Dict[str, str]] = {},
 ) -> Tuple[Dict[str, Union[str, bool]], Dict[str, dict]]:
 
-    all_feature_flags = FeatureFlag.objects.filter(team_id=team_id, active=True, deleted=False).only(
-        "id", "team_id", "filters", "key", "rollout_percentage", "ensure_experience_continuity"
-    )
+    all_feature_flags = get_active_feature_flags_for_team(team_id)
 
     flags_have_experience_continuity_enabled = any(
         feature_flag.ensure_experience_continuity for feature_flag in all_feature_flags
@@ -622,7 +955,7 @@ def get_active_feature_flags(
 
     if not flags_have_experience_continuity_enabled:
         return _get_active_feature_flags(
-            list(all_feature_flags),
+            all_feature_flags,
             team_id,
             distinct_id,
             groups=groups,
@@ -663,7 +996,7 @@ def get_active_feature_flags(
     # We can optimise by not going down this path when person_id doesn't exist, or
     # no flags have experience continuity enabled
     return _get_active_feature_flags(
-        list(all_feature_flags),
+        all_feature_flags,
         team_id,
         distinct_id,
         person_id,
@@ -673,8 +1006,85 @@ def get_active_feature_flags(
     )
 
 
+def get_feature_flags_for_distinct_ids(
+    team_id: int, distinct_ids: List[str], groups: Dict[GroupTypeName, str] = {}
+) -> Dict[str, Dict[str, Union[str, bool]]]:
+    """
+    Evaluates all active flags of a team for many distinct_ids at once.
+
+    Person conditions for the whole batch are computed in a single Person query, group conditions (groups are shared
+    by the batch) in one query per group type, and hash key overrides in one more query, instead of a round of queries
+    per distinct_id. Property overrides aren't supported, as they'd make the person query differ per distinct_id.
+    """
+    feature_flags = get_active_feature_flags_for_team(team_id)
+    if not feature_flags:
+        return {distinct_id: {} for distinct_id in distinct_ids}
+
+    cache = FlagsMatcherCache(team_id)
+    compiled_flags = {feature_flag.key: feature_flag.compile() for feature_flag in feature_flags}
+    person_flags = [flag for flag in feature_flags if compiled_flags[flag.key].aggregation_group_type_index is None]
+    group_flags = [flag for flag in feature_flags if compiled_flags[flag.key].aggregation_group_type_index is not None]
+    has_experience_continuity = any(
+        compiled_flag.ensure_experience_continuity for compiled_flag in compiled_flags.values()
+    )
+
+    person_fields = []
+    person_query: QuerySet = Person.objects.filter(
+        team_id=team_id, persondistinctid__distinct_id__in=distinct_ids, persondistinctid__team_id=team_id
+    ).annotate(matched_distinct_id=F("persondistinctid__distinct_id"))
+    for feature_flag in person_flags:
+        for condition in compiled_flags[feature_flag.key].conditions:
+            if len(condition.properties) > 0:
+                key = f"flag_{feature_flag.pk}_condition_{condition.index}"
+                person_query = person_query.annotate(
+                    **{
+                        key: ExpressionWrapper(
+                            properties_to_Q(list(condition.properties), team_id=team_id, is_direct_query=True),
+                            output_field=BooleanField(),
+                        )
+                    }
+                )
+                person_fields.append(key)
+
+    person_conditions: Dict[str, Dict[str, bool]] = {}
+    person_ids: Dict[str, int] = {}
+    if person_fields or has_experience_continuity:
+        for row in person_query.values("id", "matched_distinct_id", *person_fields):
+            distinct_id = row.pop("matched_distinct_id")
+            person_ids[distinct_id] = row.pop("id")
+            person_conditions[distinct_id] = row
+
+    group_conditions: Dict[str, bool] = {}
+    if group_flags and groups:
+        group_conditions = FeatureFlagMatcher(
+            group_flags, "", groups, cache, compiled_flags=compiled_flags
+        ).query_conditions
+
+    overrides_per_person: Dict[int, Dict[str, str]] = {}
+    if person_ids and has_experience_continuity:
+        for person_id, feature_flag_key, hash_key in FeatureFlagHashKeyOverride.objects.filter(
+            team_id=team_id, person_id__in=set(person_ids.values())
+        ).values_list("person_id", "feature_flag_key", "hash_key"):
+            overrides_per_person.setdefault(person_id, {})[feature_flag_key] = hash_key
+
+    flags_per_distinct_id = {}
+    for distinct_id in distinct_ids:
+        person_id = person_ids.get(distinct_id)
+        flags_per_distinct_id[distinct_id], _ = FeatureFlagMatcher(
+            feature_flags,
+            distinct_id,
+            groups,
+            cache,
+            hash_key_overrides=overrides_per_person.get(person_id, {}) if person_id is not None else {},
+            compiled_flags=compiled_flags,
+            precomputed_query_conditions={**person_conditions.get(distinct_id, {}), **group_conditions},
+        ).get_matches()
+
+    return flags_per_distinct_id
+
+
 def set_feature_flag_hash_key_overrides(
-    feature_flags: QuerySet, team_id: int, person_id: int, hash_key_override: str
+    feature_flags: Iterable[FeatureFlag], team_id: int, person_id: int, hash_key_override: str
 ) -> None:
 
     existing_flag_overrides = set(
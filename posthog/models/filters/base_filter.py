@@ -1,10 +1,10 @@
-import inspect
 import json
 from typing import Any, Dict, Optional
 
 from rest_framework import request
 
 from posthog.models.filters.mixins.common import BaseParamMixin
+from posthog.models.filters.mixins.utils import marked_methods
 from posthog.models.utils import sane_repr
 from posthog.utils import encode_get_request_params
 
@@ -29,9 +29,8 @@ class BaseFilter(BaseParamMixin):
     def to_dict(self) -> Dict[str, Any]:
         ret = {}
 
-        for _, func in inspect.getmembers(self, inspect.ismethod):
-            if hasattr(func, "include_dict"):  # provided by @include_dict decorator
-                ret.update(func())
+        for name in marked_methods(type(self), "include_dict"):
+            ret.update(getattr(self, name)())
 
         return ret
 
@@ -39,7 +38,8 @@ class BaseFilter(BaseParamMixin):
         return encode_get_request_params(data=self.to_dict())
 
     def toJSON(self):
-        return json.dumps(self.to_dict(), default=lambda o: o.__dict__, sort_keys=True, indent=4)
+        "Canonical serialization of the filter, used for cache keys among others"
+        return json.dumps(self.to_dict(), default=lambda o: o.__dict__, sort_keys=True, separators=(",", ":"))
 
     def with_data(self, overrides: Dict[str, Any]):
         "Allow making copy of filter whilst preserving the class"
@@ -48,9 +48,8 @@ class BaseFilter(BaseParamMixin):
     def query_tags(self) -> Dict[str, Any]:
         ret = {}
 
-        for _, func in inspect.getmembers(self, inspect.ismethod):
-            if hasattr(func, "include_query_tags"):  # provided by @include_query_tags decorator
-                ret.update(func())
+        for name in marked_methods(type(self), "include_query_tags"):
+            ret.update(getattr(self, name)())
 
         return ret
 
@@ -1,13 +1,39 @@
+import inspect
 from functools import lru_cache
-from typing import Callable, Optional, TypeVar, Union
+from typing import Any, Callable, Optional, Tuple, TypeVar, Union, cast
 
 from posthog.utils import str_to_bool
 
 T = TypeVar("T")
 
-# can't use cached_property directly from functools because of 3.7 compatibilty
+
+class _CachedProperty:
+    """
+    Computes the value once per instance and stores it in the instance's `__dict__`, which then takes precedence over
+    this (non-data) descriptor for all later lookups.
+
+    Unlike `functools.cached_property` (before Python 3.12) there's no lock shared by all instances, which would
+    serialize computing properties of unrelated filters in different threads.
+    """
+
+    def __init__(self, func: Callable) -> None:
+        self.func = func
+        self.attrname: Optional[str] = None
+        self.__doc__ = func.__doc__
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.attrname = name
+
+    def __get__(self, instance: Any, owner: Optional[type] = None) -> Any:
+        if instance is None:
+            return self
+        value = self.func(instance)
+        instance.__dict__[cast(str, self.attrname)] = value
+        return value
+
+
 def cached_property(func: Callable[..., T]) -> T:
-    return property(lru_cache(maxsize=1)(func))  # type: ignore
+    return _CachedProperty(func)  # type: ignore
 
 
 def include_dict(f):
@@ -26,6 +52,21 @@ def include_query_tags(f):
     return f
 
 
+@lru_cache(maxsize=None)
+def marked_methods(cls: type, marker: str) -> Tuple[str, ...]:
+    """
+    Names of the methods of `cls` marked by `@include_dict` or `@include_query_tags`, sorted by name.
+
+    Worked out once per class. Attributes are looked up on the class rather than on an instance, as
+    `inspect.getmembers(instance)` evaluates every property along the way.
+    """
+    return tuple(
+        name
+        for name in sorted(dir(cls))
+        if inspect.isfunction(inspect.getattr_static(cls, name)) and getattr(getattr(cls, name), marker, False)
+    )
+
+
 def process_bool(bool_to_test: Optional[Union[str, bool]]) -> bool:
     if isinstance(bool_to_test, bool):
         return bool_to_test
@@ -51,6 +51,21 @@ class TestFilter(BaseTest):
             ],
         )
 
+    def test_to_json(self):
+        filter = Filter(data={"events": [{"id": "$pageview"}], "date_from": "-7d", "breakdown": "$browser"})
+
+        self.assertNotIn("\n", filter.toJSON())
+        self.assertEqual(
+            json.loads(filter.toJSON()), json.loads(json.dumps(filter.to_dict(), default=lambda o: o.__dict__))
+        )
+        # Used for cache keys, so the same filter has to serialize the same way
+        self.assertEqual(Filter(data=json.loads(filter.toJSON())).toJSON(), filter.toJSON())
+
+    def test_query_tags(self):
+        filter = Filter(data={"events": [{"id": "$pageview"}], "breakdown": "$browser", "breakdown_type": "event"})
+
+        self.assertEqual(filter.query_tags()["breakdown_by"], ["event"])
+
     def test_simplify_test_accounts(self):
         self.team.test_account_filters = [
             {"key": "email", "value": "@posthog.com", "operator": "not_icontains", "type": "person"}
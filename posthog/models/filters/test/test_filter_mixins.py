@@ -1,7 +1,22 @@
+import gc
+import weakref
+
 from posthog.models.filters.mixins.funnel import FunnelWindowDaysMixin
+from posthog.models.filters.mixins.utils import cached_property
 from posthog.test.base import BaseTest
 
 
+class CountingProperty:
+    def __init__(self, value):
+        self.value = value
+        self.computations = 0
+
+    @cached_property
+    def doubled(self):
+        self.computations += 1
+        return self.value * 2
+
+
 class TestFilterMixins(BaseTest):
     def test_funnel_window_days_to_microseconds(self):
         one_day = FunnelWindowDaysMixin.microseconds_from_days(1)
@@ -15,3 +30,23 @@ class TestFilterMixins(BaseTest):
     def test_funnel_window_days_to_milliseconds(self):
         one_day = FunnelWindowDaysMixin.milliseconds_from_days(1)
         self.assertEqual(one_day, 86_400_000)
+
+    def test_cached_property_is_cached_per_instance(self):
+        first, second = CountingProperty(1), CountingProperty(2)
+
+        for _ in range(3):
+            self.assertEqual(first.doubled, 2)
+            self.assertEqual(second.doubled, 4)
+
+        self.assertEqual(first.computations, 1)
+        self.assertEqual(second.computations, 1)
+
+    def test_cached_property_does_not_keep_instances_alive(self):
+        instance = CountingProperty(1)
+        instance.doubled
+        reference = weakref.ref(instance)
+
+        del instance
+        gc.collect()
+
+        self.assertIsNone(reference())
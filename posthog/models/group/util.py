@@ -6,6 +6,7 @@ import pytz
 from dateutil.parser import isoparse
 from django.utils.timezone import now
 
+from posthog.caching import actor_hydration_cache
 from posthog.kafka_client.client import ClickhouseProducer
 from posthog.kafka_client.topics import KAFKA_GROUPS
 from posthog.models.filters.utils import GroupTypeIndex
@@ -30,6 +31,7 @@ def raw_create_group_ch(
     }
     p = ClickhouseProducer()
     p.produce(topic=KAFKA_GROUPS, sql=INSERT_GROUP_SQL, data=data)
+    actor_hydration_cache.invalidate(actor_hydration_cache.group_kind(group_type_index), team_id, group_key)
 
 
 def create_group(
@@ -33,6 +33,10 @@ class InsightCachingState(UUIDModel):
     last_refresh_queued_at: models.DateTimeField = models.DateTimeField(blank=True, null=True)
     refresh_attempt: models.IntegerField = models.IntegerField(null=False, default=0)
 
+    # What the last refresh cost, used to schedule cheap refreshes ahead of expensive ones
+    last_refresh_duration_ms: models.IntegerField = models.IntegerField(null=True)
+    last_refresh_read_rows: models.BigIntegerField = models.BigIntegerField(null=True)
+
     created_at: models.DateTimeField = models.DateTimeField(auto_now_add=True)
     updated_at: models.DateTimeField = models.DateTimeField(auto_now=True)
 
@@ -68,6 +68,11 @@ class Person(models.Model):
                 )
                 create_person(team_id=self.team_id, uuid=str(person.uuid), version=person.version or 0)
 
+        from posthog.caching import actor_hydration_cache
+
+        # The distinct ids split off are gone from this person
+        actor_hydration_cache.invalidate(actor_hydration_cache.PERSON, self.team_id, self.uuid)
+
     objects = PersonManager()
     created_at: models.DateTimeField = models.DateTimeField(auto_now_add=True, blank=True)
 
@@ -12,6 +12,7 @@ from django.dispatch import receiver
 from django.utils.timezone import now
 from rest_framework import serializers
 
+from posthog.caching import actor_hydration_cache
 from posthog.client import sync_execute
 from posthog.kafka_client.client import ClickhouseProducer
 from posthog.kafka_client.topics import KAFKA_PERSON, KAFKA_PERSON_DISTINCT_ID
@@ -136,6 +137,7 @@ def create_person(
     }
     p = ClickhouseProducer()
     p.produce(topic=KAFKA_PERSON, sql=INSERT_PERSON_SQL, data=data, sync=sync)
+    actor_hydration_cache.invalidate(actor_hydration_cache.PERSON, team_id, uuid)
     return uuid
 
 
@@ -155,6 +157,7 @@ def create_person_distinct_id(
         },
         sync=sync,
     )
+    actor_hydration_cache.invalidate(actor_hydration_cache.PERSON, team_id, person_id)
 
 
 def get_persons_by_distinct_ids(team_id: int, distinct_ids: List[str]) -> QuerySet:
@@ -7,7 +7,7 @@ from uuid import UUID
 
 from django.conf import settings
 from django.core import exceptions
-from django.db import models
+from django.db import models, transaction
 from django.db.models.signals import post_delete, post_save
 from django.dispatch.dispatcher import receiver
 from django.utils import timezone
@@ -17,7 +17,7 @@ from semantic_version.base import SimpleSpec, Version
 from posthog.cloud_utils import is_cloud
 from posthog.models.organization import Organization
 from posthog.models.signals import mutable_receiver
-from posthog.models.team import Team
+from posthog.models.team import Team, bump_decide_config_version, invalidate_team_token_cache
 from posthog.plugins.access import can_configure_plugins, can_install_plugins
 from posthog.plugins.reload import reload_plugins_on_workers
 from posthog.plugins.site import get_decide_site_apps
@@ -453,12 +453,24 @@ def plugin_reload_needed(sender, instance, created=None, **kwargs):
     # Newly created plugins don't have a config yet, so no need to reload
     if not created:
         reload_plugins_on_workers()
+        # Site app URLs include the plugin's updated_at, so every team using the plugin needs a fresh decide config
+        bump_decide_config_version(PluginConfig.objects.filter(plugin_id=instance.pk).values_list("team_id", flat=True))
 
 
 @mutable_receiver([post_save, post_delete], sender=PluginConfig)
 def plugin_config_reload_needed(sender, instance, created=None, **kwargs):
     reload_plugins_on_workers()
     sync_team_inject_web_apps(instance.team)
+    if instance.team_id:
+        bump_decide_config_version([instance.team_id])
+
+
+@mutable_receiver([post_save, post_delete], sender=PluginSourceFile)
+def plugin_source_file_changed(sender, instance, **kwargs):
+    if instance.filename == "site.ts":
+        bump_decide_config_version(
+            PluginConfig.objects.filter(plugin_id=instance.plugin_id).values_list("team_id", flat=True)
+        )
 
 
 def sync_team_inject_web_apps(team: Optional[Team]):
@@ -467,6 +479,9 @@ def sync_team_inject_web_apps(team: Optional[Team]):
     inject_web_apps = len(get_decide_site_apps(team)) > 0
     if inject_web_apps != team.inject_web_apps:
         Team.objects.filter(pk=team.pk).update(inject_web_apps=inject_web_apps)
+        # `update` skips the post_save signal, so drop the cached team ourselves once the update is committed
+        team_id, api_token = team.pk, team.api_token
+        transaction.on_commit(lambda: invalidate_team_token_cache(team_id, [api_token]))
 
 
 @mutable_receiver([post_save, post_delete], sender=PluginAttachment)
@@ -1 +1,3 @@
+from .decide_config import DecideStaticConfig, bump_decide_config_version, get_decide_static_config
 from .team import *
+from .team_caching import CachedTeam, get_cached_team_for_token, invalidate_team_token_cache
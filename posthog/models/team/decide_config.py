@@ -0,0 +1,229 @@
+import re
+import uuid
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Optional,
+    Pattern,
+    Sequence,
+    Tuple,
+    Union,
+)
+from urllib.parse import urlparse
+
+import structlog
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import HttpRequest
+from statshog.defaults.django import statsd
+
+from posthog import json_codec
+from posthog.cache_utils import LocalTTLCache
+from posthog.models.team.team import Team
+from posthog.models.team.team_caching import CachedTeam
+from posthog.redis import get_client
+
+logger = structlog.get_logger(__name__)
+
+ALWAYS_PERMITTED_HOSTNAMES = ("127.0.0.1", "localhost")
+
+
+def parse_domain(url: Any) -> Optional[str]:
+    return urlparse(url).hostname
+
+
+class HostnameMatcher:
+    """
+    Matches hostnames against a list of allowed URLs, where `*` in a URL's hostname is a wildcard.
+
+    Parsing the URLs and building the wildcard regex happens once, so that matching is only a set lookup and (when
+    there are wildcards) a single regex search.
+    """
+
+    def __init__(self, allowed_url_list: Optional[Sequence[str]]):
+        permitted_hostnames = list(ALWAYS_PERMITTED_HOSTNAMES)
+        for url in allowed_url_list or []:
+            host = parse_domain(url)
+            if host:
+                permitted_hostnames.append(host)
+
+        self.exact_hostnames: FrozenSet[str] = frozenset(host for host in permitted_hostnames if "*" not in host)
+        wildcard_patterns = [
+            "^{}$".format(re.escape(host).replace("\\*", "(.*)")) for host in permitted_hostnames if "*" in host
+        ]
+        self.wildcard_pattern: Optional[Pattern] = (
+            re.compile("|".join(wildcard_patterns)) if wildcard_patterns else None
+        )
+
+    def matches(self, hostname: Optional[str]) -> bool:
+        if not hostname:
+            return False
+        if hostname in self.exact_hostnames:
+            return True
+        return self.wildcard_pattern is not None and self.wildcard_pattern.search(hostname) is not None
+
+
+@dataclass(frozen=True)
+class DecideStaticConfig:
+    """
+    Everything /decide returns for a team that doesn't depend on who is asking, precomputed once per team.
+
+    `team_fingerprint` holds the team fields it was built from, so that a config built from an outdated `CachedTeam`
+    is never reused for a newer one.
+    """
+
+    team_id: int
+    team_fingerprint: Tuple
+    session_recording: Union[bool, Dict[str, Any]]
+    recording_domain_matcher: Optional[HostnameMatcher]
+    site_apps: Tuple[Dict[str, Any], ...]
+
+    def session_recording_for(self, request: HttpRequest) -> Union[bool, Dict[str, Any]]:
+        if not self.session_recording:
+            return False
+        # No recording domains means recordings are permitted everywhere
+        if self.recording_domain_matcher is None:
+            return self.session_recording
+        if self.recording_domain_matcher.matches(
+            parse_domain(request.headers.get("Origin"))
+        ) or self.recording_domain_matcher.matches(parse_domain(request.headers.get("Referer"))):
+            return self.session_recording
+        return False
+
+    @classmethod
+    def build(cls, team: Union[Team, CachedTeam], site_apps: Sequence[Dict[str, Any]]) -> "DecideStaticConfig":
+        session_recording: Union[bool, Dict[str, Any]] = False
+        if team.session_recording_opt_in:
+            session_recording = {
+                "endpoint": "/s/",
+                "consoleLogRecordingEnabled": True if team.capture_console_log_opt_in else False,
+            }
+        return cls(
+            team_id=team.id,
+            team_fingerprint=_team_fingerprint(team),
+            session_recording=session_recording,
+            recording_domain_matcher=HostnameMatcher(team.recording_domains) if team.recording_domains else None,
+            site_apps=tuple(site_apps) if team.inject_web_apps else (),
+        )
+
+
+def _team_fingerprint(team: Union[Team, CachedTeam]) -> Tuple:
+    return (
+        team.session_recording_opt_in,
+        team.capture_console_log_opt_in,
+        tuple(team.recording_domains or ()),
+        team.inject_web_apps,
+    )
+
+
+_decide_static_configs = LocalTTLCache(
+    max_size=settings.DECIDE_STATIC_CONFIG_CACHE_MAX_TEAMS, ttl_seconds=settings.DECIDE_STATIC_CONFIG_CACHE_TTL_SECONDS
+)
+
+
+def _decide_config_version_key(team_id: int) -> str:
+    return f"decide_config_version:{team_id}"
+
+
+def _decide_site_apps_key(team_id: int, version: str) -> str:
+    return f"decide_site_apps:{team_id}:{version}"
+
+
+def bump_decide_config_version(team_ids: Iterable[int]) -> None:
+    "Invalidates the cached decide config of the given teams everywhere, once the current transaction commits."
+    team_ids = list(team_ids)
+    if not team_ids:
+        return
+
+    def _bump():
+        try:
+            pipeline = get_client().pipeline(transaction=False)
+            for team_id in team_ids:
+                pipeline.set(_decide_config_version_key(team_id), uuid.uuid4().hex)
+            pipeline.execute()
+        except Exception as e:
+            logger.warning("decide_config_cache_bump_failed", team_ids=team_ids, exc_info=e)
+            statsd.incr("decide_config_cache_error", tags={"operation": "bump"})
+
+    transaction.on_commit(_bump)
+
+
+def _get_decide_config_version(team_id: int) -> str:
+    client = get_client()
+    version = client.get(_decide_config_version_key(team_id))
+    if version is None:
+        version = uuid.uuid4().hex.encode("utf-8")
+        if not client.set(_decide_config_version_key(team_id), version, nx=True):
+            version = client.get(_decide_config_version_key(team_id))
+    return version.decode("utf-8")
+
+
+def _fetch_site_apps(team: Union[Team, CachedTeam]) -> List[Dict[str, Any]]:
+    from posthog.plugins.site import get_decide_site_apps
+
+    return get_decide_site_apps(team) if team.inject_web_apps else []
+
+
+def _get_site_apps(team: Union[Team, CachedTeam], version: str) -> List[Dict[str, Any]]:
+    try:
+        payload = get_client().get(_decide_site_apps_key(team.id, version))
+        if payload is not None:
+            statsd.incr("decide_config_cache_hit", tags={"tier": "redis"})
+            return json_codec.loads(payload)
+    except Exception as e:
+        logger.warning("decide_config_cache_get_failed", team_id=team.id, exc_info=e)
+        statsd.incr("decide_config_cache_error", tags={"operation": "get"})
+
+    statsd.incr("decide_config_cache_miss")
+    site_apps = _fetch_site_apps(team)
+    try:
+        get_client().set(
+            _decide_site_apps_key(team.id, version),
+            json_codec.dumps_bytes(site_apps),
+            ex=settings.DECIDE_STATIC_CONFIG_CACHE_TTL_SECONDS,
+        )
+    except Exception as e:
+        logger.warning("decide_config_cache_set_failed", team_id=team.id, exc_info=e)
+        statsd.incr("decide_config_cache_error", tags={"operation": "set"})
+    return site_apps
+
+
+def get_decide_static_config(team: Union[Team, CachedTeam]) -> DecideStaticConfig:
+    """
+    Returns the team's `DecideStaticConfig`, from the per-process cache, or built with site apps from Redis or,
+    failing that, from Postgres.
+
+    Changes to the team or its plugin configs replace the team's version and with it every cached copy. Site apps
+    also change when the plugin server finishes transpiling a site.ts, which happens outside of Django, so cached
+    configs expire after DECIDE_STATIC_CONFIG_CACHE_TTL_SECONDS regardless.
+    """
+    if not settings.DECIDE_STATIC_CONFIG_CACHE_ENABLED:
+        return DecideStaticConfig.build(team, _fetch_site_apps(team))
+
+    try:
+        version = _get_decide_config_version(team.id)
+    except Exception as e:
+        logger.warning("decide_config_cache_version_failed", team_id=team.id, exc_info=e)
+        statsd.incr("decide_config_cache_error", tags={"operation": "version"})
+        return DecideStaticConfig.build(team, _fetch_site_apps(team))
+
+    cached = _decide_static_configs.get(team.id)
+    if cached is not None and cached[0] == version and cached[1].team_fingerprint == _team_fingerprint(team):
+        statsd.incr("decide_config_cache_hit", tags={"tier": "local"})
+        return cached[1]
+
+    site_apps = _get_site_apps(team, version) if team.inject_web_apps else []
+    config = DecideStaticConfig.build(team, site_apps)
+    _decide_static_configs.set(team.id, (version, config))
+    return config
+
+
+@receiver([post_save, post_delete], sender=Team)
+def decide_config_team_changed(sender, instance: Team, **kwargs):
+    bump_decide_config_version([instance.pk])
@@ -125,6 +125,8 @@ class Team(UUIDClassicModel):
     person_display_name_properties: ArrayField = ArrayField(models.CharField(max_length=400), null=True, blank=True)
     live_events_columns: ArrayField = ArrayField(models.TextField(), null=True, blank=True)
     recording_domains: ArrayField = ArrayField(models.CharField(max_length=200, null=True), blank=True, null=True)
+    # How old a cached insight result may be before it's recalculated instead of served. Defaults to CACHED_RESULTS_TTL
+    insight_cache_max_age_seconds: models.IntegerField = models.IntegerField(null=True, blank=True)
 
     primary_dashboard: models.ForeignKey = models.ForeignKey(
         "posthog.Dashboard", on_delete=models.SET_NULL, null=True, related_name="primary_dashboard_teams"
@@ -233,6 +235,11 @@ class Team(UUIDClassicModel):
         enabled_teams = get_list(get_instance_setting("STRICT_CACHING_TEAMS"))
         return str(self.pk) in enabled_teams or "all" in enabled_teams
 
+    @property
+    def incremental_trends_enabled(self) -> bool:
+        enabled_teams = get_list(get_instance_setting("INCREMENTAL_TRENDS_TEAMS"))
+        return str(self.pk) in enabled_teams or "all" in enabled_teams
+
     @cached_property
     def persons_seen_so_far(self) -> int:
 
@@ -0,0 +1,211 @@
+import json
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+import structlog
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from statshog.defaults.django import statsd
+
+from posthog.cache_utils import LocalTTLCache
+from posthog.models.team.team import Team
+from posthog.redis import get_client
+
+logger = structlog.get_logger(__name__)
+
+CACHED_TEAM_FIELDS = (
+    "id",
+    "api_token",
+    "anonymize_ips",
+    "session_recording_opt_in",
+    "capture_console_log_opt_in",
+    "recording_domains",
+    "inject_web_apps",
+)
+
+
+@dataclass(frozen=True)
+class CachedTeam:
+    """
+    The subset of `Team` that /capture and /decide need on every request.
+
+    Kept small and JSON-serializable so that it can live both in the per-process cache and in Redis.
+    """
+
+    id: int
+    api_token: str
+    anonymize_ips: bool
+    session_recording_opt_in: bool
+    capture_console_log_opt_in: Optional[bool]
+    recording_domains: Tuple[str, ...]
+    inject_web_apps: Optional[bool]
+
+    @property
+    def pk(self) -> int:
+        return self.id
+
+    @classmethod
+    def from_values(cls, values: Dict[str, Any]) -> "CachedTeam":
+        return cls(**{**values, "recording_domains": tuple(values.get("recording_domains") or ())})
+
+    @classmethod
+    def from_team(cls, team: Team) -> "CachedTeam":
+        return cls.from_values({field: getattr(team, field) for field in CACHED_TEAM_FIELDS})
+
+
+_local_cache = LocalTTLCache(
+    max_size=settings.TEAM_TOKEN_CACHE_MAX_SIZE, ttl_seconds=settings.TEAM_TOKEN_CACHE_LOCAL_TTL_SECONDS
+)
+_subscriber_lock = threading.Lock()
+_subscriber_started = False
+
+
+def _redis_key(token: str) -> str:
+    return f"team_token:{token}"
+
+
+def _redis_token_key(team_id: int) -> str:
+    # Remembers which token a team was last cached under, so that a reset token stops resolving immediately
+    return f"team_token_for_team:{team_id}"
+
+
+def get_cached_team_for_token(token: Optional[str]) -> Optional[CachedTeam]:
+    """
+    Resolves a project api_token to a `CachedTeam`, looking in the per-process cache first, then in Redis, and
+    only then in Postgres. Unknown tokens are not cached, as they fall through to personal API key auth.
+    """
+    if not token:
+        return None
+
+    if not settings.TEAM_TOKEN_CACHE_ENABLED:
+        return _fetch_team_from_postgres(token)
+
+    _ensure_invalidation_subscriber()
+
+    cached_team = _local_cache.get(token)
+    if cached_team is not None:
+        statsd.incr("team_token_cache_hit", tags={"tier": "local"})
+        return cached_team
+
+    cached_team = _get_from_redis(token)
+    if cached_team is not None:
+        statsd.incr("team_token_cache_hit", tags={"tier": "redis"})
+        _local_cache.set(token, cached_team)
+        return cached_team
+
+    statsd.incr("team_token_cache_miss")
+    cached_team = _fetch_team_from_postgres(token)
+    if cached_team is not None:
+        _local_cache.set(token, cached_team)
+        _set_in_redis(cached_team)
+    return cached_team
+
+
+def invalidate_team_token_cache(team_id: int, tokens: Iterable[Optional[str]]) -> None:
+    "Drops a team from Redis and from the local cache of every process subscribed to the invalidation channel."
+    if not settings.TEAM_TOKEN_CACHE_ENABLED:
+        return
+
+    stale_tokens: Set[str] = {token for token in tokens if token}
+    _evict_locally(team_id, stale_tokens)
+    try:
+        client = get_client()
+        previous_token = client.get(_redis_token_key(team_id))
+        if previous_token:
+            stale_tokens.add(previous_token.decode("utf-8"))
+        client.delete(_redis_token_key(team_id), *[_redis_key(token) for token in stale_tokens])
+        client.publish(
+            settings.TEAM_CACHE_INVALIDATION_PUBSUB_CHANNEL,
+            json.dumps({"team_id": team_id, "tokens": list(stale_tokens)}),
+        )
+    except Exception as e:
+        # Local caches will still pick up the change once their TTL runs out
+        logger.warning("team_token_cache_invalidation_failed", team_id=team_id, exc_info=e)
+        statsd.incr("team_token_cache_invalidation_error")
+
+
+def _fetch_team_from_postgres(token: str) -> Optional[CachedTeam]:
+    values = Team.objects.filter(api_token=token).values(*CACHED_TEAM_FIELDS).first()
+    return CachedTeam.from_values(values) if values else None
+
+
+def _get_from_redis(token: str) -> Optional[CachedTeam]:
+    try:
+        payload = get_client().get(_redis_key(token))
+    except Exception as e:
+        logger.warning("team_token_cache_redis_get_failed", exc_info=e)
+        statsd.incr("team_token_cache_redis_error", tags={"operation": "get"})
+        return None
+    return CachedTeam.from_values(json.loads(payload)) if payload else None
+
+
+def _set_in_redis(cached_team: CachedTeam) -> None:
+    try:
+        pipeline = get_client().pipeline(transaction=False)
+        pipeline.set(
+            _redis_key(cached_team.api_token),
+            json.dumps(asdict(cached_team)),
+            ex=settings.TEAM_TOKEN_CACHE_REDIS_TTL_SECONDS,
+        )
+        pipeline.set(
+            _redis_token_key(cached_team.id), cached_team.api_token, ex=settings.TEAM_TOKEN_CACHE_REDIS_TTL_SECONDS
+        )
+        pipeline.execute()
+    except Exception as e:
+        logger.warning("team_token_cache_redis_set_failed", exc_info=e)
+        statsd.incr("team_token_cache_redis_error", tags={"operation": "set"})
+
+
+def _evict_locally(team_id: int, tokens: Iterable[str]) -> None:
+    stale_tokens = set(tokens)
+    _local_cache.delete_where(lambda token, cached_team: token in stale_tokens or cached_team.id == team_id)
+
+
+def _ensure_invalidation_subscriber() -> None:
+    # :TRICKY: Started lazily rather than on import, so that it runs in every forked worker and only in processes
+    # that actually serve /capture or /decide.
+    global _subscriber_started
+
+    if _subscriber_started or settings.TEST:
+        return
+
+    with _subscriber_lock:
+        if _subscriber_started:
+            return
+        threading.Thread(target=_listen_for_invalidations, name="team-cache-invalidation", daemon=True).start()
+        _subscriber_started = True
+
+
+def _listen_for_invalidations() -> None:
+    while True:
+        try:
+            pubsub = get_client().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(settings.TEAM_CACHE_INVALIDATION_PUBSUB_CHANNEL)
+            # Anything published while we weren't subscribed is lost, so start from a clean slate
+            _local_cache.clear()
+            for message in pubsub.listen():
+                payload = json.loads(message["data"])
+                _evict_locally(payload["team_id"], payload.get("tokens") or [])
+                statsd.incr("team_token_cache_invalidation_received")
+        except Exception as e:
+            logger.warning("team_token_cache_subscriber_failed", exc_info=e)
+            statsd.incr("team_token_cache_subscriber_error")
+            time.sleep(1)
+
+
+@receiver(post_save, sender=Team)
+def invalidate_team_token_cache_on_save(sender, instance: Team, created: bool, **kwargs):
+    if not created:
+        # Invalidating before the transaction commits would let a concurrent request cache the old team again
+        team_id, api_token = instance.pk, instance.api_token
+        transaction.on_commit(lambda: invalidate_team_token_cache(team_id, [api_token]))
+
+
+@receiver(post_delete, sender=Team)
+def invalidate_team_token_cache_on_delete(sender, instance: Team, **kwargs):
+    team_id, api_token = instance.pk, instance.api_token
+    transaction.on_commit(lambda: invalidate_team_token_cache(team_id, [api_token]))
@@ -1,9 +1,10 @@
 from dataclasses import asdict, dataclass
 from hashlib import md5
-from typing import TYPE_CHECKING, List, Optional
+from typing import TYPE_CHECKING, List, Optional, Union
 
 if TYPE_CHECKING:
     from posthog.models import Team
+    from posthog.models.team import CachedTeam
 
 
 @dataclass
@@ -42,12 +43,12 @@ def get_transpiled_site_source(id: int, token: str) -> Optional[WebJsSource]:
     return WebJsSource(*(list(response)))  # type: ignore
 
 
-def get_decide_site_apps(team: "Team") -> List[dict]:
+def get_decide_site_apps(team: Union["Team", "CachedTeam"]) -> List[dict]:
     from posthog.models import PluginConfig, PluginSourceFile
 
     sources = (
         PluginConfig.objects.filter(
-            team=team,
+            team_id=team.id,
             enabled=True,
             plugin__pluginsourcefile__filename="site.ts",
             plugin__pluginsourcefile__status=PluginSourceFile.Status.TRANSPILED,
@@ -16,6 +16,7 @@ from typing import (
 from django.db.models import OuterRef, Subquery
 from django.db.models.query import Prefetch, QuerySet
 
+from posthog.caching import actor_hydration_cache
 from posthog.constants import INSIGHT_FUNNELS, INSIGHT_PATHS, INSIGHT_TRENDS
 from posthog.models import Entity, Filter, PersonDistinctId, Team
 from posthog.models.filters.mixins.utils import cached_property
@@ -23,6 +24,7 @@ from posthog.models.filters.retention_filter import RetentionFilter
 from posthog.models.filters.stickiness_filter import StickinessFilter
 from posthog.models.group import Group
 from posthog.models.person import Person
+from posthog.queries import actor_pagination
 from posthog.queries.insight import insight_sync_execute
 
 
@@ -69,6 +71,8 @@ class ActorBaseQuery:
     QUERY_TYPE = "actors"
 
     entity: Optional[Entity] = None
+    # Cursor of the page after the one `get_actors` returned, if there's a materialized one
+    next_cursor: Optional[str] = None
 
     def __init__(
         self,
@@ -95,11 +99,16 @@ class ActorBaseQuery:
         return self.aggregation_group_type_index is not None
 
     def get_actors(
-        self,
+        self, cursor: Optional[str] = None
     ) -> Tuple[Union[QuerySet[Person], QuerySet[Group]], Union[List[SerializedGroup], List[SerializedPerson]], int]:
-        """Get actors in data model and dict formats. Builds query and executes"""
+        """
+        Get actors in data model and dict formats. Builds query and executes
+
+        Passing the `cursor` of the previous page allows taking the page from the actors materialized by the first
+        page's query, see `posthog.queries.actor_pagination`. The cursor of the next page is set as `next_cursor`.
+        """
         query, params = self.actor_query()
-        raw_result = insight_sync_execute(query, params, query_type=self.QUERY_TYPE, filter=self._filter)
+        raw_result = self._query_actors_page(query, params, cursor)
         actors, serialized_actors = self.get_actors_from_result(raw_result)
 
         if hasattr(self._filter, "include_recordings") and self._filter.include_recordings and self._filter.insight in [INSIGHT_PATHS, INSIGHT_TRENDS, INSIGHT_FUNNELS]:  # type: ignore
@@ -107,6 +116,33 @@ class ActorBaseQuery:
 
         return actors, serialized_actors, len(raw_result)
 
+    def _query_actors_page(self, query: str, params: Dict, cursor: Optional[str]) -> List[Tuple]:
+        self.next_cursor = None
+        # Recordings matched to actors are too big to keep around for all pages
+        if getattr(self._filter, "include_recordings", False) or not actor_pagination.can_materialize(query, params):
+            return insight_sync_execute(query, params, query_type=self.QUERY_TYPE, filter=self._filter)
+
+        query_hash = actor_pagination.hash_actors_query(query, params)
+        if cursor is not None:
+            page, self.next_cursor = actor_pagination.load_page(
+                self._team.pk, query_hash, cursor, params["offset"], params["limit"]
+            )
+            if page is not None:
+                return page
+            return insight_sync_execute(query, params, query_type=self.QUERY_TYPE, filter=self._filter)
+
+        if params["offset"]:
+            return insight_sync_execute(query, params, query_type=self.QUERY_TYPE, filter=self._filter)
+
+        rows = insight_sync_execute(
+            query,
+            {**params, "limit": actor_pagination.MATERIALIZED_ACTORS_LIMIT, "offset": 0},
+            query_type=self.QUERY_TYPE,
+            filter=self._filter,
+        )
+        self.next_cursor = actor_pagination.materialize(self._team.pk, query_hash, rows, params["limit"])
+        return rows[: params["limit"]]
+
     def query_for_session_ids_with_recordings(self, session_ids: Set[str]) -> Set[str]:
         """Filters a list of session_ids to those that actually have recordings"""
         query = """
@@ -193,19 +229,75 @@ def get_groups(
     groups: QuerySet[Group] = Group.objects.filter(
         team_id=team_id, group_type_index=group_type_index, group_key__in=group_ids
     )
-    return groups, serialize_groups(groups, value_per_actor_id)
+    if not actor_hydration_cache.is_enabled():
+        return groups, serialize_groups(groups, value_per_actor_id)
+
+    kind = actor_hydration_cache.group_kind(group_type_index)
+    hydrated = actor_hydration_cache.get_many(kind, team_id, group_ids)
+    missing_ids = [group_id for group_id in group_ids if str(group_id) not in hydrated]
+    if missing_ids:
+        fetched = {
+            group["group_key"]: group
+            for group in serialize_groups(
+                Group.objects.filter(team_id=team_id, group_type_index=group_type_index, group_key__in=missing_ids),
+                None,
+            )
+        }
+        actor_hydration_cache.set_many(kind, team_id, fetched)
+        hydrated.update(fetched)
+
+    serialized_groups = [
+        cast(SerializedGroup, {**hydrated[group_key], "value_at_data_point": _value_at(value_per_actor_id, group_key)})
+        for group_key in dict.fromkeys(map(str, group_ids))
+        if group_key in hydrated
+    ]
+    return groups, serialized_groups
 
 
 def get_people(
     team_id: int, people_ids: List[Any], value_per_actor_id: Optional[Dict[str, float]] = None, distinct_id_limit=None
 ) -> Tuple[QuerySet[Person], List[SerializedPerson]]:
-    """Get people from raw SQL results in data model and dict formats"""
+    """
+    Get people from raw SQL results in data model and dict formats.
+
+    Serialized people are taken from the actor hydration cache where possible, only the rest is fetched from Postgres.
+    The returned queryset is then only evaluated if the caller uses it.
+    """
+    persons = _people_queryset(team_id, people_ids, distinct_id_limit)
+    # Limited distinct ids are only asked for by exports, which shouldn't fill the cache with partial persons
+    if distinct_id_limit is not None or not actor_hydration_cache.is_enabled():
+        return persons, serialize_people(persons, value_per_actor_id)
+
+    hydrated = actor_hydration_cache.get_many(actor_hydration_cache.PERSON, team_id, people_ids)
+    missing_ids = [person_id for person_id in people_ids if str(person_id) not in hydrated]
+    if missing_ids:
+        fetched = {
+            str(person["uuid"]): person
+            for person in serialize_people(_people_queryset(team_id, missing_ids, distinct_id_limit=None), None)
+        }
+        actor_hydration_cache.set_many(actor_hydration_cache.PERSON, team_id, fetched)
+        hydrated.update(fetched)
+
+    # Same order as the queryset, i.e. `ORDER BY created_at DESC, uuid`
+    ordered_people = sorted(hydrated.values(), key=lambda person: str(person["uuid"]))
+    ordered_people.sort(key=lambda person: person["created_at"], reverse=True)
+    serialized_people = [
+        cast(
+            SerializedPerson,
+            {**person, "value_at_data_point": _value_at(value_per_actor_id, str(person["uuid"]))},
+        )
+        for person in ordered_people
+    ]
+    return persons, serialized_people
+
+
+def _people_queryset(team_id: int, people_ids: List[Any], distinct_id_limit: Optional[int]) -> QuerySet[Person]:
     distinct_id_subquery = Subquery(
         PersonDistinctId.objects.filter(person_id=OuterRef("person_id")).values_list("id", flat=True)[
             :distinct_id_limit
         ]
     )
-    persons: QuerySet[Person] = (
+    return (
         Person.objects.filter(team_id=team_id, uuid__in=people_ids)
         .prefetch_related(
             Prefetch(
@@ -217,7 +309,10 @@ def get_people(
         .order_by("-created_at", "uuid")
         .only("id", "is_identified", "created_at", "properties", "uuid")
     )
-    return persons, serialize_people(persons, value_per_actor_id)
+
+
+def _value_at(value_per_actor_id: Optional[Dict[str, float]], actor_id: str) -> Optional[float]:
+    return value_per_actor_id[actor_id] if value_per_actor_id else None
 
 
 def serialize_people(data: QuerySet[Person], value_per_actor_id: Optional[Dict[str, float]]) -> List[SerializedPerson]:
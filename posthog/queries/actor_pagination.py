@@ -0,0 +1,94 @@
+"""
+Cursor pagination of actors queries.
+
+Paging through an actors list with LIMIT/OFFSET runs the whole aggregation again for every page, just to throw
+away the rows before the page. Instead, the first page's query fetches the ids of up to
+`MATERIALIZED_ACTORS_LIMIT` actors, which are kept for a short while. Following pages are then cut from that list,
+starting after the last actor of the previous page as recorded in the page cursor, so they only cost hydrating the
+page's actors from Postgres.
+
+Cursors are only a shortcut: if the materialized list has expired or the page goes past its end, the page is
+queried with LIMIT/OFFSET again.
+"""
+import base64
+import binascii
+import hashlib
+import json
+import secrets
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from statshog.defaults.django import statsd
+
+MATERIALIZED_ACTORS_LIMIT = 10_000
+MATERIALIZED_ACTORS_TTL_SECONDS = 10 * 60
+
+Cursor = Tuple[str, str]
+
+
+def hash_actors_query(query: str, params: Dict[str, Any]) -> str:
+    "Identifies an actors query regardless of the page asked for."
+    params = {key: value for key, value in params.items() if key not in ("limit", "offset")}
+    return hashlib.sha256(json.dumps([query, params], sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def can_materialize(query: str, params: Dict[str, Any]) -> bool:
+    return (
+        settings.ACTORS_CURSOR_PAGINATION_ENABLED
+        and "%(limit)s" in query
+        and "%(offset)s" in query
+        and bool(params.get("limit"))
+        and "offset" in params
+    )
+
+
+def materialize(team_id: int, query_hash: str, rows: List[Tuple], limit: int) -> Optional[str]:
+    "Keeps the rows of all pages, returning the cursor of the second page, or None if there's only one."
+    if len(rows) <= limit:
+        return None
+    list_id = secrets.token_urlsafe(12)
+    cache.set(_cache_key(team_id, query_hash, list_id), rows, MATERIALIZED_ACTORS_TTL_SECONDS)
+    return encode_cursor((list_id, str(rows[limit - 1][0])))
+
+
+def load_page(
+    team_id: int, query_hash: str, cursor: str, offset: int, limit: int
+) -> Tuple[Optional[List[Tuple]], Optional[str]]:
+    """
+    Returns the rows of the page following the cursor and the cursor of the page after it, or `(None, None)` if the
+    page has to be queried.
+    """
+    decoded = decode_cursor(cursor)
+    rows = cache.get(_cache_key(team_id, query_hash, decoded[0])) if decoded else None
+    if decoded is None or rows is None:
+        statsd.incr("actors_cursor_pagination.miss")
+        return None, None
+
+    list_id, last_actor_id = decoded
+    start = next((index + 1 for index, row in enumerate(rows) if str(row[0]) == last_actor_id), offset)
+    if start >= len(rows):
+        # Past the end of what was materialized, there may still be more actors
+        statsd.incr("actors_cursor_pagination.miss")
+        return None, None
+
+    statsd.incr("actors_cursor_pagination.hit")
+    page = rows[start : start + limit]
+    next_cursor = encode_cursor((list_id, str(page[-1][0]))) if start + limit < len(rows) else None
+    return page, next_cursor
+
+
+def encode_cursor(cursor: Cursor) -> str:
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Optional[Cursor]:
+    try:
+        list_id, last_actor_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(list_id), str(last_actor_id)
+    except (ValueError, TypeError, binascii.Error):
+        return None
+
+
+def _cache_key(team_id: int, query_hash: str, list_id: str) -> str:
+    return f"actors_cursor:{team_id}:{query_hash}:{list_id}"
@@ -1,6 +1,17 @@
+import copy
 import datetime
 import re
-from typing import Any, Callable, Dict, List, TypeVar, Union, cast
+from typing import (
+    AbstractSet,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    TypeVar,
+    Union,
+    cast,
+)
 
 from dateutil import parser
 from django.db.models import Exists, OuterRef, Q
@@ -12,6 +23,7 @@ from posthog.models.filters.path_filter import PathFilter
 from posthog.models.person import Person
 from posthog.models.property import Property
 from posthog.models.team import Team
+from posthog.queries.executor import run_in_parallel
 from posthog.queries.util import convert_to_datetime_aware
 from posthog.utils import get_compare_period_dates
 
@@ -59,17 +71,23 @@ def convert_to_comparison(trend_entities: List[Dict[str, Any]], filter, label: s
 
 def handle_compare(filter, func: Callable, team: Team, **kwargs) -> List:
     all_entities = []
-    base_entitites = func(filter=filter, team=team, **kwargs)
     if filter.compare:
+        compared_filter = determine_compared_filter(filter)
+        # Both periods are independent, so calculate them at the same time
+        base_entitites, comparison_entities = run_in_parallel(
+            team.pk,
+            [
+                lambda: func(filter=filter, team=team, **kwargs),
+                lambda: func(filter=compared_filter, team=team, **kwargs),
+            ],
+        )
         base_entitites = convert_to_comparison(base_entitites, filter, "current")
         all_entities.extend(base_entitites)
 
-        compared_filter = determine_compared_filter(filter)
-        comparison_entities = func(filter=compared_filter, team=team, **kwargs)
         comparison_entities = convert_to_comparison(comparison_entities, compared_filter, "previous")
         all_entities.extend(comparison_entities)
     else:
-        all_entities.extend(base_entitites)
+        all_entities.extend(func(filter=filter, team=team, **kwargs))
     return all_entities
 
 
@@ -164,6 +182,37 @@ def match_property(property: Property, override_property_values: Dict[str, Any])
     return False
 
 
+def match_property_locally(
+    property: Property, property_values: Dict[str, Any], cohort_ids: Optional[AbstractSet[int]] = None
+) -> bool:
+    """
+    Evaluates a property filter against a full set of person or group properties in Python.
+
+    Unlike `match_property`, this doesn't require the key to be present, and mirrors `Property.property_to_Q`
+    for all operators, including is_not_set and cohort membership (given the ids of cohorts the person is in).
+    """
+    if property.type == "cohort":
+        return cohort_ids is not None and int(cast(Union[str, int], property.value)) in cohort_ids
+
+    operator = property.operator or "exact"
+    if operator == "is_not_set":
+        return property.key not in property_values
+    if operator == "is_set":
+        return property.key in property_values
+
+    negated = operator == "is_not" or operator.startswith("not_")
+    if property.key not in property_values:
+        # In SQL a missing key only satisfies negated operators
+        return negated
+    if negated and property_values[property.key] is None and operator != "is_not":
+        return True
+
+    # Values are parsed the same way as in `Property.property_to_Q`, e.g. "true" matches true and "5" matches 5
+    parsed_property = copy.copy(property)
+    parsed_property.value = property._parse_value(property.value)
+    return match_property(parsed_property, property_values)
+
+
 def properties_to_Q(
     properties: List[Property],
     team_id: int,
@@ -2,6 +2,7 @@ from typing import Any, Dict, List, Optional, Tuple, Union, cast
 
 from django.forms import ValidationError
 
+from posthog.clickhouse.result_cache import QueryResultCacheClass
 from posthog.constants import BREAKDOWN_TYPES, MONTHLY_ACTIVE, WEEKLY_ACTIVE, PropertyOperatorType
 from posthog.models.cohort import Cohort
 from posthog.models.cohort.util import format_filter_query
@@ -187,6 +188,7 @@ def get_breakdown_prop_values(
         },
         query_type="get_breakdown_prop_values",
         filter=filter,
+        result_cache=QueryResultCacheClass.INSIGHT_LOOKUP,
     )[0][0]
 
 
@@ -0,0 +1,143 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import (
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+from django.conf import settings
+from django.db import close_old_connections
+from statshog.defaults.django import statsd
+
+from posthog.clickhouse.query_tagging import get_query_tags, reset_query_tags, tag_queries
+
+T = TypeVar("T")
+
+_thread_local = threading.local()
+
+
+class QueryExecutor:
+    """
+    A bounded pool of threads shared by all insight queries in the process, so that independent queries (entities,
+    comparison periods...) of an insight run at the same time without every request spawning its own threads.
+
+    Teams get the free threads in turns, and no team can use more than `max_workers_per_team` of them at once, so
+    that one team's huge dashboard doesn't hold up everyone else's insights.
+    """
+
+    def __init__(self, max_workers: int, max_workers_per_team: int):
+        self.max_workers = max_workers
+        self.max_workers_per_team = max_workers_per_team
+        self._condition = threading.Condition()
+        self._pending_by_team: "OrderedDict[int, Deque[Tuple[Future, Callable, Dict, float]]]" = OrderedDict()
+        self._running_by_team: Dict[int, int] = {}
+        self._workers: List[threading.Thread] = []
+        self._idle_workers = 0
+        self._pending_count = 0
+
+    def submit(self, team_id: int, fn: Callable[[], T]) -> "Future[T]":
+        future: "Future[T]" = Future()
+        with self._condition:
+            self._pending_by_team.setdefault(team_id, deque()).append((future, fn, get_query_tags(), time.monotonic()))
+            self._pending_count += 1
+            if self._pending_count > self._idle_workers and len(self._workers) < self.max_workers:
+                worker = threading.Thread(target=self._work, name=f"query-executor-{len(self._workers)}", daemon=True)
+                self._workers.append(worker)
+                worker.start()
+            self._condition.notify()
+        return future
+
+    def _next_task(self) -> Optional[Tuple[int, Future, Callable, Dict, float]]:
+        for team_id, pending in self._pending_by_team.items():
+            if self._running_by_team.get(team_id, 0) >= self.max_workers_per_team:
+                continue
+            future, fn, query_tags, submitted_at = pending.popleft()
+            self._pending_count -= 1
+            # Send the team to the back of the line
+            del self._pending_by_team[team_id]
+            if pending:
+                self._pending_by_team[team_id] = pending
+            return team_id, future, fn, query_tags, submitted_at
+        return None
+
+    def _work(self) -> None:
+        _thread_local.in_executor = True
+        while True:
+            with self._condition:
+                task = self._next_task()
+                while task is None:
+                    self._idle_workers += 1
+                    self._condition.wait()
+                    self._idle_workers -= 1
+                    task = self._next_task()
+                team_id, future, fn, query_tags, submitted_at = task
+                self._running_by_team[team_id] = self._running_by_team.get(team_id, 0) + 1
+
+            try:
+                if future.set_running_or_notify_cancel():
+                    statsd.timing("query_executor_wait_time", (time.monotonic() - submitted_at) * 1000)
+                    self._run(future, fn, query_tags)
+            finally:
+                with self._condition:
+                    self._running_by_team[team_id] -= 1
+                    if self._running_by_team[team_id] == 0:
+                        del self._running_by_team[team_id]
+                    # A slot for this team just freed up, which might be what another worker is waiting for
+                    self._condition.notify()
+
+    def _run(self, future: Future, fn: Callable, query_tags: Dict) -> None:
+        reset_query_tags()
+        tag_queries(**query_tags)
+        # Threads get their own database connections, so treat every task like Django treats a request
+        close_old_connections()
+        try:
+            future.set_result(fn())
+        except BaseException as err:
+            future.set_exception(err)
+        finally:
+            close_old_connections()
+            reset_query_tags()
+
+
+_executor: Optional[QueryExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_query_executor() -> QueryExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = QueryExecutor(
+                max_workers=settings.QUERY_EXECUTOR_MAX_WORKERS,
+                max_workers_per_team=settings.QUERY_EXECUTOR_MAX_WORKERS_PER_TEAM,
+            )
+        return _executor
+
+
+def run_in_parallel(team_id: int, tasks: Sequence[Callable[[], T]]) -> List[T]:
+    """
+    Runs independent query tasks on the shared query executor and returns their results in order.
+
+    If any task fails, tasks that haven't started yet are cancelled and the first error is raised. Tasks run
+    directly in the calling thread when there's only one of them, when the executor is disabled, or when called
+    from within a task, as waiting on the executor from one of its own threads could use up all of them.
+    """
+    if len(tasks) <= 1 or settings.QUERY_EXECUTOR_MAX_WORKERS <= 0 or getattr(_thread_local, "in_executor", False):
+        return [task() for task in tasks]
+
+    executor = get_query_executor()
+    futures = [executor.submit(team_id, task) for task in tasks]
+    try:
+        return [future.result() for future in futures]
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
@@ -1,6 +1,7 @@
 from typing import Optional
 
 from posthog.clickhouse.query_tagging import tag_queries
+from posthog.clickhouse.result_cache import QueryResultCacheClass
 from posthog.client import sync_execute
 from posthog.types import FilterType
 
@@ -13,6 +14,7 @@ def insight_sync_execute(
     query_type: str,
     filter: Optional["FilterType"] = None,
     settings=None,
+    result_cache: Optional[QueryResultCacheClass] = None,
 ):
     tag_queries(
         query_type=query_type,
@@ -23,4 +25,4 @@ def insight_sync_execute(
     if filter is not None:
         tag_queries(filter=filter.to_dict(), **filter.query_tags())
 
-    return sync_execute(query, args=args, settings=settings)
+    return sync_execute(query, args=args, settings=settings, result_cache=result_cache)
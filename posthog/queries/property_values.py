@@ -2,6 +2,7 @@ from typing import Optional
 
 from django.utils import timezone
 
+from posthog.clickhouse.result_cache import QueryResultCacheClass
 from posthog.models.event.sql import SELECT_PROP_VALUES_SQL, SELECT_PROP_VALUES_SQL_WITH_FILTER
 from posthog.models.person.sql import SELECT_PERSON_PROP_VALUES_SQL, SELECT_PERSON_PROP_VALUES_SQL_WITH_FILTER
 from posthog.models.property.util import get_property_string_expr
@@ -22,6 +23,7 @@ def get_property_values_for_key(key: str, team: Team, value: Optional[str] = Non
             ),
             {"team_id": team.pk, "key": key, "value": "%{}%".format(value)},
             query_type="get_property_values_with_value",
+            result_cache=QueryResultCacheClass.PROPERTY_VALUES,
         )
     return insight_sync_execute(
         SELECT_PROP_VALUES_SQL.format(
@@ -29,6 +31,7 @@ def get_property_values_for_key(key: str, team: Team, value: Optional[str] = Non
         ),
         {"team_id": team.pk, "key": key},
         query_type="get_property_values",
+        result_cache=QueryResultCacheClass.PROPERTY_VALUES,
     )
 
 
@@ -40,9 +43,11 @@ def get_person_property_values_for_key(key: str, team: Team, value: Optional[str
             SELECT_PERSON_PROP_VALUES_SQL_WITH_FILTER.format(property_field=property_field),
             {"team_id": team.pk, "key": key, "value": "%{}%".format(value)},
             query_type="get_person_property_values_with_value",
+            result_cache=QueryResultCacheClass.PROPERTY_VALUES,
         )
     return insight_sync_execute(
         SELECT_PERSON_PROP_VALUES_SQL.format(property_field=property_field),
         {"team_id": team.pk, "key": key},
         query_type="get_person_property_values",
+        result_cache=QueryResultCacheClass.PROPERTY_VALUES,
     )
@@ -0,0 +1,74 @@
+from datetime import datetime
+
+from django.core.cache import cache
+from django.test import override_settings
+from freezegun import freeze_time
+
+from posthog.models import Person
+from posthog.models.group.util import create_group
+from posthog.models.group_type_mapping import GroupTypeMapping
+from posthog.queries.actor_base_query import get_groups, get_people
+from posthog.test.base import BaseTest
+
+
+@override_settings(ACTOR_HYDRATION_CACHE_TTL_SECONDS=60)
+class TestActorHydrationCache(BaseTest):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+        with freeze_time("2020-01-01"):
+            self.older_person = Person.objects.create(
+                team=self.team, distinct_ids=["older"], properties={"email": "older@posthog.com"}
+            )
+        with freeze_time("2020-01-02"):
+            self.newer_person = Person.objects.create(team=self.team, distinct_ids=["newer"])
+
+    def test_get_people_only_queries_people_missing_from_cache(self):
+        _, uncached = get_people(self.team.pk, [self.older_person.uuid])
+
+        with self.assertNumQueries(2):  # people and their distinct ids
+            get_people(self.team.pk, [self.older_person.uuid, self.newer_person.uuid])
+        with self.assertNumQueries(0):
+            _, cached = get_people(
+                self.team.pk,
+                [self.older_person.uuid, self.newer_person.uuid],
+                value_per_actor_id={str(self.older_person.uuid): 1.0, str(self.newer_person.uuid): 2.0},
+            )
+
+        self.assertEqual([person["uuid"] for person in cached], [self.newer_person.uuid, self.older_person.uuid])
+        self.assertEqual([person["value_at_data_point"] for person in cached], [2.0, 1.0])
+        self.assertEqual(cached[1]["name"], "older@posthog.com")
+        self.assertEqual(cached[1]["distinct_ids"], ["older"])
+        self.assertEqual(cached[1]["created_at"], datetime.fromisoformat("2020-01-01T00:00:00+00:00"))
+        self.assertEqual({**cached[1], "value_at_data_point": None}, uncached[0])
+
+    def test_get_people_sees_updated_people(self):
+        get_people(self.team.pk, [self.older_person.uuid])
+
+        self.older_person.properties = {"email": "renamed@posthog.com"}
+        self.older_person.save()
+
+        _, people = get_people(self.team.pk, [self.older_person.uuid])
+        self.assertEqual(people[0]["name"], "renamed@posthog.com")
+
+    def test_get_people_with_distinct_id_limit_skips_cache(self):
+        get_people(self.team.pk, [self.older_person.uuid], distinct_id_limit=10)
+
+        with self.assertNumQueries(2):
+            get_people(self.team.pk, [self.older_person.uuid])
+
+    def test_get_groups_only_queries_groups_missing_from_cache(self):
+        GroupTypeMapping.objects.create(team=self.team, group_type="organization", group_type_index=0)
+        create_group(team_id=self.team.pk, group_type_index=0, group_key="org:1", properties={"name": "one"})
+        create_group(team_id=self.team.pk, group_type_index=0, group_key="org:2", properties={"name": "two"})
+        get_groups(self.team.pk, 0, ["org:1"])
+
+        with self.assertNumQueries(1):
+            _, groups = get_groups(self.team.pk, 0, ["org:2", "org:1"], value_per_actor_id={"org:1": 1, "org:2": 2})
+        with self.assertNumQueries(0):
+            get_groups(self.team.pk, 0, ["org:2", "org:1"])
+
+        self.assertEqual([group["group_key"] for group in groups], ["org:2", "org:1"])
+        self.assertEqual([group["properties"] for group in groups], [{"name": "two"}, {"name": "one"}])
+        self.assertEqual([group["value_at_data_point"] for group in groups], [2, 1])
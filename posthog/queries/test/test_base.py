@@ -7,8 +7,9 @@ from django.test import TestCase
 from rest_framework.exceptions import ValidationError
 
 from posthog.models.filters.path_filter import PathFilter
+from posthog.models.person import Person
 from posthog.models.property.property import Property
-from posthog.queries.base import match_property
+from posthog.queries.base import match_property, match_property_locally
 from posthog.test.base import APIBaseTest
 
 
@@ -25,6 +26,26 @@ class TestBase(APIBaseTest):
             compared_filter.to_dict(),
         )
 
+    def test_match_property_locally_parses_values_like_property_to_Q(self):
+        persons = [
+            Person.objects.create(team=self.team, properties={"key": value})
+            for value in [True, False, "true", 5, "5", 10, "value"]
+        ]
+        properties = [
+            Property(key="key", value="true", type="person"),
+            Property(key="key", value="false", type="person"),
+            Property(key="key", value="true", operator="is_not", type="person"),
+            Property(key="key", value="5", type="person"),
+            Property(key="key", value=["5", "10"], type="person"),
+        ]
+
+        for property in properties:
+            matched_in_sql = set(
+                Person.objects.filter(property.property_to_Q(), team=self.team).values_list("pk", flat=True)
+            )
+            matched_locally = {person.pk for person in persons if match_property_locally(property, person.properties)}
+            self.assertEqual(matched_locally, matched_in_sql, property.to_dict())
+
 
 class TestMatchProperties(TestCase):
     def test_match_properties_exact(self):
@@ -223,3 +244,32 @@ class TestMatchProperties(TestCase):
         self.assertTrue(match_property(property_d, {"key": "2022-04-05 12:34:11 CET"}))
 
         self.assertFalse(match_property(property_d, {"key": "2022-04-05 12:34:13 CET"}))
+
+    def test_match_property_locally_missing_keys(self):
+        self.assertFalse(match_property_locally(Property(key="key", value="value"), {}))
+        self.assertFalse(match_property_locally(Property(key="key", value="val", operator="icontains"), {}))
+        self.assertTrue(match_property_locally(Property(key="key", value="value", operator="is_not"), {}))
+        self.assertTrue(match_property_locally(Property(key="key", value="val", operator="not_icontains"), {}))
+        self.assertTrue(match_property_locally(Property(key="key", value="val", operator="not_regex"), {}))
+        self.assertTrue(match_property_locally(Property(key="key", value="val", operator="not_regex"), {"key": None}))
+
+    def test_match_property_locally_set_operators(self):
+        property_a = Property(key="key", value="is_set", operator="is_set")
+        self.assertTrue(match_property_locally(property_a, {"key": None}))
+        self.assertFalse(match_property_locally(property_a, {"key2": "value"}))
+
+        property_b = Property(key="key", value="is_not_set", operator="is_not_set")
+        self.assertFalse(match_property_locally(property_b, {"key": "value"}))
+        self.assertTrue(match_property_locally(property_b, {"key2": "value"}))
+
+    def test_match_property_locally_delegates_to_match_property(self):
+        self.assertTrue(match_property_locally(Property(key="key", value="^val", operator="regex"), {"key": "value"}))
+        self.assertFalse(match_property_locally(Property(key="key", value="[", operator="regex"), {"key": "value"}))
+        self.assertTrue(match_property_locally(Property(key="key", value=["a", "b"]), {"key": "b"}))
+        self.assertTrue(match_property_locally(Property(key="key", value=3, operator="gt"), {"key": 5}))
+
+    def test_match_property_locally_cohorts(self):
+        property_a = Property(key="id", value=5, type="cohort")
+        self.assertTrue(match_property_locally(property_a, {}, frozenset({4, 5})))
+        self.assertFalse(match_property_locally(property_a, {}, frozenset({4})))
+        self.assertFalse(match_property_locally(property_a, {}))
@@ -0,0 +1,97 @@
+import threading
+import time
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, override_settings
+
+from posthog.clickhouse.query_tagging import get_query_tags, reset_query_tags, tag_queries
+from posthog.queries.executor import QueryExecutor, run_in_parallel
+
+
+class TestQueryExecutor(SimpleTestCase):
+    def setUp(self):
+        self.executor = QueryExecutor(max_workers=4, max_workers_per_team=2)
+        patcher = patch("posthog.queries.executor.get_query_executor", return_value=self.executor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(reset_query_tags)
+
+    @override_settings(QUERY_EXECUTOR_MAX_WORKERS=4)
+    def test_runs_tasks_at_the_same_time(self):
+        barrier = threading.Barrier(2, timeout=5)
+
+        def task(value):
+            # Only passes once both tasks are running
+            barrier.wait()
+            return value
+
+        self.assertEqual(run_in_parallel(1, [lambda: task("a"), lambda: task("b")]), ["a", "b"])
+
+    @override_settings(QUERY_EXECUTOR_MAX_WORKERS=4)
+    def test_limits_threads_per_team_and_lets_other_teams_through(self):
+        release = threading.Event()
+        running = []
+        lock = threading.Lock()
+
+        def task(name):
+            with lock:
+                running.append(name)
+            release.wait(5)
+            return name
+
+        team_1_futures = [self.executor.submit(1, lambda i=i: task(f"team1-{i}")) for i in range(3)]
+        team_2_future = self.executor.submit(2, lambda: task("team2"))
+
+        for _ in range(500):
+            with lock:
+                if len(running) == 3:
+                    break
+            time.sleep(0.01)
+
+        with lock:
+            self.assertCountEqual(running, ["team1-0", "team1-1", "team2"])
+
+        release.set()
+        self.assertEqual([future.result(5) for future in team_1_futures], ["team1-0", "team1-1", "team1-2"])
+        self.assertEqual(team_2_future.result(5), "team2")
+
+    @override_settings(QUERY_EXECUTOR_MAX_WORKERS=4)
+    def test_error_cancels_pending_tasks(self):
+        executor = QueryExecutor(max_workers=4, max_workers_per_team=1)
+        release = threading.Event()
+        calls = []
+
+        def failing():
+            raise ValueError("query failed")
+
+        with patch("posthog.queries.executor.get_query_executor", return_value=executor):
+            with self.assertRaises(ValueError):
+                run_in_parallel(1, [failing, lambda: release.wait(5), lambda: calls.append("third")])
+        release.set()
+
+        # The third task could only have started after the second finished, which it didn't until it was cancelled
+        self.assertEqual(calls, [])
+
+    @override_settings(QUERY_EXECUTOR_MAX_WORKERS=4)
+    def test_query_tags_are_passed_to_tasks(self):
+        tag_queries(team_id=1, client_query_id="abc")
+
+        results = run_in_parallel(1, [lambda: dict(get_query_tags()), lambda: dict(get_query_tags())])
+
+        self.assertEqual(results, [{"team_id": 1, "client_query_id": "abc"}] * 2)
+
+    @override_settings(QUERY_EXECUTOR_MAX_WORKERS=4)
+    def test_nested_tasks_run_inline(self):
+        def outer():
+            return run_in_parallel(1, [lambda: threading.current_thread().name, lambda: "inner"])
+
+        results = run_in_parallel(1, [outer, outer])
+
+        self.assertTrue(all(result[0].startswith("query-executor-") for result in results))
+
+    @override_settings(QUERY_EXECUTOR_MAX_WORKERS=0)
+    def test_disabled_runs_in_calling_thread(self):
+        self.assertEqual(
+            run_in_parallel(1, [lambda: threading.current_thread().name] * 2),
+            [threading.current_thread().name] * 2,
+        )
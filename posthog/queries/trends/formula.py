@@ -1,4 +1,5 @@
 import math
+from functools import partial
 from itertools import accumulate
 from string import ascii_uppercase
 from typing import Any, Dict, List
@@ -10,6 +11,7 @@ from posthog.constants import NON_TIME_SERIES_DISPLAY_TYPES, TRENDS_CUMULATIVE
 from posthog.models.filters.filter import Filter
 from posthog.models.team import Team
 from posthog.queries.breakdown_props import get_breakdown_cohort_name
+from posthog.queries.executor import run_in_parallel
 from posthog.queries.insight import insight_sync_execute
 from posthog.queries.trends.util import ensure_value_is_json_serializable, parse_response
 
@@ -19,8 +21,12 @@ class TrendsFormula:
         letters = [ascii_uppercase[i] for i in range(0, len(filter.entities))]
         queries = []
         params: Dict[str, Any] = {}
-        for idx, entity in enumerate(filter.entities):
-            query_type, sql, entity_params, _ = self._get_sql_for_entity(filter, team, entity)  # type: ignore
+        # Building the query of an entity can mean querying for its breakdown values, so do it for all at once
+        entity_queries = run_in_parallel(
+            team.pk,
+            [partial(self._get_sql_for_entity, filter, team, entity) for entity in filter.entities],  # type: ignore
+        )
+        for idx, (query_type, sql, entity_params, _) in enumerate(entity_queries):
             sql = sql.replace("%(", f"%({idx}_")
             entity_params = {f"{idx}_{key}": value for key, value in entity_params.items()}
             queries.append(sql)
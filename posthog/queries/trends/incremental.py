@@ -0,0 +1,381 @@
+import json
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import pytz
+import structlog
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.utils import timezone
+from statshog.defaults.django import statsd
+
+from posthog import json_codec
+from posthog.constants import (
+    NON_BREAKDOWN_DISPLAY_TYPES,
+    NON_TIME_SERIES_DISPLAY_TYPES,
+    TREND_FILTER_TYPE_ACTIONS,
+    TRENDS_CUMULATIVE,
+    TRENDS_LIFECYCLE,
+    UNIQUE_USERS,
+)
+from posthog.models.entity import Entity
+from posthog.models.filters import Filter
+from posthog.models.team import Team
+from posthog.queries.insight import insight_sync_execute
+from posthog.queries.query_date_range import QueryDateRange
+from posthog.queries.trends.breakdown import TrendsBreakdown
+from posthog.redis import get_client
+from posthog.utils import generate_cache_key
+
+logger = structlog.get_logger(__name__)
+
+INTERVAL_DELTAS = {
+    "hour": relativedelta(hours=1),
+    "day": relativedelta(days=1),
+    "week": relativedelta(weeks=1),
+    "month": relativedelta(months=1),
+}
+
+# Property types that only depend on the event itself, so filtering on them can't change results after ingestion
+IMMUTABLE_PROPERTY_TYPES = ("event", "element")
+
+BucketStart = Union[date, datetime]
+
+
+class TrendsIncremental:
+    """
+    Calculates time series trends incrementally: every interval bucket that is fully in the past (by more than
+    INCREMENTAL_TRENDS_INGESTION_LAG_SECONDS) is stored in Redis once calculated, and only the buckets after the
+    stored ones are queried from ClickHouse on later calculations.
+
+    Buckets are stored per filter without its date range, so dashboards with relative date ranges keep reusing
+    them as the range moves along, and so do the comparison periods of the same filter.
+
+    Only used for teams in the INCREMENTAL_TRENDS_TEAMS instance setting, and only for filters whose past buckets
+    can't change, i.e. those that don't depend on person properties or cohorts (unless person-on-events querying
+    is enabled) and where buckets don't depend on each other (smoothing, unique users cumulative).
+    """
+
+    def _can_run_incrementally(self, filter: Filter, team: Team, entity: Entity) -> bool:
+        if not team.incremental_trends_enabled:
+            return False
+
+        if (
+            filter.display in NON_TIME_SERIES_DISPLAY_TYPES
+            or filter.shown_as == TRENDS_LIFECYCLE
+            or filter.formula
+            or filter.smoothing_intervals > 1
+            or filter.use_explicit_dates
+            or filter.interval not in INTERVAL_DELTAS
+            or (filter.display == TRENDS_CUMULATIVE and entity.math == UNIQUE_USERS)
+        ):
+            return False
+
+        # Only breakdowns where the breakdown values of an event never change, and all values can be returned
+        if _is_breakdown(filter) and (
+            filter.breakdown_type not in (None, "event")
+            or not isinstance(filter.breakdown, str)
+            or filter.using_histogram
+            or filter.offset
+        ):
+            return False
+
+        property_types = [prop.type for prop in filter.property_groups.flat + entity.property_groups.flat]
+        if filter.filter_test_accounts:
+            property_types += [prop.get("type", "event") for prop in team.test_account_filters]
+        if entity.type == TREND_FILTER_TYPE_ACTIONS:
+            property_types += [
+                prop.get("type", "event")
+                for step in entity.get_action().steps.all()
+                for prop in (step.properties or [])
+            ]
+
+        immutable_property_types = IMMUTABLE_PROPERTY_TYPES + (
+            ("person",) if team.actor_on_events_querying_enabled else ()
+        )
+        return all(property_type in immutable_property_types for property_type in property_types)
+
+    def _run_query_incrementally(self, filter: Filter, team: Team, entity: Entity) -> List[Dict[str, Any]]:
+        is_breakdown = _is_breakdown(filter)
+        window_start, window_end = _bucket_window(filter, team)
+        if window_start is None:
+            # The first bucket only covers part of its interval, so no stored bucket can stand in for it
+            statsd.incr("trends_incremental_fallback", tags={"reason": "partial_bucket"})
+            return self._parse_incremental_rows(
+                filter, team, entity, is_breakdown, self._run_incremental_query(filter, team, entity, is_breakdown)
+            )
+
+        interval = INTERVAL_DELTAS[filter.interval]
+        immutable_before = timezone.now().astimezone(pytz.timezone(team.timezone)).replace(tzinfo=None) - timedelta(
+            seconds=settings.INCREMENTAL_TRENDS_INGESTION_LAG_SECONDS
+        )
+        storable_before = min(window_end, immutable_before)
+        buckets_key = _buckets_key(filter, team, entity)
+
+        # Reuse the stored buckets from the start of the range, for as long as they are contiguous
+        stored_buckets: List[Tuple[BucketStart, Dict[Any, Any]]] = []
+        tail_start = window_start
+        for bucket in _get_stored_buckets(buckets_key, _bucket_starts(window_start, storable_before, interval)):
+            if bucket is None:
+                break
+            stored_buckets.append(bucket)
+            tail_start += interval
+
+        rows: List = []
+        if tail_start < window_end:
+            query_filter = (
+                filter
+                if tail_start == window_start
+                else filter.with_data({"date_from": _date_param(tail_start, filter)})
+            )
+            rows = self._run_incremental_query(query_filter, team, entity, is_breakdown)
+
+        if stored_buckets:
+            merged_rows = (
+                None
+                # The tail's top breakdown values aren't necessarily the top ones of the whole range
+                if is_breakdown and len(rows) >= filter.breakdown_limit_or_default
+                else _merge_rows(stored_buckets, rows, tail_start, window_end, interval, team, is_breakdown)
+            )
+            if merged_rows is None or (is_breakdown and len(merged_rows) >= filter.breakdown_limit_or_default):
+                statsd.incr("trends_incremental_fallback", tags={"reason": "merge"})
+                rows = self._run_incremental_query(filter, team, entity, is_breakdown)
+                stored_buckets, tail_start = [], window_start
+            else:
+                rows = merged_rows
+        statsd.incr("trends_incremental_buckets_reused", len(stored_buckets))
+
+        # When breakdown values were left out, their absence from stored buckets would read as zero later
+        if not is_breakdown or len(rows) < filter.breakdown_limit_or_default:
+            _store_buckets(buckets_key, rows, tail_start, storable_before, interval, team, is_breakdown)
+
+        return self._parse_incremental_rows(filter, team, entity, is_breakdown, rows)
+
+    def _run_incremental_query(self, filter: Filter, team: Team, entity: Entity, is_breakdown: bool) -> List:
+        if is_breakdown:
+            sql, params, _ = TrendsBreakdown(
+                entity, filter, team, using_person_on_events=team.actor_on_events_querying_enabled
+            ).get_query()
+            query_type = "trends_breakdown"
+        else:
+            sql, params, _ = self._total_volume_query(entity, filter, team)  # type: ignore
+            query_type = "trends_total_volume"
+
+        return insight_sync_execute(sql, params, query_type=query_type, filter=filter)
+
+    def _parse_incremental_rows(
+        self, filter: Filter, team: Team, entity: Entity, is_breakdown: bool, rows: List
+    ) -> List[Dict[str, Any]]:
+        # :TRICKY: Rows are always parsed with the full filter, so that they look exactly like a full query's would
+        if is_breakdown:
+            breakdown = TrendsBreakdown(
+                entity, filter, team, using_person_on_events=team.actor_on_events_querying_enabled
+            )
+            return breakdown._parse_trend_result(filter, entity)(rows)
+        return self._parse_total_volume_result(filter, entity, team)(rows)  # type: ignore
+
+
+def _is_breakdown(filter: Filter) -> bool:
+    return bool(filter.breakdown) and filter.display not in NON_BREAKDOWN_DISPLAY_TYPES
+
+
+def _date_param(value: datetime, filter: Filter) -> str:
+    return value.strftime("%Y-%m-%d %H:%M:%S" if filter.interval == "hour" else "%Y-%m-%d")
+
+
+def _truncate(value: datetime, interval: str) -> datetime:
+    "Mirrors the ClickHouse functions buckets are truncated with, in the team's timezone."
+    if interval == "hour":
+        return value.replace(minute=0, second=0, microsecond=0)
+    value = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == "week":
+        # toStartOfWeek(..., 0), i.e. weeks start on Sunday
+        return value - timedelta(days=(value.weekday() + 1) % 7)
+    if interval == "month":
+        return value.replace(day=1)
+    return value
+
+
+def _bucket_window(filter: Filter, team: Team) -> Tuple[Optional[datetime], datetime]:
+    """
+    Returns the start of the first bucket and the end of the last bucket of the filter's range, as naive datetimes
+    in the team's timezone. The start is None if the first bucket isn't fully covered by the range.
+    """
+    query_date_range = QueryDateRange(filter, team)
+    date_from = datetime.strptime(query_date_range.date_from[1]["date_from"], "%Y-%m-%d %H:%M:%S")
+    date_to = datetime.strptime(query_date_range.date_to[1]["date_to"], "%Y-%m-%d %H:%M:%S")
+
+    window_start: Optional[datetime] = _truncate(date_from, filter.interval)
+    if not query_date_range.should_round and window_start != date_from:
+        window_start = None
+    return window_start, date_to + timedelta(seconds=1)
+
+
+def _bucket_starts(start: datetime, end: datetime, interval: relativedelta) -> List[datetime]:
+    "Returns the starts of all buckets that start at or after `start` and end at or before `end`."
+    bucket_starts = []
+    while start + interval <= end:
+        bucket_starts.append(start)
+        start += interval
+    return bucket_starts
+
+
+def _wall_clock(bucket: BucketStart, team: Team) -> datetime:
+    if not isinstance(bucket, datetime):
+        return datetime(bucket.year, bucket.month, bucket.day)
+    if bucket.tzinfo is not None:
+        return bucket.astimezone(pytz.timezone(team.timezone)).replace(tzinfo=None)
+    return bucket
+
+
+def _bucket_start_like(template: BucketStart, wall_clock: datetime, team: Team) -> BucketStart:
+    "Returns the bucket start at `wall_clock`, as the same type ClickHouse returned `template` as."
+    if not isinstance(template, datetime):
+        return wall_clock.date()
+    if template.tzinfo is not None:
+        return pytz.timezone(team.timezone).localize(wall_clock)
+    return wall_clock
+
+
+def _serialize_bucket_start(bucket: BucketStart) -> str:
+    return bucket.isoformat()
+
+
+def _deserialize_bucket_start(value: str) -> BucketStart:
+    return date.fromisoformat(value) if len(value) == 10 else datetime.fromisoformat(value)
+
+
+def _buckets_key(filter: Filter, team: Team, entity: Entity) -> str:
+    filter_without_dates = {
+        key: value
+        for key, value in filter.to_dict().items()
+        if key not in ("date_from", "date_to", "explicit_date", "compare")
+    }
+    # Anything else the values of a bucket depend on
+    dependencies = [
+        filter_without_dates,
+        entity.to_dict(),
+        team.pk,
+        team.timezone,
+        team.aggregate_users_by_distinct_id,
+        team.actor_on_events_querying_enabled,
+        team.test_account_filters if filter.filter_test_accounts else None,
+        entity.get_action().updated_at if entity.type == TREND_FILTER_TYPE_ACTIONS else None,
+    ]
+    return "incremental_trends_" + generate_cache_key(json.dumps(dependencies, sort_keys=True, default=str))
+
+
+def _get_stored_buckets(
+    buckets_key: str, bucket_starts: List[datetime]
+) -> List[Optional[Tuple[BucketStart, Dict[Any, Any]]]]:
+    if not bucket_starts:
+        return []
+    try:
+        payloads = get_client().hmget(buckets_key, [bucket_start.isoformat() for bucket_start in bucket_starts])
+    except Exception as e:
+        logger.warning("trends_incremental_get_failed", exc_info=e)
+        statsd.incr("trends_incremental_error", tags={"operation": "get"})
+        return []
+
+    buckets: List[Optional[Tuple[BucketStart, Dict[Any, Any]]]] = []
+    for payload in payloads:
+        if payload is None:
+            buckets.append(None)
+            continue
+        bucket = json_codec.loads(payload)
+        buckets.append((_deserialize_bucket_start(bucket["date"]), {key: value for key, value in bucket["values"]}))
+    return buckets
+
+
+def _store_buckets(
+    buckets_key: str,
+    rows: List,
+    tail_start: datetime,
+    storable_before: datetime,
+    interval: relativedelta,
+    team: Team,
+    is_breakdown: bool,
+) -> None:
+    "Stores the buckets of `rows` that start at or after `tail_start` and are complete and immutable."
+    buckets: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        series_key = row[2] if is_breakdown else None
+        for bucket_start, value in zip(row[0], row[1]):
+            wall_clock = _wall_clock(bucket_start, team)
+            if wall_clock < tail_start or wall_clock + interval > storable_before:
+                continue
+            bucket = buckets.setdefault(
+                wall_clock.isoformat(), {"date": _serialize_bucket_start(bucket_start), "values": []}
+            )
+            # Series without a value are zero, which keeps buckets small for breakdowns with many values
+            if value:
+                bucket["values"].append([series_key, value])
+
+    if not buckets:
+        return
+    try:
+        pipeline = get_client().pipeline(transaction=False)
+        pipeline.hset(buckets_key, mapping={field: json_codec.dumps_bytes(bucket) for field, bucket in buckets.items()})
+        pipeline.expire(buckets_key, settings.CACHED_RESULTS_TTL)
+        pipeline.execute()
+        statsd.incr("trends_incremental_buckets_stored", len(buckets))
+    except Exception as e:
+        logger.warning("trends_incremental_set_failed", exc_info=e)
+        statsd.incr("trends_incremental_error", tags={"operation": "set"})
+
+
+def _merge_rows(
+    stored_buckets: List[Tuple[BucketStart, Dict[Any, Any]]],
+    tail_rows: List,
+    tail_start: datetime,
+    window_end: datetime,
+    interval: relativedelta,
+    team: Team,
+    is_breakdown: bool,
+) -> Optional[List]:
+    """
+    Combines stored buckets with the rows of the tail query into the rows a query for the whole range would've
+    returned. Returns None if the tail doesn't line up with the stored buckets.
+    """
+    tail_by_series: Dict[Any, Dict[datetime, Tuple[BucketStart, Any]]] = {}
+    for row in tail_rows:
+        series_key = row[2] if is_breakdown else None
+        tail_by_series[series_key] = {
+            _wall_clock(bucket_start, team): (bucket_start, value)
+            for bucket_start, value in zip(row[0], row[1])
+            if _wall_clock(bucket_start, team) >= tail_start
+        }
+
+    tail_bucket_starts: List[BucketStart]
+    if tail_start >= window_end:
+        tail_bucket_starts = []
+    elif tail_by_series:
+        first_series = next(iter(tail_by_series.values()))
+        tail_bucket_starts = [bucket_start for _, (bucket_start, _) in sorted(first_series.items())]
+        if not tail_bucket_starts or _wall_clock(tail_bucket_starts[0], team) != tail_start:
+            logger.warning("trends_incremental_tail_misaligned", tail_start=tail_start)
+            return None
+    elif is_breakdown:
+        # No events in the tail at all, so there are no rows to take the bucket starts from
+        tail_bucket_starts = []
+        bucket_start = tail_start
+        while bucket_start < window_end:
+            tail_bucket_starts.append(_bucket_start_like(stored_buckets[0][0], bucket_start, team))
+            bucket_start += interval
+    else:
+        return None
+
+    series_keys = list(dict.fromkeys([key for _, values in stored_buckets for key in values] + list(tail_by_series)))
+    if not is_breakdown:
+        series_keys = [None]
+
+    dates = [bucket_start for bucket_start, _ in stored_buckets] + tail_bucket_starts
+    rows = []
+    for series_key in series_keys:
+        tail_series = tail_by_series.get(series_key, {})
+        counts = [values.get(series_key, 0) for _, values in stored_buckets] + [
+            tail_series.get(_wall_clock(bucket_start, team), (bucket_start, 0))[1]
+            for bucket_start in tail_bucket_starts
+        ]
+        rows.append((dates, counts, series_key) if is_breakdown else (dates, counts))
+    return rows
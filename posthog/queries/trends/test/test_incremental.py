@@ -0,0 +1,105 @@
+from unittest.mock import patch
+
+from freezegun import freeze_time
+
+from posthog.models.filters.filter import Filter
+from posthog.models.instance_setting import set_instance_setting
+from posthog.queries.insight import insight_sync_execute
+from posthog.queries.trends.trends import Trends
+from posthog.redis import get_client
+from posthog.test.base import APIBaseTest, ClickhouseTestMixin, _create_event, _create_person
+
+
+class TestIncrementalTrends(ClickhouseTestMixin, APIBaseTest):
+    CLASS_DATA_LEVEL_SETUP = False
+
+    def setUp(self):
+        super().setUp()
+        get_client().flushdb()
+
+        _create_person(team_id=self.team.pk, distinct_ids=["person1"])
+        _create_person(team_id=self.team.pk, distinct_ids=["person2"])
+        for timestamp, distinct_id, browser in [
+            ("2020-01-01T12:00:00Z", "person1", "Chrome"),
+            ("2020-01-02T12:00:00Z", "person1", "Chrome"),
+            ("2020-01-02T13:00:00Z", "person2", "Safari"),
+            ("2020-01-04T12:00:00Z", "person2", "Safari"),
+            ("2020-01-07T09:00:00Z", "person1", "Firefox"),
+        ]:
+            _create_event(
+                team=self.team,
+                event="$pageview",
+                distinct_id=distinct_id,
+                timestamp=timestamp,
+                properties={"$browser": browser},
+            )
+
+    def _run(self, filter_data, incremental=True):
+        set_instance_setting("INCREMENTAL_TRENDS_TEAMS", "all" if incremental else "")
+        filter = Filter(data={"events": [{"id": "$pageview"}], "date_from": "-7d", **filter_data}, team=self.team)
+        with patch(
+            "posthog.queries.trends.incremental.insight_sync_execute", wraps=insight_sync_execute
+        ) as mock_execute:
+            result = Trends().run(filter, self.team)
+        return result, [call.kwargs["filter"]._date_from for call in mock_execute.call_args_list]
+
+    @freeze_time("2020-01-07T10:00:00Z")
+    def test_only_queries_newest_buckets_once_stored(self):
+        for filter_data in [{}, {"math": "dau"}, {"display": "ActionsLineGraphCumulative"}]:
+            get_client().flushdb()
+            expected_result, _ = self._run(filter_data, incremental=False)
+
+            first_result, first_queried_from = self._run(filter_data)
+            second_result, second_queried_from = self._run(filter_data)
+
+            self.assertEqual(first_result, expected_result)
+            self.assertEqual(second_result, expected_result)
+            self.assertEqual(first_queried_from, ["-7d"])
+            # Buckets up to yesterday are final, as the ingestion lag of today's has not passed
+            self.assertEqual(second_queried_from, ["2020-01-07"])
+
+    @freeze_time("2020-01-07T10:00:00Z")
+    def test_breakdown(self):
+        filter_data = {"breakdown": "$browser", "breakdown_type": "event"}
+        expected_result, _ = self._run(filter_data, incremental=False)
+
+        self._run(filter_data)
+        result, queried_from = self._run(filter_data)
+
+        self.assertEqual(result, expected_result)
+        self.assertEqual(queried_from, ["2020-01-07"])
+        self.assertEqual(
+            [(series["breakdown_value"], series["count"]) for series in result],
+            [("Chrome", 2.0), ("Safari", 2.0), ("Firefox", 1.0)],
+        )
+
+    @freeze_time("2020-01-07T10:00:00Z")
+    def test_breakdown_limit_reached_is_not_stored(self):
+        filter_data = {"breakdown": "$browser", "breakdown_type": "event", "breakdown_limit": 2}
+        expected_result, _ = self._run(filter_data, incremental=False)
+
+        self._run(filter_data)
+        result, queried_from = self._run(filter_data)
+
+        self.assertEqual(result, expected_result)
+        self.assertEqual(queried_from, ["-7d"])
+
+    @freeze_time("2020-01-07T10:00:00Z")
+    def test_new_events_in_open_bucket_are_included(self):
+        self._run({})
+
+        _create_event(team=self.team, event="$pageview", distinct_id="person2", timestamp="2020-01-07T09:30:00Z")
+        expected_result, _ = self._run({}, incremental=False)
+        result, _ = self._run({})
+
+        self.assertEqual(result, expected_result)
+        self.assertEqual(result[0]["data"][-1], 2.0)
+
+    @freeze_time("2020-01-07T10:00:00Z")
+    def test_person_property_filters_are_not_incremental(self):
+        filter_data = {"properties": [{"key": "email", "value": "x@example.com", "type": "person"}]}
+
+        self._run(filter_data)
+        _, queried_from = self._run(filter_data)
+
+        self.assertEqual(queried_from, [])
@@ -1,3 +1,4 @@
+from unittest.mock import patch
 from uuid import UUID
 
 from dateutil.relativedelta import relativedelta
@@ -155,3 +156,37 @@ class TestPerson(ClickhouseTestMixin, APIBaseTest):
                 }
             ],
         )
+
+    @freeze_time("2021-01-21T20:00:00.000Z")
+    def test_paginates_with_cursor(self):
+        for index in range(5):
+            _create_person(team_id=self.team.pk, distinct_ids=[f"u{index}"])
+            _create_event(event="pageview", distinct_id=f"u{index}", team=self.team, timestamp=timezone.now())
+        event = {"id": "pageview", "name": "pageview", "type": "events", "order": 0}
+        filter = Filter(
+            data={"date_from": "2021-01-21T00:00:00Z", "date_to": "2021-01-22T00:00:00Z", "events": [event], "limit": 2}
+        )
+        entity = Entity(event)
+
+        with self.settings(ACTORS_CURSOR_PAGINATION_ENABLED=False):
+            _, all_actors, _ = TrendsActors(self.team, entity, filter.with_data({"limit": 100})).get_actors()
+
+        with self.settings(ACTORS_CURSOR_PAGINATION_ENABLED=True):
+            actors_query = TrendsActors(self.team, entity, filter)
+            _, first_page, _ = actors_query.get_actors()
+            paged_actors = list(first_page)
+
+            offset = 2
+            cursor = actors_query.next_cursor
+            with patch("posthog.queries.actor_base_query.insight_sync_execute") as insight_sync_execute:
+                while cursor is not None:
+                    actors_query = TrendsActors(self.team, entity, filter.with_data({"offset": offset}))
+                    _, page, raw_count = actors_query.get_actors(cursor=cursor)
+                    paged_actors.extend(page)
+                    offset += raw_count
+                    cursor = actors_query.next_cursor
+
+            insight_sync_execute.assert_not_called()
+
+        self.assertEqual(len(all_actors), 5)
+        self.assertCountEqual([actor["id"] for actor in paged_actors], [actor["id"] for actor in all_actors])
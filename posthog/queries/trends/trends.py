@@ -1,6 +1,6 @@
 import copy
-import threading
 from datetime import datetime, timedelta
+from functools import partial
 from itertools import accumulate
 from typing import Any, Callable, Dict, List, Optional, Tuple, cast
 
@@ -9,7 +9,6 @@ from dateutil import parser
 from django.db.models.query import Prefetch
 from sentry_sdk import push_scope
 
-from posthog.clickhouse.query_tagging import get_query_tags, tag_queries
 from posthog.constants import (
     NON_BREAKDOWN_DISPLAY_TYPES,
     TREND_FILTER_TYPE_ACTIONS,
@@ -23,15 +22,17 @@ from posthog.models.entity import Entity
 from posthog.models.filters import Filter
 from posthog.models.team import Team
 from posthog.queries.base import handle_compare
+from posthog.queries.executor import run_in_parallel
 from posthog.queries.insight import insight_sync_execute
 from posthog.queries.trends.breakdown import TrendsBreakdown
 from posthog.queries.trends.formula import TrendsFormula
+from posthog.queries.trends.incremental import TrendsIncremental
 from posthog.queries.trends.lifecycle import Lifecycle
 from posthog.queries.trends.total_volume import TrendsTotalVolume
 from posthog.utils import generate_cache_key, get_safe_cache
 
 
-class Trends(TrendsTotalVolume, Lifecycle, TrendsFormula):
+class Trends(TrendsTotalVolume, Lifecycle, TrendsFormula, TrendsIncremental):
     def _get_sql_for_entity(self, filter: Filter, team: Team, entity: Entity) -> Tuple[str, str, Dict, Callable]:
         if filter.breakdown and filter.display not in NON_BREAKDOWN_DISPLAY_TYPES:
             query_type = "trends_breakdown"
@@ -121,6 +122,17 @@ class Trends(TrendsTotalVolume, Lifecycle, TrendsFormula):
             return result, {}
 
     def _run_query(self, filter: Filter, team: Team, entity: Entity) -> List[Dict[str, Any]]:
+        if self._can_run_incrementally(filter, team, entity):
+            with push_scope() as scope:
+                scope.set_context("filter", filter.to_dict())
+                scope.set_tag("team", team)
+                result = self._run_query_incrementally(filter, team, entity)
+                serialized_data = self._format_serialized(entity, result)
+                merged_results, _ = self.merge_results(
+                    serialized_data, None, entity.order or entity.index, filter, team
+                )
+            return merged_results
+
         adjusted_filter, cached_result = self.adjusted_filter(filter, team)
         with push_scope() as scope:
             query_type, sql, params, parse_function = self._get_sql_for_entity(adjusted_filter, team, entity)
@@ -145,39 +157,27 @@ class Trends(TrendsTotalVolume, Lifecycle, TrendsFormula):
 
         return merged_results
 
-    def _run_query_for_threading(self, result: List, index: int, query_type, sql, params, query_tags: Dict):
-        tag_queries(**query_tags)
+    def _run_query_for_parallel(self, query_type, sql, params) -> List:
         with push_scope() as scope:
             scope.set_context("query", {"sql": sql, "params": params})
-            result[index] = insight_sync_execute(sql, params, query_type=query_type)
+            return insight_sync_execute(sql, params, query_type=query_type)
 
     def _run_parallel(self, filter: Filter, team: Team) -> List[Dict[str, Any]]:
-        result: List[Optional[List[Dict[str, Any]]]] = [None] * len(filter.entities)
         parse_functions: List[Optional[Callable]] = [None] * len(filter.entities)
         sql_statements_with_params: List[Tuple[Optional[str], Dict]] = [(None, {})] * len(filter.entities)
         cached_result = None
-        jobs = []
+        jobs: List[Optional[Callable[[], List]]] = [None] * len(filter.entities)
 
         for entity in filter.entities:
             adjusted_filter, cached_result = self.adjusted_filter(filter, team)
             query_type, sql, params, parse_function = self._get_sql_for_entity(adjusted_filter, team, entity)
             parse_functions[entity.index] = parse_function
             sql_statements_with_params[entity.index] = (sql, params)
-            thread = threading.Thread(
-                target=self._run_query_for_threading,
-                args=(result, entity.index, query_type, sql, params, get_query_tags()),
-            )
-            jobs.append(thread)
+            jobs[entity.index] = partial(self._run_query_for_parallel, query_type, sql, params)
 
-        # Start the threads (i.e. calculate the random number lists)
-        for j in jobs:
-            j.start()
+        result: List[Any] = run_in_parallel(team.pk, cast(List[Callable[[], List]], jobs))
 
-        # Ensure all of the threads have finished
-        for j in jobs:
-            j.join()
-
-        # Parse results for each thread
+        # Parse results for each query
         with push_scope() as scope:
             scope.set_context("filter", filter.to_dict())
             scope.set_tag("team", team)
@@ -220,10 +220,18 @@ class Trends(TrendsTotalVolume, Lifecycle, TrendsFormula):
                 except Action.DoesNotExist:
                     return []
 
-        if len(filter.entities) == 1 or filter.compare:
+        # Incremental queries only cover the newest buckets, so there's little to gain from running them in parallel
+        if (
+            len(filter.entities) == 1
+            or filter.compare
+            or all(self._can_run_incrementally(filter, team, entity) for entity in filter.entities)
+        ):
             result = []
-            for entity in filter.entities:
-                result.extend(handle_compare(filter, self._run_query, team, entity=entity))
+            for entity_result in run_in_parallel(
+                team.pk,
+                [partial(handle_compare, filter, self._run_query, team, entity=entity) for entity in filter.entities],
+            ):
+                result.extend(entity_result)
         else:
             result = self._run_parallel(filter, team)
 
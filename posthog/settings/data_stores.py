@@ -98,6 +98,19 @@ CLICKHOUSE_ENABLE_STORAGE_POLICY = get_from_env("CLICKHOUSE_ENABLE_STORAGE_POLIC
 CLICKHOUSE_CONN_POOL_MIN = get_from_env("CLICKHOUSE_CONN_POOL_MIN", 20, type_cast=int)
 CLICKHOUSE_CONN_POOL_MAX = get_from_env("CLICKHOUSE_CONN_POOL_MAX", 1000, type_cast=int)
 
+# Threads shared by all insight queries of a process to run independent queries at the same time, see
+# posthog/queries/executor.py. Tests run them one after the other, as other threads can't see test transactions.
+QUERY_EXECUTOR_MAX_WORKERS = get_from_env(
+    "QUERY_EXECUTOR_MAX_WORKERS", 0 if TEST else CLICKHOUSE_CONN_POOL_MIN, type_cast=int
+)
+# How many of those threads a single team's queries can use at once
+QUERY_EXECUTOR_MAX_WORKERS_PER_TEAM = get_from_env("QUERY_EXECUTOR_MAX_WORKERS_PER_TEAM", 5, type_cast=int)
+
+# Results of queries opting into it are cached in Redis, see posthog/clickhouse/result_cache.py
+CLICKHOUSE_RESULT_CACHE_ENABLED = get_from_env("CLICKHOUSE_RESULT_CACHE_ENABLED", not TEST, type_cast=str_to_bool)
+# Results bigger than this (after compression) are not cached
+CLICKHOUSE_RESULT_CACHE_MAX_BYTES = get_from_env("CLICKHOUSE_RESULT_CACHE_MAX_BYTES", 1024 * 1024, type_cast=int)
+
 CLICKHOUSE_STABLE_HOST = get_from_env("CLICKHOUSE_STABLE_HOST", CLICKHOUSE_HOST)
 # If enabled, some queries will use system.cluster table to query each shard
 CLICKHOUSE_ALLOW_PER_SHARD_EXECUTION = get_from_env(
@@ -136,6 +149,14 @@ KAFKA_SASL_MECHANISM = os.getenv("KAFKA_SASL_MECHANISM", None)
 KAFKA_SASL_USER = os.getenv("KAFKA_SASL_USER", None)
 KAFKA_SASL_PASSWORD = os.getenv("KAFKA_SASL_PASSWORD", None)
 
+# JSON backend for capture, Kafka and cached query results: "auto" uses orjson if it's installed, "stdlib" never does
+JSON_CODEC_BACKEND = os.getenv("JSON_CODEC_BACKEND", "auto")
+
+# Producer tuning, defaults match kafka-python's own. lz4/zstd compression need the `lz4`/`zstandard` packages.
+KAFKA_PRODUCER_LINGER_MS = get_from_env("KAFKA_PRODUCER_LINGER_MS", 0, type_cast=int)
+KAFKA_PRODUCER_BATCH_SIZE = get_from_env("KAFKA_PRODUCER_BATCH_SIZE", 16384, type_cast=int)
+KAFKA_PRODUCER_COMPRESSION_TYPE = os.getenv("KAFKA_PRODUCER_COMPRESSION_TYPE", None) or None
+
 SUFFIX = "_test" if TEST else ""
 
 KAFKA_EVENTS_PLUGIN_INGESTION: str = (
@@ -178,3 +199,26 @@ CACHES = {
 
 if TEST:
     CACHES["default"] = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+
+# Insight results stored in the cache above, see posthog/caching/insight_result_cache.py.
+# Compression is one of "auto", "zstd", "lz4", "zlib" or "none", zstd and lz4 need the `zstandard`/`lz4` packages.
+INSIGHT_RESULT_CACHE_COMPRESSION = os.getenv("INSIGHT_RESULT_CACHE_COMPRESSION", "none" if TEST else "auto")
+INSIGHT_RESULT_CACHE_LOCAL_MAX_ENTRIES = get_from_env("INSIGHT_RESULT_CACHE_LOCAL_MAX_ENTRIES", 200, type_cast=int)
+INSIGHT_RESULT_CACHE_LOCAL_MAX_ENTRY_BYTES = get_from_env(
+    "INSIGHT_RESULT_CACHE_LOCAL_MAX_ENTRY_BYTES", 512 * 1024, type_cast=int
+)
+INSIGHT_RESULT_CACHE_LOCAL_TTL_SECONDS = get_from_env("INSIGHT_RESULT_CACHE_LOCAL_TTL_SECONDS", 30, type_cast=int)
+# Compressed bytes of results a team can have in Redis before its oldest are evicted, 0 for no limit
+INSIGHT_RESULT_CACHE_TEAM_BUDGET_BYTES = get_from_env(
+    "INSIGHT_RESULT_CACHE_TEAM_BUDGET_BYTES", 256 * 1024 * 1024, type_cast=int
+)
+
+# How long serialized persons and groups are kept for actors lists, see posthog/caching/actor_hydration_cache.py.
+# 0 turns the cache off.
+ACTOR_HYDRATION_CACHE_TTL_SECONDS = get_from_env(
+    "ACTOR_HYDRATION_CACHE_TTL_SECONDS", 0 if TEST else 2 * 60, type_cast=int
+)
+
+# Whether the actors of the first page of an actors list are materialized for the following pages, see
+# posthog/queries/actor_pagination.py
+ACTORS_CURSOR_PAGINATION_ENABLED = get_from_env("ACTORS_CURSOR_PAGINATION_ENABLED", not TEST, type_cast=str_to_bool)
@@ -72,6 +72,11 @@ CONSTANCE_CONFIG = {
         "Whether to always try to find cached data for historical intervals on trends",
         str,
     ),
+    "INCREMENTAL_TRENDS_TEAMS": (
+        get_from_env("INCREMENTAL_TRENDS_TEAMS", ""),
+        "Teams whose trends only query the newest intervals, reusing stored results for older ones",
+        str,
+    ),
     "EMAIL_ENABLED": (
         get_from_env("EMAIL_ENABLED", True, type_cast=str_to_bool),
         "Whether email service is enabled or not.",
@@ -184,6 +189,7 @@ SETTINGS_ALLOWING_API_OVERRIDE = (
     "PERSON_ON_EVENTS_ENABLED",
     "GROUPS_ON_EVENTS_ENABLED",
     "STRICT_CACHING_TEAMS",
+    "INCREMENTAL_TRENDS_TEAMS",
     "SLACK_APP_CLIENT_ID",
     "SLACK_APP_CLIENT_SECRET",
     "SLACK_APP_SIGNING_SECRET",
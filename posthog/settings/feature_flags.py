@@ -1,6 +1,7 @@
 import os
 
-from posthog.settings.utils import get_list
+from posthog.settings.base_variables import TEST
+from posthog.settings.utils import get_from_env, get_list, str_to_bool
 
 # These flags will be force-enabled on the frontend
 # The features here are released, but the flags are just not yet removed from the code
@@ -10,3 +11,23 @@ PERSISTED_FEATURE_FLAGS = get_list(os.getenv("PERSISTED_FEATURE_FLAGS", "")) + [
     "event-count-per-actor",
     "ingestion-warnings-enabled",
 ]
+
+# Per-team cache of active feature flag definitions (local memory plus Redis), keyed by a version that is
+# replaced whenever one of the team's flags changes.
+FEATURE_FLAG_DEFINITIONS_CACHE_ENABLED = get_from_env(
+    "FEATURE_FLAG_DEFINITIONS_CACHE_ENABLED", not TEST, type_cast=str_to_bool
+)
+FEATURE_FLAG_DEFINITIONS_CACHE_MAX_TEAMS = get_from_env(
+    "FEATURE_FLAG_DEFINITIONS_CACHE_MAX_TEAMS", 5_000, type_cast=int
+)
+FEATURE_FLAG_DEFINITIONS_CACHE_TTL_SECONDS = get_from_env(
+    "FEATURE_FLAG_DEFINITIONS_CACHE_TTL_SECONDS", 24 * 60 * 60, type_cast=int
+)
+
+# Evaluate person and group property conditions in Python against properties fetched once per distinct_id
+# (cached for a few seconds), instead of one annotated Postgres query per /decide request.
+FEATURE_FLAG_LOCAL_PROPERTY_EVALUATION = get_from_env(
+    "FEATURE_FLAG_LOCAL_PROPERTY_EVALUATION", False, type_cast=str_to_bool
+)
+FEATURE_FLAG_PROPERTIES_CACHE_MAX_SIZE = get_from_env("FEATURE_FLAG_PROPERTIES_CACHE_MAX_SIZE", 50_000, type_cast=int)
+FEATURE_FLAG_PROPERTIES_CACHE_TTL_SECONDS = get_from_env("FEATURE_FLAG_PROPERTIES_CACHE_TTL_SECONDS", 10, type_cast=int)
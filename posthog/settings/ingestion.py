@@ -1,6 +1,7 @@
 import os
 
-from posthog.settings.utils import get_from_env, get_list
+from posthog.settings.base_variables import TEST
+from posthog.settings.utils import get_from_env, get_list, str_to_bool
 
 INGESTION_LAG_METRIC_TEAM_IDS = get_list(os.getenv("INGESTION_LAG_METRIC_TEAM_IDS", ""))
 
@@ -17,3 +18,32 @@ LIGHTWEIGHT_CAPTURE_ENDPOINT_ENABLED_TOKENS = get_list(os.getenv("LIGHTWEIGHT_CA
 
 # Keep in sync with plugin-server
 EVENTS_DEAD_LETTER_QUEUE_STATSD_METRIC = "events_added_to_dead_letter_queue"
+
+# Per-process cache of api_token -> team context used by /capture and /decide, backed by Redis.
+# Entries are evicted on Team changes through Redis pub/sub, the TTLs only bound staleness if a message is lost.
+TEAM_TOKEN_CACHE_ENABLED = get_from_env("TEAM_TOKEN_CACHE_ENABLED", not TEST, type_cast=str_to_bool)
+TEAM_TOKEN_CACHE_MAX_SIZE = get_from_env("TEAM_TOKEN_CACHE_MAX_SIZE", 10_000, type_cast=int)
+TEAM_TOKEN_CACHE_LOCAL_TTL_SECONDS = get_from_env("TEAM_TOKEN_CACHE_LOCAL_TTL_SECONDS", 60, type_cast=int)
+TEAM_TOKEN_CACHE_REDIS_TTL_SECONDS = get_from_env("TEAM_TOKEN_CACHE_REDIS_TTL_SECONDS", 60 * 60, type_cast=int)
+TEAM_CACHE_INVALIDATION_PUBSUB_CHANNEL = os.getenv("TEAM_CACHE_INVALIDATION_PUBSUB_CHANNEL", "invalidate-team-cache")
+
+# Local on-disk buffer for events that /capture could not produce to Kafka, drained in the background with backoff.
+# Each worker process claims its own slot under the directory, so it should be on a volume that outlives restarts.
+KAFKA_SPILL_BUFFER_ENABLED = get_from_env("KAFKA_SPILL_BUFFER_ENABLED", False, type_cast=str_to_bool)
+KAFKA_SPILL_BUFFER_DIRECTORY = os.getenv("KAFKA_SPILL_BUFFER_DIRECTORY", "/var/lib/posthog/kafka-spill-buffer")
+KAFKA_SPILL_BUFFER_SEGMENT_SIZE_BYTES = get_from_env(
+    "KAFKA_SPILL_BUFFER_SEGMENT_SIZE_BYTES", 16 * 1024 * 1024, type_cast=int
+)
+KAFKA_SPILL_BUFFER_MAX_BYTES = get_from_env("KAFKA_SPILL_BUFFER_MAX_BYTES", 1024 * 1024 * 1024, type_cast=int)
+KAFKA_SPILL_BUFFER_MIN_BACKOFF_SECONDS = get_from_env("KAFKA_SPILL_BUFFER_MIN_BACKOFF_SECONDS", 1, type_cast=float)
+KAFKA_SPILL_BUFFER_MAX_BACKOFF_SECONDS = get_from_env("KAFKA_SPILL_BUFFER_MAX_BACKOFF_SECONDS", 60, type_cast=float)
+
+# Request bodies at least this large are decompressed and parsed incrementally, instead of being held in memory in
+# full as raw, decompressed and decoded copies.
+CAPTURE_STREAMING_DECODE_MIN_BYTES = get_from_env("CAPTURE_STREAMING_DECODE_MIN_BYTES", 1024 * 1024, type_cast=int)
+
+# Per-team /decide config (session recording settings, compiled recording domain matchers and site apps), kept in
+# local memory with the site apps in Redis. Transpiled site apps are only picked up once the TTL runs out.
+DECIDE_STATIC_CONFIG_CACHE_ENABLED = get_from_env("DECIDE_STATIC_CONFIG_CACHE_ENABLED", not TEST, type_cast=str_to_bool)
+DECIDE_STATIC_CONFIG_CACHE_MAX_TEAMS = get_from_env("DECIDE_STATIC_CONFIG_CACHE_MAX_TEAMS", 10_000, type_cast=int)
+DECIDE_STATIC_CONFIG_CACHE_TTL_SECONDS = get_from_env("DECIDE_STATIC_CONFIG_CACHE_TTL_SECONDS", 60, type_cast=int)
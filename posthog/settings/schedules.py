@@ -3,6 +3,20 @@ from posthog.settings.utils import get_from_env, str_to_bool
 
 USE_PRECALCULATED_CH_COHORT_PEOPLE = not TEST
 CALCULATE_X_COHORTS_PARALLEL = get_from_env("CALCULATE_X_COHORTS_PARALLEL", 5, type_cast=int)
+# How many cohort calculations of a single team can be queued or running at once
+COHORT_CALCULATION_MAX_IN_FLIGHT_PER_TEAM = get_from_env("COHORT_CALCULATION_MAX_IN_FLIGHT_PER_TEAM", 2, type_cast=int)
+# Let periodic cohort calculations check only the persons who changed since, see `recalculate_cohortpeople`
+COHORT_INCREMENTAL_RECALCULATION_ENABLED = get_from_env(
+    "COHORT_INCREMENTAL_RECALCULATION_ENABLED", not TEST, type_cast=str_to_bool
+)
+# How late person and event updates may reach ClickHouse, and still be picked up by the next incremental calculation
+COHORT_INCREMENTAL_RECALCULATION_LOOKBACK_SECONDS = get_from_env(
+    "COHORT_INCREMENTAL_RECALCULATION_LOOKBACK_SECONDS", 60 * 60, type_cast=int
+)
+# Every this many versions, cohorts are calculated from scratch anyway
+COHORT_FULL_RECALCULATION_EVERY_N_VERSIONS = get_from_env(
+    "COHORT_FULL_RECALCULATION_EVERY_N_VERSIONS", 24, type_cast=int
+)
 
 ACTION_EVENT_MAPPING_INTERVAL_SECONDS = get_from_env("ACTION_EVENT_MAPPING_INTERVAL_SECONDS", 300, type_cast=int)
 
@@ -33,6 +47,32 @@ BILLING_USAGE_CACHING_TTL = get_from_env("BILLING_USAGE_CACHING_TTL", 12 * 60 *
 CACHED_RESULTS_TTL = 7 * 24 * 60 * 60  # how long to keep cached results for
 SESSION_RECORDING_TTL = 30  # how long to keep session recording cache. Relatively short because cached result is used throughout the duration a session recording loads.
 
+# How long after an interval ends events can still arrive for it, before incremental trends treat it as final
+INCREMENTAL_TRENDS_INGESTION_LAG_SECONDS = get_from_env(
+    "INCREMENTAL_TRENDS_INGESTION_LAG_SECONDS", 2 * 60 * 60, type_cast=int
+)
+
+# Coalesce concurrent calculations of the same insight into one, see posthog/caching/single_flight.py
+SINGLE_FLIGHT_ENABLED = get_from_env("SINGLE_FLIGHT_ENABLED", not TEST, type_cast=str_to_bool)
+# How long a calculation may hold the lock for before others stop waiting for it
+SINGLE_FLIGHT_LOCK_TIMEOUT_SECONDS = get_from_env("SINGLE_FLIGHT_LOCK_TIMEOUT_SECONDS", 300, type_cast=int)
+# How long to wait for someone else's calculation before calculating the result ourselves
+SINGLE_FLIGHT_WAIT_TIMEOUT_SECONDS = get_from_env("SINGLE_FLIGHT_WAIT_TIMEOUT_SECONDS", 180, type_cast=int)
+# How long a finished calculation's result is handed out to waiters for
+SINGLE_FLIGHT_RESULT_TTL_SECONDS = get_from_env("SINGLE_FLIGHT_RESULT_TTL_SECONDS", 10, type_cast=int)
+
+# How many insight cache refreshes of a single team can be queued or running at once
+INSIGHT_CACHE_MAX_REFRESHES_PER_TEAM = get_from_env("INSIGHT_CACHE_MAX_REFRESHES_PER_TEAM", 10, type_cast=int)
+# Stop queueing insight cache refreshes while ClickHouse is running this many queries, 0 to never stop
+INSIGHT_CACHE_MAX_RUNNING_CLICKHOUSE_QUERIES = get_from_env(
+    "INSIGHT_CACHE_MAX_RUNNING_CLICKHOUSE_QUERIES", 100, type_cast=int
+)
+
+# Serve cached insight results older than this right away, and recalculate them in the background.
+# Teams can set how old a result may get before it isn't served at all with `Team.insight_cache_max_age_seconds`.
+STALE_WHILE_REVALIDATE_ENABLED = get_from_env("STALE_WHILE_REVALIDATE_ENABLED", not TEST, type_cast=str_to_bool)
+STALE_WHILE_REVALIDATE_AFTER_SECONDS = get_from_env("STALE_WHILE_REVALIDATE_AFTER_SECONDS", 6 * 60 * 60, type_cast=int)
+
 # Schedule to run asynchronous data deletion on. Follows crontab syntax.
 # Use empty string to prevent this
 CLEAR_CLICKHOUSE_REMOVED_DATA_SCHEDULE_CRON = get_from_env(
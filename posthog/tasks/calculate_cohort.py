@@ -1,48 +1,255 @@
+import json
 import time
-from typing import Any, Dict, List
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 import structlog
 from celery import shared_task
 from dateutil.relativedelta import relativedelta
 from django.conf import settings
-from django.db.models import F
+from django.db.models import (
+    BooleanField,
+    Case,
+    Count,
+    F,
+    Q,
+    QuerySet,
+    Value,
+    When,
+)
 from django.utils import timezone
+from statshog.defaults.django import statsd
 
 from posthog.models import Cohort
 from posthog.models.cohort import get_and_update_pending_version
+from posthog.tasks.cohorts_in_feature_flag import get_cohort_ids_in_feature_flags
 
 logger = structlog.get_logger(__name__)
 
 MAX_AGE_MINUTES = 15
+# How long a queued calculation counts as in flight, in case it never reports back
+CALCULATION_IN_FLIGHT_TIMEOUT = timedelta(hours=1)
+
+# A cohort to calculate, and the cohort with the same definition to copy its people from, if any
+CalculationStep = Tuple[Cohort, Optional[int]]
 
 
 def calculate_cohorts() -> None:
     # This task will be run every minute
     # Every minute, grab a few cohorts off the list and execute them
-    for cohort in (
+    picked = pick_cohorts_to_calculate(settings.CALCULATE_X_COHORTS_PARALLEL)
+    for steps in plan_cohort_calculations(picked):
+        queue_cohort_calculations(steps)
+
+
+def pick_cohorts_to_calculate(limit: int) -> List[Cohort]:
+    """
+    Picks the cohorts most due for calculation: the ones feature flags use first, then the ones calculated the longest
+    ago. Teams can't have more than COHORT_CALCULATION_MAX_IN_FLIGHT_PER_TEAM calculations in flight at once, so that
+    a team with many expensive cohorts can't hold up everyone else's.
+    """
+    current_time = timezone.now()
+    in_flight_by_team = Counter(
+        dict(
+            Cohort.objects.filter(_in_flight(current_time))
+            .values("team_id")
+            .annotate(in_flight=Count("id"))
+            .values_list("team_id", "in_flight")
+        )
+    )
+
+    picked: List[Cohort] = []
+    cohorts = (
+        _due_cohorts(current_time)
+        .annotate(
+            in_feature_flag=Case(
+                When(pk__in=get_cohort_ids_in_feature_flags(), then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField(),
+            )
+        )
+        .order_by(F("in_feature_flag").desc(), F("last_calculation").asc(nulls_first=True))
+    )
+    for cohort in cohorts.iterator():
+        if len(picked) >= limit:
+            break
+        if in_flight_by_team[cohort.team_id] >= settings.COHORT_CALCULATION_MAX_IN_FLIGHT_PER_TEAM:
+            continue
+        in_flight_by_team[cohort.team_id] += 1
+        picked.append(cohort)
+
+    return picked
+
+
+def plan_cohort_calculations(picked: List[Cohort]) -> List[List[CalculationStep]]:
+    """
+    Splits the calculation of the picked cohorts into lists of steps, each to be run in order, and independent of
+    each other.
+
+    Due cohorts that a picked one refers to are calculated before it, so that it's calculated from their fresh people.
+    Due cohorts of the same team defined the same way are calculated only once, the others copy their people over.
+    """
+    if not picked:
+        return []
+
+    due_by_id: Dict[int, Cohort] = {
+        cohort.pk: cohort for cohort in _due_cohorts(timezone.now()).filter(team_id__in={c.team_id for c in picked})
+    }
+    due_by_id.update({cohort.pk: cohort for cohort in picked})
+
+    to_calculate: Dict[int, Cohort] = {}
+    to_visit = [cohort.pk for cohort in picked]
+    while to_visit:
+        cohort_id = to_visit.pop()
+        if cohort_id in to_calculate or cohort_id not in due_by_id:
+            continue
+        to_calculate[cohort_id] = due_by_id[cohort_id]
+        to_visit.extend(_referenced_cohort_ids(due_by_id[cohort_id]))
+
+    source_by_definition: Dict[Tuple[int, str], int] = {}
+    source_cohort_ids: Dict[int, int] = {}
+    for cohort in sorted(to_calculate.values(), key=lambda cohort: cohort.pk):
+        definition = (cohort.team_id, _definition(cohort))
+        if definition in source_by_definition:
+            source_cohort_ids[cohort.pk] = source_by_definition[definition]
+        else:
+            source_by_definition[definition] = cohort.pk
+    for cohort in due_by_id.values():
+        definition = (cohort.team_id, _definition(cohort))
+        if cohort.pk not in to_calculate and definition in source_by_definition:
+            to_calculate[cohort.pk] = cohort
+            source_cohort_ids[cohort.pk] = source_by_definition[definition]
+
+    # Each step depends on the cohorts it refers to, and on the one it copies people from
+    dependencies: Dict[int, Set[int]] = {
+        cohort_id: {
+            *(referenced_id for referenced_id in _referenced_cohort_ids(cohort) if referenced_id in to_calculate),
+            *([source_cohort_ids[cohort_id]] if cohort_id in source_cohort_ids else []),
+        }
+        for cohort_id, cohort in to_calculate.items()
+    }
+
+    return [
+        [(to_calculate[cohort_id], source_cohort_ids.get(cohort_id)) for cohort_id in _topological_order(component)]
+        for component in _connected_components(dependencies)
+    ]
+
+
+def queue_cohort_calculations(steps: List[CalculationStep]) -> None:
+    Cohort.objects.filter(pk__in=[cohort.pk for cohort, _ in steps]).update(last_calculation_queued_at=timezone.now())
+    queued = [
+        (cohort.pk, get_and_update_pending_version(cohort), source_cohort_id) for cohort, source_cohort_id in steps
+    ]
+
+    statsd.incr("cohort_calculations_queued", len(steps))
+    statsd.incr("cohort_calculations_copied", sum(1 for _, source_cohort_id in steps if source_cohort_id is not None))
+    logger.info(
+        "cohort_calculations_queued",
+        cohort_ids=[cohort.pk for cohort, _ in steps],
+        expected_duration_ms=sum(cohort.last_calculation_duration_ms or 0 for cohort, _ in steps),
+    )
+    calculate_cohorts_in_order.delay(queued)
+
+
+def update_cohort(cohort: Cohort, incremental: bool = False) -> None:
+    pending_version = get_and_update_pending_version(cohort)
+    calculate_cohort_ch.delay(cohort.id, pending_version, incremental)
+
+
+def _due_cohorts(current_time: datetime) -> QuerySet:
+    return (
         Cohort.objects.filter(
             deleted=False,
             is_calculating=False,
-            last_calculation__lte=timezone.now() - relativedelta(minutes=MAX_AGE_MINUTES),
+            last_calculation__lte=current_time - relativedelta(minutes=MAX_AGE_MINUTES),
             errors_calculating__lte=20,
         )
         .exclude(is_static=True)
-        .order_by(F("last_calculation").asc(nulls_first=True))[0 : settings.CALCULATE_X_COHORTS_PARALLEL]
-    ):
+        .exclude(_in_flight(current_time))
+    )
 
-        cohort = Cohort.objects.filter(pk=cohort.pk).get()
-        update_cohort(cohort)
 
+def _in_flight(current_time: datetime) -> Q:
+    return Q(last_calculation_queued_at__gte=current_time - CALCULATION_IN_FLIGHT_TIMEOUT) & (
+        Q(last_calculation__isnull=True) | Q(last_calculation__lt=F("last_calculation_queued_at"))
+    )
 
-def update_cohort(cohort: Cohort) -> None:
-    pending_version = get_and_update_pending_version(cohort)
-    calculate_cohort_ch.delay(cohort.id, pending_version)
+
+def _definition(cohort: Cohort) -> str:
+    return json.dumps([cohort.filters, cohort.groups], sort_keys=True)
+
+
+def _referenced_cohort_ids(cohort: Cohort) -> Set[int]:
+    "Ids of the cohorts that the cohort's filters refer to, without going through the filters' parsing."
+    referenced_ids: Set[int] = set()
+    to_visit: List[Any] = [cohort.filters, cohort.groups]
+    while to_visit:
+        value = to_visit.pop()
+        if isinstance(value, dict):
+            if value.get("type") == "cohort":
+                try:
+                    referenced_ids.add(int(value["value"]))
+                except (KeyError, TypeError, ValueError):
+                    pass
+            to_visit.extend(value.values())
+        elif isinstance(value, list):
+            to_visit.extend(value)
+    referenced_ids.discard(cohort.pk)
+    return referenced_ids
+
+
+def _connected_components(dependencies: Dict[int, Set[int]]) -> List[Dict[int, Set[int]]]:
+    neighbours: Dict[int, Set[int]] = {cohort_id: set(depends_on) for cohort_id, depends_on in dependencies.items()}
+    for cohort_id, depends_on in dependencies.items():
+        for dependency_id in depends_on:
+            neighbours[dependency_id].add(cohort_id)
+
+    components: List[Dict[int, Set[int]]] = []
+    seen: Set[int] = set()
+    for cohort_id in sorted(dependencies):
+        if cohort_id in seen:
+            continue
+        component: Dict[int, Set[int]] = {}
+        to_visit = [cohort_id]
+        while to_visit:
+            current_id = to_visit.pop()
+            if current_id in seen:
+                continue
+            seen.add(current_id)
+            component[current_id] = dependencies[current_id]
+            to_visit.extend(neighbours[current_id])
+        components.append(component)
+    return components
+
+
+def _topological_order(dependencies: Dict[int, Set[int]]) -> List[int]:
+    "Orders cohorts after the ones they depend on. Cycles can't be saved, but would go last rather than be dropped."
+    remaining = {cohort_id: set(depends_on) for cohort_id, depends_on in dependencies.items()}
+    order: List[int] = []
+    while remaining:
+        ready = sorted(cohort_id for cohort_id, depends_on in remaining.items() if not depends_on) or sorted(remaining)
+        for cohort_id in ready:
+            order.append(cohort_id)
+            del remaining[cohort_id]
+        for depends_on in remaining.values():
+            depends_on.difference_update(ready)
+    return order
+
+
+@shared_task(ignore_result=True, max_retries=2)
+def calculate_cohorts_in_order(steps: List[Tuple[int, int, Optional[int]]]) -> None:
+    "Calculates cohorts one after the other, as planned by `plan_cohort_calculations`. Stops at the first failure."
+    for cohort_id, pending_version, source_cohort_id in steps:
+        cohort: Cohort = Cohort.objects.get(pk=cohort_id)
+        # Filters of these cohorts haven't changed since they were last calculated, or they'd be calculating already
+        cohort.calculate_people_ch(pending_version, incremental=True, source_cohort_id=source_cohort_id)
 
 
 @shared_task(ignore_result=True, max_retries=2)
-def calculate_cohort_ch(cohort_id: int, pending_version: int) -> None:
+def calculate_cohort_ch(cohort_id: int, pending_version: int, incremental: bool = False) -> None:
     cohort: Cohort = Cohort.objects.get(pk=cohort_id)
-    cohort.calculate_people_ch(pending_version)
+    cohort.calculate_people_ch(pending_version, incremental=incremental)
 
 
 @shared_task(ignore_result=True, max_retries=1)
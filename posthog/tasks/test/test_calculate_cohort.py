@@ -1,6 +1,8 @@
+from datetime import timedelta
 from typing import Callable
 from unittest.mock import MagicMock, patch
 
+from django.utils import timezone
 from freezegun import freeze_time
 
 from posthog.models.cohort import Cohort
@@ -97,4 +99,62 @@ def calculate_cohort_test_factory(event_factory: Callable, person_factory: Calla
 
             calculate_cohorts()
 
+        @patch("posthog.tasks.calculate_cohort.calculate_cohorts_in_order.delay")
+        def test_calculate_cohorts_in_dependency_order(self, calculate_cohorts_in_order: MagicMock) -> None:
+            last_calculation = timezone.now() - timedelta(hours=1)
+            properties = [{"key": "$some_prop", "value": "something", "type": "person"}]
+            base = Cohort.objects.create(
+                team=self.team,
+                filters={"properties": {"type": "AND", "values": properties}},
+                last_calculation=last_calculation,
+            )
+            # Picked first, along with the cohort it refers to
+            dependent = Cohort.objects.create(
+                team=self.team,
+                filters={"properties": {"type": "AND", "values": [{"key": "id", "value": base.pk, "type": "cohort"}]}},
+                last_calculation=last_calculation - timedelta(hours=1),
+            )
+            duplicate = Cohort.objects.create(
+                team=self.team,
+                filters={"properties": {"type": "AND", "values": properties}},
+                last_calculation=last_calculation,
+            )
+
+            with self.settings(CALCULATE_X_COHORTS_PARALLEL=1):
+                calculate_cohorts()
+
+            calculate_cohorts_in_order.assert_called_once()
+            steps = calculate_cohorts_in_order.call_args[0][0]
+            self.assertEqual(
+                [(cohort_id, source_cohort_id) for cohort_id, _, source_cohort_id in steps],
+                [(base.pk, None), (dependent.pk, None), (duplicate.pk, base.pk)],
+            )
+            self.assertEqual(
+                Cohort.objects.filter(last_calculation_queued_at__isnull=False, pending_version__isnull=False).count(),
+                3,
+            )
+
+            # Everything is in flight now
+            calculate_cohorts()
+            calculate_cohorts_in_order.assert_called_once()
+
+        @patch("posthog.tasks.calculate_cohort.calculate_cohorts_in_order.delay")
+        def test_calculate_cohorts_keeps_to_team_budget(self, calculate_cohorts_in_order: MagicMock) -> None:
+            last_calculation = timezone.now() - timedelta(hours=1)
+            for value in range(3):
+                Cohort.objects.create(
+                    team=self.team,
+                    filters={
+                        "properties": {"type": "AND", "values": [{"key": "prop", "value": value, "type": "person"}]}
+                    },
+                    last_calculation=last_calculation,
+                )
+
+            with self.settings(COHORT_CALCULATION_MAX_IN_FLIGHT_PER_TEAM=2):
+                calculate_cohorts()
+                self.assertEqual(calculate_cohorts_in_order.call_count, 2)
+
+                calculate_cohorts()
+                self.assertEqual(calculate_cohorts_in_order.call_count, 2)
+
     return TestCalculateCohort
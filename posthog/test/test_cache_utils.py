@@ -2,7 +2,9 @@ from datetime import timedelta
 from typing import Optional
 from unittest.mock import Mock
 
-from posthog.cache_utils import cache_for
+from freezegun import freeze_time
+
+from posthog.cache_utils import LocalTTLCache, cache_for
 from posthog.test.base import APIBaseTest
 
 mocked_dependency = Mock()
@@ -33,3 +35,37 @@ class TestCacheUtils(APIBaseTest):
 
         # cache treats test_func(2) and test_func(number=2) as two different calls
         assert mocked_dependency.call_count == 2
+
+
+class TestLocalTTLCache(APIBaseTest):
+    def test_evicts_least_recently_used_entry_when_full(self) -> None:
+        cache = LocalTTLCache(max_size=2, ttl_seconds=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        assert cache.get("a") == 1
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+
+    def test_expires_entries_after_ttl(self) -> None:
+        cache = LocalTTLCache(max_size=2, ttl_seconds=60)
+        with freeze_time("2022-01-01T00:00:00") as frozen_time:
+            cache.set("a", 1)
+            frozen_time.tick(delta=timedelta(seconds=61))
+
+            assert cache.get("a", "default") == "default"
+            assert len(cache) == 0
+
+    def test_delete_where(self) -> None:
+        cache = LocalTTLCache(max_size=10, ttl_seconds=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.set("c", 1)
+
+        cache.delete_where(lambda key, value: value == 1)
+
+        assert cache.get("a") is None
+        assert cache.get("b") == 2
+        assert cache.get("c") is None
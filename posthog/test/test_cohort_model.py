@@ -1,10 +1,11 @@
 from unittest.mock import patch
 
 import pytest
+from django.db import connection
 
 from posthog.client import sync_execute
 from posthog.models import Cohort, FeatureFlag, Person, Team
-from posthog.models.cohort import CohortPeople, batch_delete_cohort_people
+from posthog.models.cohort import CohortPeople, batch_delete_cohort_people, copy_cohort_people
 from posthog.models.cohort.sql import GET_COHORTPEOPLE_BY_COHORT_ID
 from posthog.test.base import BaseTest
 
@@ -97,6 +98,21 @@ class TestCohort(BaseTest):
         batch_delete_cohort_people(cohort_id=cohort.pk, version=1, batch_size=1)
         self.assertEqual(CohortPeople.objects.count(), 0)
 
+    def test_copy_cohort_people(self):
+        person1 = Person.objects.create(team=self.team, distinct_ids=["1"])
+        person2 = Person.objects.create(team=self.team, distinct_ids=["2"])
+        cohort = Cohort.objects.create(team=self.team, groups=[], is_static=True)
+
+        with connection.cursor() as cursor:
+            self.assertEqual(copy_cohort_people(cursor, cohort.pk, 3, [person1.pk, person2.pk]), 2)
+            self.assertEqual(copy_cohort_people(cursor, cohort.pk, None, [person1.pk]), 1)
+            self.assertEqual(copy_cohort_people(cursor, cohort.pk, 3, []), 0)
+
+        self.assertCountEqual(
+            CohortPeople.objects.filter(cohort=cohort).values_list("person_id", "version"),
+            [(person1.pk, 3), (person2.pk, 3), (person1.pk, None)],
+        )
+
     def test_group_to_property_conversion(self):
         cohort = Cohort.objects.create(
             team=self.team,
@@ -0,0 +1,94 @@
+from django.test import override_settings
+from django.test.client import RequestFactory
+
+from posthog.models import Plugin, PluginConfig, PluginSourceFile
+from posthog.models.team import CachedTeam
+from posthog.models.team.decide_config import HostnameMatcher, _decide_static_configs, get_decide_static_config
+from posthog.redis import get_client
+
+from .base import BaseTest
+
+
+class TestHostnameMatcher(BaseTest):
+    def test_matches_exact_and_wildcard_hostnames(self):
+        matcher = HostnameMatcher(["https://example.com", "https://*.posthog.com", "not a url"])
+
+        self.assertTrue(matcher.matches("example.com"))
+        self.assertTrue(matcher.matches("app.posthog.com"))
+        self.assertTrue(matcher.matches("localhost"))
+        self.assertFalse(matcher.matches("posthog.com"))
+        self.assertFalse(matcher.matches("example.com.evil.com"))
+        self.assertFalse(matcher.matches(None))
+
+
+@override_settings(DECIDE_STATIC_CONFIG_CACHE_ENABLED=True)
+class TestDecideStaticConfig(BaseTest):
+    def setUp(self):
+        super().setUp()
+        _decide_static_configs.clear()
+        get_client().flushdb()
+
+    def _create_site_app(self) -> PluginConfig:
+        plugin = Plugin.objects.create(organization=self.team.organization, name="My Plugin", plugin_type="source")
+        PluginSourceFile.objects.create(
+            plugin=plugin,
+            filename="site.ts",
+            source="export function inject (){}",
+            transpiled="function inject(){}",
+            status=PluginSourceFile.Status.TRANSPILED,
+        )
+        return PluginConfig.objects.create(
+            plugin=plugin, enabled=True, order=1, team=self.team, config={}, web_token="tokentoken"
+        )
+
+    def test_session_recording_for_permitted_domains(self):
+        self.team.session_recording_opt_in = True
+        self.team.recording_domains = ["https://*.example.com"]
+        self.team.save()
+
+        config = get_decide_static_config(CachedTeam.from_team(self.team))
+
+        permitted_request = RequestFactory().post("/decide/", HTTP_ORIGIN="https://app.example.com")
+        other_request = RequestFactory().post("/decide/", HTTP_REFERER="https://other.com/page")
+        self.assertEqual(
+            config.session_recording_for(permitted_request), {"endpoint": "/s/", "consoleLogRecordingEnabled": False}
+        )
+        self.assertFalse(config.session_recording_for(other_request))
+
+    def test_caches_site_apps(self):
+        self._create_site_app()
+        self.team.refresh_from_db()
+        team = CachedTeam.from_team(self.team)
+
+        with self.assertNumQueries(1):
+            config = get_decide_static_config(team)
+        self.assertEqual(len(config.site_apps), 1)
+
+        with self.assertNumQueries(0):
+            self.assertIs(get_decide_static_config(team), config)
+
+        # Other processes get site apps from Redis
+        _decide_static_configs.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_decide_static_config(team).site_apps, config.site_apps)
+
+    def test_team_changes_rebuild_config(self):
+        team = CachedTeam.from_team(self.team)
+        self.assertFalse(get_decide_static_config(team).session_recording)
+
+        self.team.session_recording_opt_in = True
+        self.team.save()
+
+        self.assertTrue(get_decide_static_config(CachedTeam.from_team(self.team)).session_recording)
+
+    def test_plugin_config_changes_invalidate_site_apps(self):
+        plugin_config = self._create_site_app()
+        self.team.refresh_from_db()
+        team = CachedTeam.from_team(self.team)
+        self.assertEqual(len(get_decide_static_config(team).site_apps), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            plugin_config.enabled = False
+            plugin_config.save()
+
+        self.assertEqual(len(get_decide_static_config(team).site_apps), 0)
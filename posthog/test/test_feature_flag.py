@@ -1,20 +1,28 @@
+import hashlib
 from typing import cast
+from unittest.mock import patch
 
 from django.db import connection
+from django.test import override_settings
 from django.utils import timezone
 
 from posthog.models import Cohort, FeatureFlag, GroupTypeMapping, Person
+from posthog.models.cohort import CohortPeople
 from posthog.models.feature_flag import (
     FeatureFlagHashKeyOverride,
     FeatureFlagMatch,
     FeatureFlagMatcher,
     FeatureFlagMatchReason,
     FlagsMatcherCache,
+    _feature_flag_definitions,
+    _person_flag_properties,
     get_active_feature_flags,
+    get_active_feature_flags_for_team,
     hash_key_overrides,
     set_feature_flag_hash_key_overrides,
 )
 from posthog.models.group import Group
+from posthog.redis import get_client
 from posthog.test.base import BaseTest, QueryMatchingTest, snapshot_postgres_queries
 
 
@@ -1484,6 +1492,200 @@ class TestFeatureFlagMatcher(BaseTest, QueryMatchingTest):
         return FeatureFlag.objects.create(team=self.team, name="Beta feature", key=key, created_by=self.user, **kwargs)
 
 
+class TestCompiledFeatureFlag(BaseTest):
+    def create_feature_flag(self, key="beta-feature", **kwargs):
+        return FeatureFlag.objects.create(team=self.team, name="Beta feature", key=key, created_by=self.user, **kwargs)
+
+    def test_compile_sorts_conditions_and_computes_variant_boundaries(self):
+        feature_flag = self.create_feature_flag(
+            filters={
+                "groups": [
+                    {"properties": [{"key": "email", "value": "tim@posthog.com", "type": "person"}]},
+                    {"rollout_percentage": 50, "variant": "second-variant"},
+                    {"rollout_percentage": 50, "variant": "no-such-variant"},
+                ],
+                "multivariate": {
+                    "variants": [
+                        {"key": "first-variant", "rollout_percentage": 25},
+                        {"key": "second-variant", "rollout_percentage": 75},
+                    ]
+                },
+            }
+        )
+
+        compiled_flag = feature_flag.compile()
+
+        self.assertEqual([condition.index for condition in compiled_flag.evaluation_order], [1, 2, 0])
+        self.assertEqual(compiled_flag.conditions[0].properties[0].key, "email")
+        self.assertEqual(compiled_flag.conditions[1].variant_override, "second-variant")
+        self.assertEqual(compiled_flag.conditions[2].variant_override, None)
+        self.assertEqual(
+            [(variant.key, variant.value_min, variant.value_max) for variant in compiled_flag.variants],
+            [("first-variant", 0, 0.25), ("second-variant", 0.25, 1)],
+        )
+        self.assertEqual(compiled_flag.get_variant(0.1), "first-variant")
+        self.assertEqual(compiled_flag.get_variant(0.9), "second-variant")
+
+    def test_compile_is_cached_until_flag_changes(self):
+        feature_flag = self.create_feature_flag(filters={"groups": [{"rollout_percentage": 50}]})
+
+        compiled_flag = feature_flag.compile()
+        self.assertIs(FeatureFlag.objects.get(pk=feature_flag.pk).compile(), compiled_flag)
+
+        feature_flag.filters = {"groups": [{"rollout_percentage": 20}]}
+        feature_flag.save()
+
+        recompiled_flag = FeatureFlag.objects.get(pk=feature_flag.pk).compile()
+        self.assertIsNot(recompiled_flag, compiled_flag)
+        self.assertEqual(recompiled_flag.conditions[0].rollout_percentage, 20)
+
+    def test_compile_is_memoized_on_the_instance(self):
+        feature_flag = self.create_feature_flag(filters={"groups": [{"rollout_percentage": 50}]})
+        compiled_flag = feature_flag.compile()
+
+        with patch.object(FeatureFlag, "get_filters") as mock_get_filters:
+            self.assertIs(feature_flag.compile(), compiled_flag)
+            mock_get_filters.assert_not_called()
+
+        feature_flag.filters = {"groups": [{"rollout_percentage": 20}]}
+        self.assertEqual(feature_flag.compile().conditions[0].rollout_percentage, 20)
+
+    def test_compiled_hash_matches_legacy_hash(self):
+        feature_flag = self.create_feature_flag()
+
+        self.assertAlmostEqual(
+            feature_flag.compile().get_hash("some_distinct_id", "variant"),
+            int(hashlib.sha1(b"beta-feature.some_distinct_idvariant").hexdigest()[:15], 16) / float(0xFFFFFFFFFFFFFFF),
+        )
+
+
+@override_settings(FEATURE_FLAG_DEFINITIONS_CACHE_ENABLED=True)
+class TestActiveFeatureFlagsForTeamCache(BaseTest):
+    def setUp(self):
+        super().setUp()
+        get_client().flushdb()
+        _feature_flag_definitions.clear()
+
+    def create_feature_flag(self, key="beta-feature", **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return FeatureFlag.objects.create(
+                team=self.team, name="Beta feature", key=key, created_by=self.user, **kwargs
+            )
+
+    def test_definitions_are_cached_in_memory_and_redis(self):
+        self.create_feature_flag(filters={"groups": [{"rollout_percentage": 50}]})
+
+        with self.assertNumQueries(1):
+            self.assertEqual([flag.key for flag in get_active_feature_flags_for_team(self.team.pk)], ["beta-feature"])
+        with self.assertNumQueries(0):
+            self.assertEqual([flag.key for flag in get_active_feature_flags_for_team(self.team.pk)], ["beta-feature"])
+
+        _feature_flag_definitions.clear()
+        with self.assertNumQueries(0):
+            flags = get_active_feature_flags_for_team(self.team.pk)
+        self.assertEqual(flags[0].filters, {"groups": [{"rollout_percentage": 50}]})
+        self.assertEqual(flags[0].team_id, self.team.pk)
+
+    def test_flag_changes_bump_version(self):
+        feature_flag = self.create_feature_flag()
+        get_active_feature_flags_for_team(self.team.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            feature_flag.active = False
+            feature_flag.save()
+        self.assertEqual(get_active_feature_flags_for_team(self.team.pk), [])
+
+        self.create_feature_flag(key="another-feature")
+        self.assertEqual([flag.key for flag in get_active_feature_flags_for_team(self.team.pk)], ["another-feature"])
+
+    def test_evaluating_flags_from_cache(self):
+        self.create_feature_flag()
+        get_active_feature_flags(self.team.pk, "example_id")
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_active_feature_flags(self.team.pk, "example_id")[0], {"beta-feature": True})
+
+
+class TestFeatureFlagLocalPropertyEvaluation(BaseTest):
+    def setUp(self):
+        super().setUp()
+        _person_flag_properties.clear()
+
+    def create_feature_flag(self, key, properties, **kwargs):
+        return FeatureFlag.objects.create(
+            team=self.team,
+            key=key,
+            created_by=self.user,
+            filters={"groups": [{"properties": properties}]},
+            **kwargs,
+        )
+
+    def test_local_evaluation_matches_query_evaluation(self):
+        Person.objects.create(
+            team=self.team, distinct_ids=["example_id"], properties={"email": "tim@posthog.com", "plan": None}
+        )
+        cohort = Cohort.objects.create(team=self.team, name="cohort", version=2)
+        person = Person.objects.get(persondistinctid__distinct_id="example_id")
+        CohortPeople.objects.create(cohort=cohort, person=person, version=2)
+        stale_cohort = Cohort.objects.create(team=self.team, name="stale cohort", version=3)
+        CohortPeople.objects.create(cohort=stale_cohort, person=person, version=2)
+
+        feature_flags = [
+            self.create_feature_flag("exact", [{"key": "email", "value": "tim@posthog.com", "type": "person"}]),
+            self.create_feature_flag(
+                "regex", [{"key": "email", "value": "@posthog\\.com$", "operator": "regex", "type": "person"}]
+            ),
+            self.create_feature_flag(
+                "not-icontains", [{"key": "email", "value": "example", "operator": "not_icontains", "type": "person"}]
+            ),
+            self.create_feature_flag(
+                "is-not-set", [{"key": "name", "value": "is_not_set", "operator": "is_not_set", "type": "person"}]
+            ),
+            self.create_feature_flag(
+                "is-set", [{"key": "plan", "value": "is_set", "operator": "is_set", "type": "person"}]
+            ),
+            self.create_feature_flag(
+                "missing-key", [{"key": "name", "value": "tim", "operator": "icontains", "type": "person"}]
+            ),
+            self.create_feature_flag("cohort", [{"key": "id", "value": cohort.pk, "type": "cohort"}]),
+            self.create_feature_flag("stale-cohort", [{"key": "id", "value": stale_cohort.pk, "type": "cohort"}]),
+        ]
+
+        for distinct_id in ["example_id", "unknown_id"]:
+            with self.settings(FEATURE_FLAG_LOCAL_PROPERTY_EVALUATION=False):
+                expected = FeatureFlagMatcher(feature_flags, distinct_id).get_matches()
+            with self.settings(FEATURE_FLAG_LOCAL_PROPERTY_EVALUATION=True):
+                self.assertEqual(FeatureFlagMatcher(feature_flags, distinct_id).get_matches(), expected)
+
+            if distinct_id == "example_id":
+                self.assertEqual(
+                    set(expected[0].keys()), {"exact", "regex", "not-icontains", "is-not-set", "is-set", "cohort"}
+                )
+            else:
+                self.assertEqual(expected[0], {})
+
+    @override_settings(FEATURE_FLAG_LOCAL_PROPERTY_EVALUATION=True)
+    def test_local_evaluation_uses_overrides_and_caches_properties(self):
+        Person.objects.create(team=self.team, distinct_ids=["example_id"], properties={"email": "tim@posthog.com"})
+        feature_flags = [
+            self.create_feature_flag(f"flag-{i}", [{"key": "email", "value": "tim@posthog.com", "type": "person"}])
+            for i in range(5)
+        ]
+
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                FeatureFlagMatcher(feature_flags, "example_id").get_matches()[0],
+                {f"flag-{i}": True for i in range(5)},
+            )
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                FeatureFlagMatcher(
+                    feature_flags, "example_id", property_value_overrides={"email": "tom@posthog.com"}
+                ).get_matches()[0],
+                {},
+            )
+
+
 class TestFeatureFlagHashKeyOverrides(BaseTest, QueryMatchingTest):
 
     person: Person
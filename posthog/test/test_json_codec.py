@@ -0,0 +1,55 @@
+import json
+from datetime import datetime
+from unittest import skipIf
+
+from django.test import SimpleTestCase, override_settings
+
+from posthog import json_codec
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+PAYLOADS = [
+    {"event": "$pageview", "properties": {"$current_url": "https://posthog.com", "$screen_width": 1920}},
+    {"unicode": "zażółć gęślą jaźń 😀", "nested": [1, 2.5, None, True, {"a": []}], "big": 2**63 - 1},
+    [["2022-01-01", 1, 0.1], ["2022-01-02", 2, 1e16]],
+    "a string",
+    12,
+]
+
+
+class TestJSONCodec(SimpleTestCase):
+    @override_settings(JSON_CODEC_BACKEND="stdlib")
+    def test_stdlib_backend_matches_json_module_byte_for_byte(self):
+        for payload in [*PAYLOADS, {"nan": float("nan")}, {"surrogate": "\ud800"}]:
+            self.assertEqual(json_codec.dumps(payload), json.dumps(payload))
+            self.assertEqual(json_codec.dumps_bytes(payload), json.dumps(payload).encode("utf-8"))
+            self.assertEqual(json_codec.dumps(payload, sort_keys=True), json.dumps(payload, sort_keys=True))
+
+    @skipIf(orjson is None, "orjson is not installed")
+    @override_settings(JSON_CODEC_BACKEND="orjson")
+    def test_orjson_backend_decodes_to_the_same_values(self):
+        for payload in PAYLOADS:
+            self.assertEqual(json.loads(json_codec.dumps_bytes(payload)), json.loads(json.dumps(payload)))
+            self.assertEqual(json_codec.loads(json.dumps(payload)), payload)
+
+    @skipIf(orjson is None, "orjson is not installed")
+    @override_settings(JSON_CODEC_BACKEND="orjson")
+    def test_orjson_backend_falls_back_to_stdlib(self):
+        # Lone surrogates, integers over 64 bits and non-string keys are all rejected by orjson
+        for payload in [{"surrogate": "\ud800"}, {"huge": 2**70}, {1: "non-string key"}]:
+            self.assertEqual(json_codec.dumps(payload), json.dumps(payload))
+        # NaN literals written by the standard library can still be read back
+        self.assertEqual(json_codec.loads(b"[1, NaN]")[0], 1)
+
+    def test_unserializable_values_raise_like_stdlib(self):
+        for backend in ["stdlib", "auto"]:
+            with override_settings(JSON_CODEC_BACKEND=backend):
+                with self.assertRaises(TypeError):
+                    json_codec.dumps({"timestamp": datetime(2022, 1, 1)})
+                self.assertEqual(
+                    json.loads(json_codec.dumps({"timestamp": datetime(2022, 1, 1)}, default=str)),
+                    {"timestamp": "2022-01-01 00:00:00"},
+                )
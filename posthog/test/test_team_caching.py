@@ -0,0 +1,71 @@
+from django.test import override_settings
+
+from posthog.models import Team
+from posthog.models.team.team_caching import CachedTeam, _local_cache, get_cached_team_for_token
+from posthog.redis import get_client
+
+from .base import BaseTest
+
+
+@override_settings(TEAM_TOKEN_CACHE_ENABLED=True)
+class TestTeamCaching(BaseTest):
+    def setUp(self):
+        super().setUp()
+        _local_cache.clear()
+        get_client().flushdb()
+
+    def test_caches_team_for_token(self):
+        with self.assertNumQueries(1):
+            cached_team = get_cached_team_for_token(self.team.api_token)
+        assert cached_team == CachedTeam.from_team(self.team)
+
+        with self.assertNumQueries(0):
+            assert get_cached_team_for_token(self.team.api_token) == cached_team
+
+    def test_falls_back_to_redis(self):
+        get_cached_team_for_token(self.team.api_token)
+        _local_cache.clear()
+
+        with self.assertNumQueries(0):
+            cached_team = get_cached_team_for_token(self.team.api_token)
+        assert cached_team is not None
+        assert cached_team.id == self.team.pk
+
+    def test_unknown_token_is_not_cached(self):
+        with self.assertNumQueries(1):
+            assert get_cached_team_for_token("not-a-token") is None
+        with self.assertNumQueries(1):
+            assert get_cached_team_for_token("not-a-token") is None
+
+    def test_team_save_invalidates_cache(self):
+        get_cached_team_for_token(self.team.api_token)
+
+        self.team.anonymize_ips = True
+        with self.captureOnCommitCallbacks(execute=True):
+            self.team.save()
+
+        cached_team = get_cached_team_for_token(self.team.api_token)
+        assert cached_team is not None
+        assert cached_team.anonymize_ips
+
+    def test_reset_token_stops_resolving_old_token(self):
+        old_token = self.team.api_token
+        get_cached_team_for_token(old_token)
+
+        self.team.api_token = "phc_a_brand_new_token"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.team.save()
+
+        assert get_cached_team_for_token(old_token) is None
+        cached_team = get_cached_team_for_token("phc_a_brand_new_token")
+        assert cached_team is not None
+        assert cached_team.id == self.team.pk
+
+    def test_team_delete_invalidates_cache(self):
+        team = Team.objects.create(organization=self.organization)
+        get_cached_team_for_token(team.api_token)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            team.delete()
+
+        assert get_cached_team_for_token(team.api_token) is None
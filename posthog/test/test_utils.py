@@ -1,10 +1,13 @@
+import base64
+import gzip
+import json
 from datetime import datetime
 from unittest.mock import call, patch
 
 import pytest
 from django.core.handlers.wsgi import WSGIRequest
 from django.http import HttpRequest
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.test.client import RequestFactory
 from freezegun import freeze_time
 from rest_framework.request import Request
@@ -17,11 +20,13 @@ from posthog.test.base import BaseTest
 from posthog.utils import (
     PotentialSecurityProblemException,
     absolute_uri,
+    decompress_stream,
     format_query_params_absolute_url,
     get_available_timezones_with_offsets,
     get_compare_period_dates,
     get_default_event_name,
     load_data_from_request,
+    load_json_stream,
     relative_date_parse,
     should_refresh,
 )
@@ -303,6 +308,54 @@ class TestLoadDataFromRequest(TestCase):
         self.assertEqual({"what is it": "the decompressed value"}, data)
 
 
+@override_settings(CAPTURE_STREAMING_DECODE_MIN_BYTES=0)
+class TestStreamingLoadDataFromRequest(TestCase):
+    def _post(self, body: bytes, path: str = "/batch/", **headers) -> WSGIRequest:
+        return RequestFactory().generic("POST", path, body, content_type="application/json", **headers)
+
+    def test_streams_gzipped_batch(self):
+        data = {"api_key": "token", "batch": [{"event": f"event {i}", "properties": {"i": i}} for i in range(1000)]}
+
+        post_request = self._post(gzip.compress(json.dumps(data).encode()), HTTP_CONTENT_ENCODING="gzip")
+
+        with patch("posthog.utils.decompress") as patched_decompress:
+            self.assertEqual(load_data_from_request(post_request), data)
+        patched_decompress.assert_not_called()
+
+    def test_streams_uncompressed_and_unflagged_gzip_bodies(self):
+        data = [{"event": "$pageview", "properties": {"$current_url": "https://posthog.com/😀", "value": float("nan")}}]
+        body = json.dumps(data).encode()
+
+        for post_request in [self._post(body), self._post(gzip.compress(body))]:
+            self.assertEqual(
+                load_data_from_request(post_request),
+                [{"event": "$pageview", "properties": {"$current_url": "https://posthog.com/😀", "value": None}}],
+            )
+
+    def test_falls_back_to_in_memory_decoding_for_base64_bodies(self):
+        body = base64.b64encode(json.dumps({"event": "$pageview"}).encode())
+
+        self.assertEqual(load_data_from_request(self._post(body)), {"event": "$pageview"})
+
+    def test_raises_request_parsing_error_for_invalid_streamed_bodies(self):
+        for body, headers in [
+            (b'[{"event": "$pageview"},', {}),
+            (gzip.compress(b'[{"event": "$pageview"}]')[:-8], {"HTTP_CONTENT_ENCODING": "gzip"}),
+        ]:
+            with self.assertRaises(RequestParsingError):
+                load_data_from_request(self._post(body, **headers))
+
+    def test_decodes_values_split_across_chunks(self):
+        chunks = [b'{"batch": [{"ev', b'ent": "a"}, 12', b"34, 5.", b'6], "sent_at": "now"}']
+
+        self.assertEqual(load_json_stream(chunks), {"batch": [{"event": "a"}, 1234, 5.6], "sent_at": "now"})
+
+    def test_decompresses_multiple_gzip_members(self):
+        chunks = [gzip.compress(b"[1, "), gzip.compress(b"2]")]
+
+        self.assertEqual(load_json_stream(decompress_stream(chunks, "gzip")), [1, 2])
+
+
 class TestShouldRefresh(TestCase):
     def test_should_refresh_with_refresh_true(self):
         request = HttpRequest()
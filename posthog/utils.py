@@ -1,9 +1,11 @@
 import base64
+import codecs
 import dataclasses
 import datetime
 import datetime as dt
 import gzip
 import hashlib
+import itertools
 import json
 import os
 import re
@@ -19,6 +21,8 @@ from typing import (
     Any,
     Dict,
     Generator,
+    Iterable,
+    Iterator,
     List,
     Mapping,
     Optional,
@@ -36,7 +40,6 @@ from celery.schedules import crontab
 from dateutil import parser
 from dateutil.relativedelta import relativedelta
 from django.conf import settings
-from django.core.cache import cache
 from django.db.utils import DatabaseError
 from django.http import HttpRequest, HttpResponse
 from django.template.loader import get_template
@@ -610,16 +613,204 @@ def decompress(data: Any, compression: str):
     return data
 
 
+STREAMING_DECODE_CHUNK_SIZE = 64 * 1024
+GZIP_MAGIC_BYTES = b"\x1f\x8b"
+
+
+def _should_stream_request_body(request, compression: str) -> bool:
+    if compression not in ("", "gzip", "gzip-js") or hasattr(request, "_body"):
+        return False
+    try:
+        content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        return False
+    # Bodies over DATA_UPLOAD_MAX_MEMORY_SIZE go through `request.body`, which rejects them like before
+    return settings.CAPTURE_STREAMING_DECODE_MIN_BYTES <= content_length <= settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+
+
+def _read_chunks(stream) -> Iterator[bytes]:
+    return iter(lambda: stream.read(STREAMING_DECODE_CHUNK_SIZE), b"")
+
+
+def _looks_like_json_or_gzip(first_chunk: bytes) -> bool:
+    return first_chunk.startswith(GZIP_MAGIC_BYTES) or first_chunk.lstrip()[:1] in (b"[", b"{")
+
+
+def decompress_stream(chunks: Iterable[bytes], compression: str) -> Iterator[bytes]:
+    """
+    Streaming counterpart of the gzip step in `decompress`, so that a large body is never held decompressed in
+    full. As in `decompress`, uncompressed bodies that turn out to be gzipped are decompressed anyway.
+    """
+    chunks = iter(chunks)
+    first_chunk = b""
+    for chunk in chunks:
+        first_chunk += chunk
+        if len(first_chunk) >= len(GZIP_MAGIC_BYTES):
+            break
+    if compression == "" and not first_chunk.startswith(GZIP_MAGIC_BYTES):
+        yield first_chunk
+        yield from chunks
+        return
+
+    if first_chunk == b"undefined":
+        raise RequestParsingError(
+            "data being loaded from the request body for decompression is the literal string 'undefined'"
+        )
+
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        for chunk in itertools.chain([first_chunk], chunks):
+            while chunk:
+                yield decompressor.decompress(chunk)
+                # A body can consist of several gzip members, each needs a fresh decompressor
+                chunk = decompressor.unused_data
+                if chunk:
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if not decompressor.eof:
+            raise EOFError("Compressed file ended before the end-of-stream marker was reached")
+        yield decompressor.flush()
+    except (EOFError, zlib.error) as error:
+        raise RequestParsingError("Failed to decompress data. %s" % (str(error)))
+
+
+class _StreamingJSONParser:
+    """
+    Parses a JSON document from an iterable of byte chunks, keeping only a window of the text in memory. Items of
+    the top level array (or of arrays one level inside a top level object, like `{"batch": [...]}`) are decoded one
+    at a time with `JSONDecoder.raw_decode`, so an entire body is never held as a single string.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        # parse_constant gets called in case of NaN, Infinity etc, which we want to be None, like in `decompress`
+        self._json_decoder = json.JSONDecoder(parse_constant=lambda x: None)
+        self._buffer = ""
+        self._position = 0
+        self._exhausted = False
+
+    def parse(self) -> Any:
+        if self._peek() == "":
+            raise RequestParsingError("Invalid JSON: empty body")
+        if self._peek() == "{":
+            value: Any = self._parse_object()
+        elif self._peek() == "[":
+            value = list(self.iter_array())
+        else:
+            value = self._decode_value()
+        if self._peek() != "":
+            raise RequestParsingError("Invalid JSON: extra data after the end of the document")
+        return value
+
+    def iter_array(self) -> Iterator[Any]:
+        self._expect("[")
+        if self._peek() == "]":
+            self._position += 1
+            return
+        while True:
+            yield self._decode_value()
+            if self._peek() == "]":
+                self._position += 1
+                return
+            self._expect(",")
+
+    def _parse_object(self) -> Dict[str, Any]:
+        value: Dict[str, Any] = {}
+        self._expect("{")
+        if self._peek() == "}":
+            self._position += 1
+            return value
+        while True:
+            if self._peek() != '"':
+                raise RequestParsingError("Invalid JSON: expected an object key")
+            key = self._decode_value()
+            self._expect(":")
+            value[key] = list(self.iter_array()) if self._peek() == "[" else self._decode_value()
+            if self._peek() == "}":
+                self._position += 1
+                return value
+            self._expect(",")
+
+    def _decode_value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = self._json_decoder.raw_decode(self._buffer, self._position)
+                # A number at the very end of the window could continue in the next chunk
+                if end < len(self._buffer) or self._exhausted:
+                    self._position = end
+                    return value
+            except json.JSONDecodeError as error:
+                if self._exhausted:
+                    raise RequestParsingError("Invalid JSON: %s" % (str(error)))
+            # Grow the window geometrically, so that decoding a value spanning many chunks stays linear
+            self._fill(min_size=2 * (len(self._buffer) - self._position))
+
+    def _peek(self) -> str:
+        while True:
+            while self._position < len(self._buffer) and self._buffer[self._position] in " \t\n\r":
+                self._position += 1
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if self._exhausted:
+                return ""
+            self._fill()
+
+    def _expect(self, character: str) -> None:
+        if self._peek() != character:
+            raise RequestParsingError("Invalid JSON: expected '%s' at position %d" % (character, self._position))
+        self._position += 1
+
+    def _fill(self, min_size: int = 0) -> None:
+        # Drop what has already been parsed before appending the next chunk(s)
+        self._buffer = self._buffer[self._position :]
+        self._position = 0
+        target_size = max(min_size, len(self._buffer) + 1)
+        while len(self._buffer) < target_size and not self._exhausted:
+            chunk = next(self._chunks, None)
+            try:
+                if chunk is None:
+                    self._exhausted = True
+                    self._buffer += self._text_decoder.decode(b"", final=True)
+                else:
+                    self._buffer += self._text_decoder.decode(chunk)
+            except UnicodeDecodeError as error:
+                raise RequestParsingError("Invalid JSON: %s" % (str(error)))
+
+
+def load_json_stream(chunks: Iterable[bytes]) -> Any:
+    return _StreamingJSONParser(chunks).parse()
+
+
 # Used by non-DRF endpoints from capture.py and decide.py (/decide, /batch, /capture, etc)
 def load_data_from_request(request):
+    compression = (
+        request.GET.get("compression") or request.POST.get("compression") or request.headers.get("content-encoding", "")
+    ).lower()
+
     if request.method == "POST":
         if request.content_type in ["", "text/plain", "application/json"]:
-            data = request.body
+            if _should_stream_request_body(request, compression):
+                chunks = _read_chunks(request)
+                first_chunk = next(chunks, b"")
+                if compression or _looks_like_json_or_gzip(first_chunk):
+                    _tag_request_in_sentry_scope(request, None)
+                    return load_json_stream(decompress_stream(itertools.chain([first_chunk], chunks), compression))
+                # e.g. base64 encoded bodies, which only the in-memory path handles
+                data = first_chunk + request.read()
+            else:
+                data = request.body
         else:
             data = request.POST.get("data")
     else:
         data = request.GET.get("data")
 
+    _tag_request_in_sentry_scope(request, data)
+
+    return decompress(data, compression)
+
+
+def _tag_request_in_sentry_scope(request, data: Any) -> None:
     # add the data in sentry's scope in case there's an exception
     with configure_scope() as scope:
         if isinstance(data, dict):
@@ -629,12 +820,6 @@ def load_data_from_request(request):
         # since version 1.20.0 posthog-js adds its version to the `ver` query parameter as a debug signal here
         scope.set_tag("library.version", request.GET.get("ver", "unknown"))
 
-    compression = (
-        request.GET.get("compression") or request.POST.get("compression") or request.headers.get("content-encoding", "")
-    ).lower()
-
-    return decompress(data, compression)
-
 
 class SingletonDecorator:
     def __init__(self, klass):
@@ -893,12 +1078,15 @@ def get_daterange(
 
 
 def get_safe_cache(cache_key: str):
+    # imported here as settings import this module
+    from posthog.caching import insight_result_cache
+
     try:
-        cached_result = cache.get(cache_key)  # cache.get is safe in most cases
+        cached_result = insight_result_cache.get(cache_key)  # cache.get is safe in most cases
         return cached_result
     except Exception:  # if it errors out, the cache is probably corrupted
         try:
-            cache.delete(cache_key)  # in that case, try to delete the cache
+            insight_result_cache.delete(cache_key)  # in that case, try to delete the cache
         except Exception:
             pass
     return None